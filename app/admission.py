@@ -0,0 +1,170 @@
+import json
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.database import Database
+
+# Endpoints that run bcrypt; every other /users endpoint only needs the database
+HASH_PATHS = frozenset(
+    {"/users/register", "/users/register:batch", "/users/activate", "/users/resend-code"}
+)
+# Never shed, so probes and scrapes keep working under overload
+EXEMPT_PREFIXES = ("/health", "/metrics")
+
+OVERLOADED_BODY = json.dumps({"detail": "Server is overloaded, please retry shortly"}).encode()
+
+
+class ConcurrencyLimit:
+    """In-flight request limit for one route class, optionally adapted by AIMD.
+
+    With ``adaptive`` set, every request finishing within ``target_seconds``
+    while the class is busy raises the limit by ``1 / limit`` (about +1 per
+    limit's worth of requests); a slower request, or one that the app itself
+    rejected as overloaded, halves it, at most once per target period.
+    The limit stays within ``[min_limit, max_limit]``.
+    """
+
+    def __init__(
+        self,
+        limit: int,
+        target_seconds: float,
+        adaptive: bool = False,
+        min_limit: int = 1,
+        max_limit: int | None = None,
+    ):
+        self.limit = float(limit)
+        self.target = target_seconds
+        self.adaptive = adaptive
+        self.min_limit = min_limit
+        self.max_limit = max_limit or limit * 4
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._last_decrease = 0.0
+
+    def try_acquire(self) -> bool:
+        if self.in_flight >= int(self.limit):
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        self.admitted += 1
+        return True
+
+    def release(self, latency: float, overloaded: bool) -> None:
+        busy = self.in_flight >= self.limit / 2
+        self.in_flight -= 1
+        if not self.adaptive:
+            return
+        if overloaded or latency > self.target:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.target:
+                self.limit = max(float(self.min_limit), self.limit / 2)
+                self._last_decrease = now
+        elif busy:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "limit": self.limit,
+            "in_flight": self.in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+class AdmissionController:
+    """Per-route-class concurrency limits plus a database pool-wait guard."""
+
+    def __init__(self) -> None:
+        adaptive = settings.admission_adaptive
+        self.limits = {
+            "hash": ConcurrencyLimit(
+                settings.admission_hash_limit, settings.admission_hash_target_ms / 1000, adaptive
+            ),
+            "db": ConcurrencyLimit(
+                settings.admission_db_limit, settings.admission_db_target_ms / 1000, adaptive
+            ),
+        }
+        self.pool_rejected = 0
+
+    @staticmethod
+    def route_class(path: str) -> str | None:
+        """Return the route class for ``path``, or None if it is exempt."""
+        if path.startswith(EXEMPT_PREFIXES):
+            return None
+        return "hash" if path in HASH_PATHS else "db"
+
+    def pool_saturated(self) -> bool:
+        """Whether more callers already wait for a connection than we allow."""
+        if Database.waiting >= settings.admission_max_pool_waiters:
+            self.pool_rejected += 1
+            return True
+        return False
+
+    def stats(self) -> dict[str, float]:
+        stats: dict[str, float] = {"pool_rejected": self.pool_rejected}
+        for name, limit in self.limits.items():
+            stats |= {f"{name}_{key}": value for key, value in limit.stats().items()}
+        return stats
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionMiddleware:
+    """ASGI middleware shedding load with an immediate 503 instead of queueing.
+
+    Does nothing unless ``settings.admission_enabled`` is set. A request is
+    turned away when its route class is at its in-flight limit or when too
+    many callers already wait for a database connection, so the work that
+    is admitted finishes within its deadline instead of everyone timing out.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController | None = None):
+        self.app = app
+        self.controller = controller or admission_controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.admission_enabled:
+            await self.app(scope, receive, send)
+            return
+        route_class = self.controller.route_class(scope["path"])
+        if route_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.controller.limits[route_class]
+        if self.controller.pool_saturated() or not limit.try_acquire():
+            await self._reject(send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            limit.release(time.perf_counter() - started, overloaded=status == 503)
+
+    @staticmethod
+    async def _reject(send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(OVERLOADED_BODY)).encode()),
+                    (b"retry-after", b"1"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": OVERLOADED_BODY})
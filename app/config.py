@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -7,12 +9,167 @@ class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env", case_sensitive=False)
 
     database_url: str = "postgresql://postgres:postgres@db:5432/dailymotion"
+    # asyncpg pool; requests waiting longer than the acquire timeout get a 503
+    db_pool_min_size: int = 5
+    db_pool_max_size: int = 20
+    # Connections to the primary shared by all python -m app.server workers;
+    # each worker's pool max size becomes budget // workers (0 keeps db_pool_max_size)
+    db_connection_budget: int = 0
+    db_pool_max_inactive_connection_lifetime: float = 300.0
+    db_pool_acquire_timeout_seconds: float = 5.0
+    db_statement_cache_size: int = 100
+    db_command_timeout_seconds: float = 30.0
+    # Optional read replicas (JSON list of DSNs) for read-only queries, probed
+    # every health-check interval and skipped while unreachable. A probe (connect
+    # included) slower than the timeout, or a failed read, marks a replica down
+    database_replica_urls: list[str] = []
+    db_replica_health_check_seconds: float = 5.0
+    db_replica_health_check_timeout_seconds: float = 1.0
     smtp_host: str = "mailhog"
     smtp_port: int = 1025
+    # Pooled SMTP sessions; a size of 0 opens a new session per email
+    smtp_pool_size: int = 4
+    smtp_pool_idle_timeout_seconds: float = 60.0
+    smtp_pool_health_check_seconds: float = 5.0
     debug: bool = True
 
     # Activation code expiration in seconds (1 minute)
     activation_code_expiry_seconds: int = 60
+    # Where pending activation codes live: on the users row ("users"), in the
+    # pending_activations table ("postgres", optionally UNLOGGED) or in process
+    # memory ("memory", single-node deployments only). "derived" stores nothing:
+    # codes are an HMAC of the user id and the expiry window keyed with
+    # activation_code_secret, accepted for the current and previous window
+    activation_code_store: Literal["users", "postgres", "memory", "derived"] = "users"
+    pending_activations_unlogged: bool = False
+    activation_code_secret: str = ""
+
+    # Token buckets keyed by email and by client IP in front of bcrypt on
+    # register, activate and resend; over-budget calls get a 429 before any
+    # hashing. Buckets live in sharded LRU dicts capped at rate_limit_max_keys
+    rate_limit_enabled: bool = True
+    rate_limit_email_per_second: float = 0.2
+    rate_limit_email_burst: int = 10
+    rate_limit_ip_per_second: float = 5.0
+    rate_limit_ip_burst: int = 50
+    rate_limit_shards: int = 16
+    rate_limit_max_keys: int = 100_000
+    # Comma-separated proxy addresses (or "*") trusted to set X-Forwarded-For;
+    # behind a load balancer list it here, or every client shares its IP bucket
+    forwarded_allow_ips: str = "127.0.0.1"
+
+    # Per-process read-through cache for user lookups by email and id and for
+    # email_exists. Local writes invalidate it; writes by other processes show
+    # after the TTL. Activation codes are never cached
+    user_cache_enabled: bool = True
+    user_cache_ttl_seconds: float = 2.0
+    user_cache_max_size: int = 10_000
+
+    # Responses to register and resend-code requests carrying an Idempotency-Key
+    # header are kept this long and replayed to retries. "memory" is per process;
+    # "postgres" (the idempotency_keys table) is shared by every worker
+    idempotency_store: Literal["memory", "postgres"] = "memory"
+    idempotency_ttl_seconds: float = 86400.0
+    idempotency_max_keys: int = 100_000
+    # HMAC key for request fingerprints (they cover passwords); required with the
+    # postgres store so every worker computes the same fingerprint
+    idempotency_secret: str = ""
+
+    # In-process Bloom filter of registered emails behind GET /users/email-available,
+    # sized for twice the current user count at the false-positive rate (capped
+    # at email_filter_max_bytes) and rebuilt from the users table periodically.
+    # Each app.server worker has its own filter: an email registered through
+    # another worker reads as available here until this worker's next rebuild
+    # (the interval, +/-25% jitter so workers do not scan the table together)
+    email_filter_enabled: bool = True
+    email_filter_fp_rate: float = 0.01
+    email_filter_max_bytes: int = 16 * 1024 * 1024
+    email_filter_rebuild_seconds: float = 300.0
+
+    # Background sweeper: clears activation codes expired for longer than the
+    # grace period and, with a retention > 0, deletes accounts never activated
+    # within it; rows are processed in small batches with a pause in between
+    code_sweeper_enabled: bool = True
+    code_sweeper_interval_seconds: float = 60.0
+    code_sweeper_batch_size: int = 500
+    code_sweeper_batch_pause_seconds: float = 0.05
+    expired_code_grace_seconds: float = 3600.0
+    unactivated_account_retention_seconds: float = 0.0
+
+    # Maximum entries accepted by POST /users/register:batch, a partner endpoint
+    # that needs an X-API-Key from this list (it is closed while the list is empty)
+    batch_registration_max_items: int = 1000
+    batch_registration_api_keys: list[str] = []
+
+    # Password hashing policy: new hashes use the first scheme; after a
+    # successful login, hashes using another scheme or fewer rounds are rehashed
+    # in the background. With a target > 0, startup raises the first scheme's
+    # rounds to what hashes in about that many ms (argon2 needs argon2-cffi)
+    password_schemes: list[Literal["bcrypt", "argon2"]] = ["bcrypt"]
+    bcrypt_rounds: int = 12
+    argon2_rounds: int = 3
+    hash_target_ms: float = 0.0
+
+    # Password hashing executor; 0 workers means one per CPU core
+    hash_executor: Literal["process", "thread"] = "process"
+    hash_workers: int = 0
+    hash_queue_size: int = 256
+    # Passwords per executor job when a batch is hashed; a batch runs on at most
+    # half the workers, one chunk per worker, queueing with single hashes
+    hash_batch_chunk_size: int = 8
+
+    # Activation-email delivery: "queue" sends from in-process workers, "outbox"
+    # persists emails in email_outbox together with the user row
+    email_delivery: Literal["queue", "outbox"] = "queue"
+    outbox_batch_size: int = 100
+    outbox_poll_interval_seconds: float = 1.0
+    outbox_lease_seconds: float = 60.0
+    # Failed outbox sends are retried with exponential backoff (capped) for as
+    # long as the activation code is valid; 0 uses activation_code_expiry_seconds
+    outbox_retry_backoff_seconds: float = 1.0
+    outbox_max_retry_backoff_seconds: float = 15.0
+    outbox_retry_window_seconds: float = 0.0
+
+    # Opt-in group commit of concurrent user inserts
+    insert_batching: bool = False
+    insert_batch_window_ms: float = 2.0
+    insert_batch_max_size: int = 100
+
+    # Background activation-email dispatch
+    email_queue_workers: int = 4
+    email_queue_size: int = 1000
+    email_max_attempts: int = 3
+    email_retry_backoff_seconds: float = 0.5
+    email_drain_timeout_seconds: float = 10.0
+
+    # Admission control: a request is shed with an immediate 503 when its route
+    # class ("hash" for bcrypt endpoints, "db" for the rest of /users) is at its
+    # in-flight limit or when admission_max_pool_waiters callers already wait for
+    # a connection. With admission_adaptive the limits follow AIMD around the
+    # target latencies. /health and /metrics are never shed
+    admission_enabled: bool = True
+    admission_hash_limit: int = 16
+    admission_db_limit: int = 64
+    admission_max_pool_waiters: int = 40
+    admission_adaptive: bool = False
+    admission_hash_target_ms: float = 1000.0
+    admission_db_target_ms: float = 200.0
+
+    # python -m app.server: pre-forked workers (0 means one per CPU core), each
+    # accepting from one shared socket or, with server_reuse_port, from its own
+    # SO_REUSEPORT socket. On SIGTERM workers stop accepting and in-flight
+    # requests get the graceful-shutdown period to finish
+    server_host: str = "0.0.0.0"
+    server_port: int = 8001
+    server_workers: int = 0
+    server_reuse_port: bool = False
+    server_graceful_shutdown_seconds: float = 30.0
+
+    # Opt-in per-request stage tracing (Server-Timing header and slow-request log);
+    # the sample rate is the fraction of requests that get a stage breakdown
+    tracing_enabled: bool = False
+    tracing_sample_rate: float = 1.0
+    slow_request_threshold_ms: float = 1000.0
 
 
 settings = Settings()
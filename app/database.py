@@ -1,25 +1,185 @@
+import asyncio
+import inspect
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator, Sequence
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import TypeVar
+
 import asyncpg
 
 from app.config import settings
+from app.exceptions import DatabaseUnavailableError
+from app.metrics import observe_stage
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# A replica that raises one of these could not serve the read at all (as opposed
+# to the query failing), so the read is retried on the primary
+REPLICA_ERRORS = (
+    OSError,
+    TimeoutError,
+    asyncpg.InterfaceError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+    DatabaseUnavailableError,
+)
+
+# Set inside Database.read_your_writes(): reads in this context go to the primary
+_primary_reads: ContextVar[bool] = ContextVar("primary_reads", default=False)
+
+# Connection.prepare() bypasses the statement cache that fetch()/execute() look
+# up, and asyncpg has no public way to fill it; the private _prepare(use_cache=True)
+# does (checked against the pinned asyncpg in tests/test_database.py). If an
+# upgrade drops it, warm-up is skipped and statements are prepared on first use.
+_CACHE_WARMING = (
+    "use_cache"
+    in inspect.signature(getattr(asyncpg.Connection, "_prepare", lambda self: None)).parameters
+)
+
+
+async def _create_pool(
+    dsn: str, statements: Sequence[str], min_size: int | None = None
+) -> asyncpg.Pool:
+    """Create a pool from settings, preparing ``statements`` on every new connection."""
+
+    async def init(conn: asyncpg.Connection) -> None:
+        for query in statements:
+            await conn._prepare(query, use_cache=True)
+        if statements:
+            # Preparing leaves the implicit transaction open (holding locks on
+            # the tables involved) until the next synced message
+            await conn.execute("SELECT 1")
+
+    warm = bool(statements) and settings.db_statement_cache_size > 0
+    if warm and not _CACHE_WARMING:
+        logger.warning("This asyncpg cannot prepare into the statement cache; skipping warm-up")
+        warm = False
+    return await asyncpg.create_pool(
+        dsn=dsn,
+        min_size=settings.db_pool_min_size if min_size is None else min_size,
+        max_size=settings.db_pool_max_size,
+        max_inactive_connection_lifetime=settings.db_pool_max_inactive_connection_lifetime,
+        statement_cache_size=settings.db_statement_cache_size,
+        command_timeout=settings.db_command_timeout_seconds,
+        init=init if warm else None,
+    )
+
+
+async def _create_replica_pool(dsn: str, statements: Sequence[str]) -> asyncpg.Pool:
+    """Create a replica pool; an unreachable replica gets an empty pool to retry later."""
+    try:
+        return await _create_pool(dsn, statements)
+    except (OSError, asyncpg.PostgresError) as e:
+        logger.warning("Replica unavailable at startup: %s", e)
+        return await _create_pool(dsn, statements, min_size=0)
+
+
+class ReplicaSet:
+    """Read replica pools, handed out round-robin among the healthy ones.
+
+    A background task probes every replica with ``SELECT 1``; a replica that
+    fails the probe, does not answer within the probe timeout or fails a
+    read (``mark_unhealthy``) is skipped until a probe passes again.
+    """
+
+    def __init__(self, pools: Sequence[asyncpg.Pool]):
+        self.pools = list(pools)
+        self.healthy = [True] * len(self.pools)
+        self._next = 0
+        self._health_task: asyncio.Task[None] | None = None
+
+    def next(self) -> asyncpg.Pool | None:
+        """Return the next healthy replica pool, or None if none is healthy."""
+        for _ in range(len(self.pools)):
+            index = self._next
+            self._next = (index + 1) % len(self.pools)
+            if self.healthy[index]:
+                return self.pools[index]
+        return None
+
+    def start(self, interval: float | None = None) -> None:
+        interval = settings.db_replica_health_check_seconds if interval is None else interval
+        self._health_task = asyncio.create_task(self._run_health_checks(interval))
+
+    async def close(self) -> None:
+        if self._health_task:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        await asyncio.gather(*(pool.close() for pool in self.pools))
+
+    async def check_health(self) -> None:
+        """Probe every replica once and update its health flag.
+
+        The timeout covers the whole probe, so a replica that stopped
+        answering is marked down even while a connect to it hangs.
+        """
+        timeout = settings.db_replica_health_check_timeout_seconds
+        results = await asyncio.gather(
+            *(asyncio.wait_for(pool.fetchval("SELECT 1"), timeout) for pool in self.pools),
+            return_exceptions=True,
+        )
+        for index, result in enumerate(results):
+            self._set_health(index, not isinstance(result, BaseException))
+
+    def mark_unhealthy(self, pool: asyncpg.Pool) -> None:
+        """Skip ``pool`` after a failed read, until the next passing probe."""
+        self._set_health(self.pools.index(pool), False)
+
+    def _set_health(self, index: int, healthy: bool) -> None:
+        if healthy != self.healthy[index]:
+            logger.warning("Replica %d is now %s", index, "healthy" if healthy else "unhealthy")
+        self.healthy[index] = healthy
+
+    async def _run_health_checks(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            await self.check_health()
 
 
 class Database:
-    """Manages asyncpg connection pool."""
+    """Manages the primary asyncpg pool and optional read replica pools."""
 
     pool: asyncpg.Pool | None = None
+    replicas: ReplicaSet | None = None
+    waiting = 0
+    acquire_timeouts = 0
 
     @classmethod
-    async def connect(cls) -> None:
-        """Create the database connection pool."""
-        cls.pool = await asyncpg.create_pool(
-            dsn=settings.database_url,
-            min_size=5,
-            max_size=20,
-        )
+    async def connect(
+        cls,
+        statements: Sequence[str] = (),
+        read_statements: Sequence[str] = (),
+    ) -> None:
+        """Create the primary pool and one pool per configured replica.
+
+        ``statements`` are prepared on every new primary connection and
+        ``read_statements`` on every replica connection, so the first request
+        served by a connection does not pay for parsing and planning.
+        """
+        cls.pool = await _create_pool(settings.database_url, statements)
+        if settings.database_replica_urls:
+            cls.replicas = ReplicaSet(
+                await asyncio.gather(
+                    *(
+                        _create_replica_pool(dsn, read_statements)
+                        for dsn in settings.database_replica_urls
+                    )
+                )
+            )
+            await cls.replicas.check_health()
+            cls.replicas.start()
 
     @classmethod
     async def disconnect(cls) -> None:
-        """Close the database connection pool."""
+        """Close the primary and replica pools."""
+        if cls.replicas:
+            await cls.replicas.close()
+            cls.replicas = None
         if cls.pool:
             await cls.pool.close()
             cls.pool = None
@@ -30,3 +190,87 @@ class Database:
         if cls.pool is None:
             raise RuntimeError("Database pool not initialized. Call connect() first.")
         return cls.pool
+
+    @staticmethod
+    @contextmanager
+    def read_your_writes() -> Iterator[None]:
+        """Route every read in this context (and tasks it spawns) to the primary."""
+        token = _primary_reads.set(True)
+        try:
+            yield
+        finally:
+            _primary_reads.reset(token)
+
+    @staticmethod
+    def read_pool(primary: asyncpg.Pool, replicas: ReplicaSet | None) -> asyncpg.Pool:
+        """Pick the pool for a read-only query: a healthy replica unless pinned to the primary."""
+        if replicas is None or _primary_reads.get():
+            return primary
+        return replicas.next() or primary
+
+    @classmethod
+    async def read(
+        cls,
+        primary: asyncpg.Pool,
+        replicas: ReplicaSet | None,
+        query: Callable[[asyncpg.Connection], Awaitable[T]],
+    ) -> T:
+        """Run a read-only ``query`` on ``read_pool()``'s pick.
+
+        If a replica cannot serve it (connection lost, unreachable, acquire
+        timeout), the replica is marked unhealthy and the query is retried
+        on the primary.
+        """
+        pool = cls.read_pool(primary, replicas)
+        if replicas is not None and pool is not primary:
+            try:
+                async with cls.acquire(pool) as conn:
+                    return await query(conn)
+            except REPLICA_ERRORS as e:
+                logger.warning("Read failed on a replica, retrying on the primary: %r", e)
+                replicas.mark_unhealthy(pool)
+        async with cls.acquire(primary) as conn:
+            return await query(conn)
+
+    @classmethod
+    @asynccontextmanager
+    async def acquire(cls, pool: asyncpg.Pool) -> AsyncIterator[asyncpg.Connection]:
+        """Acquire a connection from ``pool``, counting waiters and timing the wait.
+
+        Raises DatabaseUnavailableError (503) if none frees up within
+        ``db_pool_acquire_timeout_seconds``.
+        """
+        cls.waiting += 1
+        started = time.perf_counter()
+        try:
+            conn = await pool.acquire(timeout=settings.db_pool_acquire_timeout_seconds)
+        except TimeoutError:
+            cls.acquire_timeouts += 1
+            raise DatabaseUnavailableError() from None
+        finally:
+            cls.waiting -= 1
+            observe_stage("db.acquire", time.perf_counter() - started)
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+
+    @classmethod
+    def stats(cls) -> dict[str, int]:
+        """Return pool size, idle connections, waiting callers and acquire timeouts."""
+        stats = {"waiting": cls.waiting, "acquire_timeouts": cls.acquire_timeouts}
+        if cls.pool is not None:
+            stats |= {
+                "size": cls.pool.get_size(),
+                "idle": cls.pool.get_idle_size(),
+                "min_size": cls.pool.get_min_size(),
+                "max_size": cls.pool.get_max_size(),
+            }
+        if cls.replicas is not None:
+            stats |= {
+                "replicas": len(cls.replicas.pools),
+                "replicas_healthy": sum(cls.replicas.healthy),
+                "replica_size": sum(pool.get_size() for pool in cls.replicas.pools),
+                "replica_idle": sum(pool.get_idle_size() for pool in cls.replicas.pools),
+            }
+        return stats
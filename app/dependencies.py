@@ -1,22 +1,32 @@
+import secrets
 from typing import Annotated
 
-from fastapi import Depends
+from fastapi import Depends, Header
 
+from app.config import settings
 from app.database import Database
+from app.exceptions import InvalidApiKeyError
+from app.repositories.activation_code_store import create_activation_code_store
+from app.repositories.insert_batcher import insert_batcher
+from app.repositories.user_cache import CachedUserRepository
 from app.repositories.user_repository import UserRepository
-from app.services.email_service import EmailServiceInterface, SMTPEmailService
+from app.services.email_queue import email_dispatcher
+from app.services.email_service import EmailServiceInterface
 from app.services.user_service import UserService
 
 
 async def get_user_repository() -> UserRepository:
     """Dependency for UserRepository."""
     pool = await Database.get_pool()
-    return UserRepository(pool)
+    batcher = insert_batcher if insert_batcher.started else None
+    if settings.user_cache_enabled:
+        return CachedUserRepository(pool, batcher, Database.replicas)
+    return UserRepository(pool, batcher, Database.replicas)
 
 
 async def get_email_service() -> EmailServiceInterface:
     """Dependency for EmailService."""
-    return SMTPEmailService()
+    return email_dispatcher
 
 
 async def get_user_service(
@@ -24,4 +34,16 @@ async def get_user_service(
     email_service: Annotated[EmailServiceInterface, Depends(get_email_service)],
 ) -> UserService:
     """Dependency for UserService."""
-    return UserService(repository, email_service)
+    return UserService(
+        repository, email_service, code_store=create_activation_code_store(repository)
+    )
+
+
+async def require_partner_key(x_api_key: Annotated[str | None, Header()] = None) -> None:
+    """Dependency admitting only callers with one of the configured partner API keys."""
+    valid = x_api_key is not None and any(
+        secrets.compare_digest(x_api_key.encode(), key.encode())
+        for key in settings.batch_registration_api_keys
+    )
+    if not valid:
+        raise InvalidApiKeyError()
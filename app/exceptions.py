@@ -1,3 +1,5 @@
+import math
+
 from fastapi import HTTPException, status
 
 
@@ -32,6 +34,16 @@ class InvalidCredentialsError(HTTPException):
         )
 
 
+class InvalidApiKeyError(HTTPException):
+    """Raised when a partner endpoint is called without a valid API key."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API key",
+        )
+
+
 class InvalidActivationCodeError(HTTPException):
     """Raised when the activation code is invalid."""
 
@@ -60,3 +72,46 @@ class UserAlreadyActiveError(HTTPException):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User is already activated",
         )
+
+
+class HashingOverloadedError(HTTPException):
+    """Raised when the password hashing queue is full."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+class DatabaseUnavailableError(HTTPException):
+    """Raised when no database connection frees up within the acquire timeout."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is busy, please retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+class RateLimitedError(HTTPException):
+    """Raised when a client or email has used up its request budget."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+class IdempotencyKeyReusedError(HTTPException):
+    """Raised when an Idempotency-Key is sent again with a different request."""
+
+    def __init__(self):
+        super().__init__(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used for a different request",
+        )
@@ -1,17 +1,109 @@
+import asyncio
 from contextlib import asynccontextmanager
+from dataclasses import asdict
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response
+from fastapi.exception_handlers import http_exception_handler
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
+from app import server
+from app.admission import AdmissionMiddleware, admission_controller
+from app.config import settings
 from app.database import Database
+from app.dependencies import get_user_repository
+from app.metrics import (
+    CONTENT_TYPE_LATEST,
+    EXCEPTIONS,
+    MetricsMiddleware,
+    StatsCollector,
+    generate_latest,
+)
+from app.repositories import activation_code_store, outbox_repository, user_repository
+from app.repositories.activation_code_store import (
+    PostgresCodeStore,
+    create_activation_code_store,
+)
+from app.repositories.email_filter import email_filter
+from app.repositories.insert_batcher import insert_batcher
+from app.repositories.outbox_repository import EmailOutboxRepository
+from app.repositories.user_cache import user_cache
+from app.repositories.user_repository import UserRepository
 from app.routers import users
+from app.services import idempotency as idempotency_module
+from app.services import user_service
+from app.services.code_sweeper import ActivationCodeSweeper
+from app.services.email_queue import email_dispatcher
+from app.services.email_service import SMTPEmailService
+from app.services.idempotency import PostgresIdempotencyStore, idempotency
+from app.services.outbox_dispatcher import OutboxDispatcher
+from app.services.password_hasher import password_hasher
+from app.services.rate_limiter import rate_limiter
+from app.services.smtp_pool import smtp_pool
+from app.tracing import TracingMiddleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan events."""
-    await Database.connect()
+    if settings.activation_code_store == "memory" and settings.email_delivery == "outbox":
+        raise RuntimeError("ACTIVATION_CODE_STORE=memory cannot be used with EMAIL_DELIVERY=outbox")
+    if settings.activation_code_store == "derived" and not settings.activation_code_secret:
+        raise RuntimeError("ACTIVATION_CODE_STORE=derived requires ACTIVATION_CODE_SECRET")
+    if settings.idempotency_store == "postgres" and not settings.idempotency_secret:
+        raise RuntimeError("IDEMPOTENCY_STORE=postgres requires IDEMPOTENCY_SECRET")
+    password_hasher.start()
+    statements: tuple[str, ...] = user_repository.STATEMENTS
+    if settings.email_delivery == "outbox":
+        statements += user_repository.OUTBOX_STATEMENTS + outbox_repository.STATEMENTS
+        if settings.activation_code_store == "derived":
+            statements += activation_code_store.DERIVED_STATEMENTS
+    if settings.activation_code_store == "postgres":
+        statements += activation_code_store.STATEMENTS
+    if settings.idempotency_store == "postgres":
+        statements += idempotency_module.STATEMENTS
+    await Database.connect(statements, user_repository.READ_STATEMENTS)
+    if settings.activation_code_store == "postgres":
+        await PostgresCodeStore(await Database.get_pool()).set_unlogged(
+            settings.pending_activations_unlogged
+        )
+    if settings.insert_batching:
+        insert_batcher.start(UserRepository(await Database.get_pool()))
+    email_dispatcher.start()
+    outbox_dispatcher = None
+    if settings.email_delivery == "outbox":
+        outbox_dispatcher = OutboxDispatcher(
+            EmailOutboxRepository(await Database.get_pool()),
+            SMTPEmailService(pool=smtp_pool),
+        )
+        outbox_dispatcher.start()
+    if settings.email_filter_enabled:
+        # Built in the background; until then availability checks query the database
+        email_filter.start(await Database.get_pool(), Database.replicas)
+    idempotency_store = None
+    if settings.idempotency_store == "postgres":
+        idempotency_store = PostgresIdempotencyStore(await Database.get_pool())
+        idempotency_store.start()
+        idempotency.store = idempotency_store
+    code_sweeper = None
+    if settings.code_sweeper_enabled:
+        # The request path's repository, so purged accounts also leave the user cache
+        repository = await get_user_repository()
+        code_sweeper = ActivationCodeSweeper(repository, create_activation_code_store(repository))
+        code_sweeper.start()
     yield
+    await asyncio.gather(*user_service.background_tasks, return_exceptions=True)
+    await email_filter.stop()
+    if idempotency_store:
+        await idempotency_store.stop()
+    if code_sweeper:
+        await code_sweeper.stop()
+    if outbox_dispatcher:
+        await outbox_dispatcher.stop()
+    await insert_batcher.stop()
+    await email_dispatcher.stop()
+    await smtp_pool.close()
     await Database.disconnect()
+    password_hasher.shutdown()
 
 
 app = FastAPI(
@@ -21,10 +113,66 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.add_middleware(AdmissionMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
 app.include_router(users.router)
 
+StatsCollector("db_pool", Database.stats, "asyncpg connection pool state").register()
+StatsCollector(
+    "worker", server.worker_stats, "This app.server worker's identity, pool share and requests"
+).register()
+StatsCollector(
+    "password_hasher", lambda: asdict(password_hasher.stats()), "Hashing executor state"
+).register()
+StatsCollector(
+    "rate_limiter", rate_limiter.stats, "Rate limiter rejections and bucket counts"
+).register()
+StatsCollector(
+    "admission", admission_controller.stats, "Admission control limits and shed requests"
+).register()
+StatsCollector(
+    "email_filter", email_filter.stats, "Email Bloom filter size, accuracy and lookups"
+).register()
+StatsCollector(
+    "user_cache", user_cache.stats, "User lookup cache size and hit, miss and eviction totals"
+).register()
+StatsCollector(
+    "idempotency", idempotency.stats, "Idempotency-Key stored, replayed and coalesced responses"
+).register()
+StatsCollector(
+    "email_queue",
+    lambda: {"depth": email_dispatcher.qsize(), **email_dispatcher.counters},
+    "Activation email queue depth and delivery totals",
+).register()
+
+
+@app.exception_handler(StarletteHTTPException)
+async def count_http_exception(request: Request, exc: StarletteHTTPException) -> Response:
+    """Count raised HTTP exceptions by class before rendering them as usual."""
+    EXCEPTIONS.labels(type(exc).__name__).inc()
+    return await http_exception_handler(request, exc)
+
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy"}
+
+
+@app.get("/health/db")
+async def database_health():
+    """Connection pool statistics."""
+    return Database.stats()
+
+
+@app.get("/health/worker")
+async def worker_health():
+    """Statistics of the app.server worker that answered (empty under plain uvicorn)."""
+    return server.worker_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> Response:
+    """Prometheus metrics endpoint."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,140 @@
+import functools
+import time
+from collections.abc import Awaitable, Callable, Coroutine, Iterator, Mapping
+from typing import Any, ParamSpec, TypeVar
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, Collector
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import tracing
+
+__all__ = [
+    "CONTENT_TYPE_LATEST",
+    "EXCEPTIONS",
+    "REQUEST_LATENCY",
+    "STAGE_LATENCY",
+    "MetricsMiddleware",
+    "StatsCollector",
+    "generate_latest",
+    "observe_stage",
+    "timed",
+]
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+)
+STAGE_LATENCY = Histogram(
+    "stage_duration_seconds",
+    "Latency of internal stages (bcrypt, database queries, SMTP)",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+EXCEPTIONS = Counter(
+    "app_exceptions_total",
+    "HTTP exceptions raised, by exception class",
+    ["exception"],
+)
+
+_stage_children: dict[str, Any] = {}
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """Record one observation for an internal stage (and the request trace, if any)."""
+    child = _stage_children.get(stage)
+    if child is None:
+        child = _stage_children[stage] = STAGE_LATENCY.labels(stage)
+    child.observe(seconds)
+    tracing.record(stage, seconds)
+
+
+class timed:
+    """Time an internal stage, as a context manager or an async-function decorator.
+
+    The histogram child is resolved once per stage name, so an observation
+    costs a ``perf_counter`` pair and one ``observe`` call.
+    """
+
+    __slots__ = ("stage", "_started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._started = 0.0
+
+    def __enter__(self) -> "timed":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        observe_stage(self.stage, time.perf_counter() - self._started)
+
+    def __call__(self, func: Callable[P, Awaitable[R]]) -> Callable[P, Coroutine[Any, Any, R]]:
+        stage = self.stage
+
+        @functools.wraps(func)
+        async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            started = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                observe_stage(stage, time.perf_counter() - started)
+
+        return wrapper
+
+
+class StatsCollector(Collector):
+    """Expose a ``stats()`` callback's numeric fields as gauges.
+
+    Used for state that already lives on long-lived objects (pool sizes,
+    queue depths), so nothing is recorded on the hot path.
+    """
+
+    def __init__(self, prefix: str, stats: Callable[[], Mapping[str, Any]], documentation: str):
+        self.prefix = prefix
+        self.stats = stats
+        self.documentation = documentation
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        for name, value in self.stats().items():
+            if isinstance(value, int | float) and not isinstance(value, bool):
+                yield GaugeMetricFamily(f"{self.prefix}_{name}", self.documentation, value=value)
+
+    def register(self) -> None:
+        REGISTRY.register(self)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency per route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            REQUEST_LATENCY.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status),
+            ).observe(time.perf_counter() - started)
@@ -1,7 +1,13 @@
+from collections.abc import Mapping
+from dataclasses import dataclass
 from datetime import datetime
+from enum import StrEnum
+from typing import Any
 from uuid import UUID
 
-from pydantic import BaseModel, ConfigDict, EmailStr, field_validator
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, field_validator
+
+from app.config import settings
 
 
 class UserRegistrationRequest(BaseModel):
@@ -26,6 +32,50 @@ class UserRegistrationResponse(BaseModel):
     message: str = "Registration successful. Please check your email for the activation code."
 
 
+class BatchRegistrationRequest(BaseModel):
+    """Request model for bulk registration.
+
+    Entries are validated one by one against UserRegistrationRequest, so an
+    invalid entry is reported in the response instead of failing the batch.
+    """
+
+    users: list[Any] = Field(min_length=1, max_length=settings.batch_registration_max_items)
+
+
+class BatchItemStatus(StrEnum):
+    """Outcome of one bulk registration entry."""
+
+    CREATED = "created"
+    DUPLICATE = "duplicate"
+    INVALID = "invalid"
+
+
+class BatchRegistrationItem(BaseModel):
+    """Result for one bulk registration entry."""
+
+    index: int
+    status: BatchItemStatus
+    email: str | None = None
+    id: UUID | None = None
+    error: str | None = None
+
+
+class BatchRegistrationResponse(BaseModel):
+    """Response model for bulk registration."""
+
+    created: int
+    duplicate: int
+    invalid: int
+    results: list[BatchRegistrationItem]
+
+
+class EmailAvailabilityResponse(BaseModel):
+    """Response model for the email availability check."""
+
+    email: str
+    available: bool
+
+
 class ActivationRequest(BaseModel):
     """Request model for account activation."""
 
@@ -58,3 +108,45 @@ class UserInDB(BaseModel):
     activation_code_expires_at: datetime | None = None
     created_at: datetime
     updated_at: datetime
+
+
+@dataclass(slots=True)
+class UserRecord:
+    """User row as used by the repository and service layers.
+
+    Built directly from an asyncpg Record, whose columns Postgres has already
+    typed, so no validation or intermediate dict is involved. Convert with
+    ``UserInDB.model_validate(record)`` where a validated model is needed.
+    """
+
+    id: UUID
+    email: str
+    password_hash: str
+    is_active: bool
+    activation_code: str | None
+    activation_code_expires_at: datetime | None
+    created_at: datetime
+    updated_at: datetime
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "UserRecord":
+        return cls(
+            row["id"],
+            row["email"],
+            row["password_hash"],
+            row["is_active"],
+            row["activation_code"],
+            row["activation_code_expires_at"],
+            row["created_at"],
+            row["updated_at"],
+        )
+
+
+class ActivationStatus(StrEnum):
+    """Outcome of an atomic activation attempt."""
+
+    ACTIVATED = "activated"
+    ALREADY_ACTIVE = "already_active"
+    INVALID_CODE = "invalid_code"
+    EXPIRED = "expired"
+    NOT_FOUND = "not_found"
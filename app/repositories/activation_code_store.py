@@ -0,0 +1,329 @@
+import hashlib
+import hmac
+import secrets
+import time
+from abc import ABC, abstractmethod
+from datetime import UTC, datetime, timedelta
+from typing import NamedTuple
+from uuid import UUID
+
+import asyncpg
+
+from app.config import settings
+from app.database import Database
+from app.metrics import timed
+from app.models.user import ActivationStatus
+from app.repositories.user_repository import UserRepository
+
+SAVE_PENDING = """
+    WITH saved AS (
+        INSERT INTO pending_activations (user_id, code, expires_at)
+        VALUES ($1, $3, $4)
+        ON CONFLICT (user_id) DO UPDATE
+        SET code = EXCLUDED.code, expires_at = EXCLUDED.expires_at
+    ), superseded AS (
+        DELETE FROM email_outbox WHERE user_id = $1 AND $5
+    ), outbox AS (
+        INSERT INTO email_outbox (user_id, email, activation_code)
+        SELECT $1::uuid, $2::text, $3::text WHERE $5
+    )
+    SELECT 1
+"""
+
+SAVE_PENDING_MANY = """
+    WITH saved AS (
+        INSERT INTO pending_activations (user_id, code, expires_at)
+        SELECT user_id, code, expires_at
+        FROM unnest($1::uuid[], $3::text[], $4::timestamptz[]) AS t(user_id, code, expires_at)
+        ON CONFLICT (user_id) DO UPDATE
+        SET code = EXCLUDED.code, expires_at = EXCLUDED.expires_at
+    ), outbox AS (
+        INSERT INTO email_outbox (user_id, email, activation_code)
+        SELECT user_id, email, code
+        FROM unnest($1::uuid[], $2::text[], $3::text[]) AS t(user_id, email, code)
+        WHERE $5
+    )
+    SELECT 1
+"""
+
+ACTIVATE_PENDING = """
+    WITH consumed AS (
+        DELETE FROM pending_activations
+        WHERE user_id = $1 AND code = $2 AND expires_at > NOW()
+        RETURNING user_id
+    ), activated AS (
+        UPDATE users
+        SET is_active = TRUE, updated_at = NOW()
+        WHERE id IN (SELECT user_id FROM consumed) AND NOT is_active
+        RETURNING id
+    )
+    SELECT CASE
+        WHEN EXISTS (SELECT 1 FROM activated) THEN 'activated'
+        WHEN u.is_active THEN 'already_active'
+        WHEN p.code = $2 AND p.expires_at <= NOW() THEN 'expired'
+        ELSE 'invalid_code'
+    END
+    FROM users u
+    LEFT JOIN pending_activations p ON p.user_id = u.id
+    WHERE u.id = $1
+"""
+
+CLEAR_EXPIRED_PENDING = """
+    DELETE FROM pending_activations
+    WHERE user_id IN (
+        SELECT user_id
+        FROM pending_activations
+        WHERE expires_at < NOW() - make_interval(secs => $1)
+        LIMIT $2
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+QUEUE_ACTIVATION_EMAILS = """
+    WITH superseded AS (
+        DELETE FROM email_outbox WHERE user_id = ANY($1::uuid[])
+    )
+    INSERT INTO email_outbox (user_id, email, activation_code)
+    SELECT * FROM unnest($1::uuid[], $2::text[], $3::text[])
+"""
+
+# Prepared on every new pool connection when ACTIVATION_CODE_STORE=postgres
+STATEMENTS = (SAVE_PENDING, SAVE_PENDING_MANY, ACTIVATE_PENDING, CLEAR_EXPIRED_PENDING)
+# ...and when ACTIVATION_CODE_STORE=derived with EMAIL_DELIVERY=outbox
+DERIVED_STATEMENTS = (QUEUE_ACTIVATION_EMAILS,)
+
+
+class PendingCode(NamedTuple):
+    """An activation code to store for a user."""
+
+    user_id: UUID
+    email: str
+    code: str
+    expires_at: datetime
+
+
+class ActivationCodeStore(ABC):
+    """Where pending activation codes are kept and checked.
+
+    ``stored_with_user`` is True when ``UserRepository.create_user`` writes
+    the first code itself (on the users row); otherwise the service saves it
+    here right after creating the user.
+    """
+
+    stored_with_user = False
+
+    def new_code(self, user_id: UUID) -> str:
+        """Return the code to send ``user_id``: a random one unless the store derives it."""
+        return f"{secrets.randbelow(10000):04d}"
+
+    @abstractmethod
+    async def save(self, pending: PendingCode, queue_email: bool = False) -> None:
+        """Store (or replace) a user's code; ``queue_email`` also writes it to the outbox."""
+
+    async def save_many(self, pending: list[PendingCode], queue_email: bool = False) -> None:
+        """Store codes for several users."""
+        for entry in pending:
+            await self.save(entry, queue_email)
+
+    @abstractmethod
+    async def activate(self, user_id: UUID, code: str) -> ActivationStatus:
+        """Consume the code and activate the user if it matches and has not expired."""
+
+    @abstractmethod
+    async def clear_expired(self, grace_seconds: float, limit: int) -> int:
+        """Drop up to ``limit`` codes expired for over ``grace_seconds``; returns the count."""
+
+
+class UsersTableCodeStore(ActivationCodeStore):
+    """Codes kept on the users row (the default)."""
+
+    stored_with_user = True
+
+    def __init__(self, repository: UserRepository):
+        self.repository = repository
+
+    async def save(self, pending: PendingCode, queue_email: bool = False) -> None:
+        await self.repository.update_activation_code(
+            pending.user_id, pending.code, pending.expires_at, queue_email=queue_email
+        )
+
+    async def activate(self, user_id: UUID, code: str) -> ActivationStatus:
+        return await self.repository.activate_user_with_code(user_id, code)
+
+    async def clear_expired(self, grace_seconds: float, limit: int) -> int:
+        return await self.repository.clear_expired_codes(grace_seconds, limit)
+
+
+class PostgresCodeStore(ActivationCodeStore):
+    """Codes kept in the narrow pending_activations table.
+
+    Rows are deleted on activation and by the sweeper once expired, so the
+    table only ever holds outstanding codes and the users row is written
+    just on create and activate.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    @timed("db.save_pending_code")
+    async def save(self, pending: PendingCode, queue_email: bool = False) -> None:
+        async with Database.acquire(self.pool) as conn:
+            await conn.execute(SAVE_PENDING, *pending, queue_email)
+
+    @timed("db.save_pending_codes")
+    async def save_many(self, pending: list[PendingCode], queue_email: bool = False) -> None:
+        async with Database.acquire(self.pool) as conn:
+            await conn.execute(
+                SAVE_PENDING_MANY,
+                [entry.user_id for entry in pending],
+                [entry.email for entry in pending],
+                [entry.code for entry in pending],
+                [entry.expires_at for entry in pending],
+                queue_email,
+            )
+
+    @timed("db.activate_pending_code")
+    async def activate(self, user_id: UUID, code: str) -> ActivationStatus:
+        async with Database.acquire(self.pool) as conn:
+            result = await conn.fetchval(ACTIVATE_PENDING, user_id, code)
+            if result is None:
+                return ActivationStatus.NOT_FOUND
+            return ActivationStatus(result)
+
+    @timed("db.clear_expired_pending_codes")
+    async def clear_expired(self, grace_seconds: float, limit: int) -> int:
+        async with Database.acquire(self.pool) as conn:
+            status = await conn.execute(CLEAR_EXPIRED_PENDING, grace_seconds, limit)
+            return int(status.split()[-1])
+
+    async def set_unlogged(self, unlogged: bool) -> None:
+        """Switch the table between UNLOGGED and LOGGED if it is not already.
+
+        UNLOGGED skips WAL for code writes but empties the table after a
+        crash (users then request a new code) and is not replicated.
+        """
+        async with Database.acquire(self.pool) as conn:
+            persistence = await conn.fetchval(
+                "SELECT relpersistence::text FROM pg_class WHERE oid = 'pending_activations'::regclass"
+            )
+            if (persistence == "u") != unlogged:
+                await conn.execute(
+                    f"ALTER TABLE pending_activations SET {'UNLOGGED' if unlogged else 'LOGGED'}"
+                )
+
+
+class InMemoryCodeStore(ActivationCodeStore):
+    """Codes kept in a process-local dict; for single-node deployments.
+
+    Codes are lost on restart and invisible to other processes. Expired
+    entries are dropped by the sweeper.
+    """
+
+    def __init__(self, repository: UserRepository, codes: dict[UUID, tuple[str, datetime]]):
+        self.repository = repository
+        self.codes = codes
+
+    async def save(self, pending: PendingCode, queue_email: bool = False) -> None:
+        if queue_email:
+            raise ValueError("The in-memory code store cannot write to the email outbox")
+        self.codes[pending.user_id] = (pending.code, pending.expires_at)
+
+    async def activate(self, user_id: UUID, code: str) -> ActivationStatus:
+        stored = self.codes.get(user_id)
+        if stored is None or stored[0] != code:
+            return ActivationStatus.INVALID_CODE
+        if stored[1] <= datetime.now(UTC):
+            return ActivationStatus.EXPIRED
+        del self.codes[user_id]
+        if await self.repository.activate_user(user_id):
+            return ActivationStatus.ACTIVATED
+        return ActivationStatus.NOT_FOUND
+
+    async def clear_expired(self, grace_seconds: float, limit: int) -> int:
+        cutoff = datetime.now(UTC) - timedelta(seconds=grace_seconds)
+        expired = [
+            user_id for user_id, (_, expires_at) in self.codes.items() if expires_at < cutoff
+        ]
+        for user_id in expired[:limit]:
+            del self.codes[user_id]
+        return min(len(expired), limit)
+
+
+class DerivedCodeStore(ActivationCodeStore):
+    """Codes derived TOTP-style from a server secret, the user id and a time window.
+
+    Nothing is stored, so resending a code needs no write and activation no
+    code lookup. Time is cut into windows of ``window_seconds`` and a code is
+    accepted in the window it was issued in and the next one, so it stays
+    valid for between one and two windows. Resending within a window sends
+    the same code. Because codes are not consumed, the users row being
+    activated is what stops a code from being reused.
+    """
+
+    def __init__(self, repository: UserRepository, secret: str, window_seconds: int):
+        self.repository = repository
+        self.secret = secret.encode()
+        self.window_seconds = window_seconds
+
+    def _window(self) -> int:
+        return int(time.time() // self.window_seconds)
+
+    def code_for(self, user_id: UUID, window: int) -> str:
+        """Compute the code for ``user_id`` in ``window`` (HOTP dynamic truncation)."""
+        message = user_id.bytes + window.to_bytes(8, "big", signed=True)
+        digest = hmac.new(self.secret, message, hashlib.sha256).digest()
+        offset = digest[-1] & 0x0F
+        value = int.from_bytes(digest[offset : offset + 4], "big") & 0x7FFFFFFF
+        return f"{value % 10000:04d}"
+
+    def new_code(self, user_id: UUID) -> str:
+        return self.code_for(user_id, self._window())
+
+    def _matches(self, user_id: UUID, code: str, window: int) -> bool:
+        return hmac.compare_digest(code, self.code_for(user_id, window))
+
+    @timed("db.queue_activation_emails")
+    async def save_many(self, pending: list[PendingCode], queue_email: bool = False) -> None:
+        if not queue_email or not pending:
+            return
+        async with Database.acquire(self.repository.pool) as conn:
+            await conn.execute(
+                QUEUE_ACTIVATION_EMAILS,
+                [entry.user_id for entry in pending],
+                [entry.email for entry in pending],
+                [entry.code for entry in pending],
+            )
+
+    async def save(self, pending: PendingCode, queue_email: bool = False) -> None:
+        await self.save_many([pending], queue_email)
+
+    async def activate(self, user_id: UUID, code: str) -> ActivationStatus:
+        window = self._window()
+        if self._matches(user_id, code, window) or self._matches(user_id, code, window - 1):
+            if await self.repository.activate_user(user_id):
+                return ActivationStatus.ACTIVATED
+            return ActivationStatus.NOT_FOUND
+        # The window before the accepted ones only serves the "expired" message
+        if self._matches(user_id, code, window - 2):
+            return ActivationStatus.EXPIRED
+        return ActivationStatus.INVALID_CODE
+
+    async def clear_expired(self, grace_seconds: float, limit: int) -> int:
+        return 0
+
+
+# Backing dict for InMemoryCodeStore, shared by every request in this process
+memory_codes: dict[UUID, tuple[str, datetime]] = {}
+
+
+def create_activation_code_store(repository: UserRepository) -> ActivationCodeStore:
+    """Build the store selected by ``settings.activation_code_store``."""
+    if settings.activation_code_store == "postgres":
+        return PostgresCodeStore(repository.pool)
+    if settings.activation_code_store == "memory":
+        return InMemoryCodeStore(repository, memory_codes)
+    if settings.activation_code_store == "derived":
+        return DerivedCodeStore(
+            repository, settings.activation_code_secret, settings.activation_code_expiry_seconds
+        )
+    return UsersTableCodeStore(repository)
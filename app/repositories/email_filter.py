@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import logging
+import math
+import random
+from collections import Counter
+from collections.abc import Iterable
+
+import asyncpg
+
+from app.config import settings
+from app.database import Database, ReplicaSet
+
+logger = logging.getLogger(__name__)
+
+COUNT_USERS = "SELECT count(*) FROM users"
+STREAM_EMAILS = "SELECT email FROM users"
+
+# Rows fetched per round trip while streaming the users table; hashing one
+# batch takes under 10 ms, so the rebuild never stalls the event loop for long
+STREAM_PREFETCH = 1000
+
+# Each worker's first build waits a random delay of up to this long and later
+# rebuilds are jittered by +/-25%, so workers started together do not all scan
+# the users table at once
+STARTUP_JITTER_SECONDS = 10.0
+REBUILD_JITTER = 0.25
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings.
+
+    Sized for ``capacity`` items at ``fp_rate`` false positives, using at
+    most ``max_bytes`` (a smaller filter just has a higher false-positive
+    rate). Bit positions come from one BLAKE2b digest split into two
+    64-bit halves (Kirsch-Mitzenmacher double hashing).
+    """
+
+    def __init__(self, capacity: int, fp_rate: float, max_bytes: int):
+        capacity = max(capacity, 1)
+        bits = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        self.size = max(8, min(bits, max_bytes * 8))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.capacity = capacity
+        self.items = 0
+        self.bits = bytearray(-(-self.size // 8))
+
+    def _positions(self, item: str) -> list[int]:
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.items += 1
+
+    def update(self, items: Iterable[str]) -> None:
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+    @property
+    def fp_rate(self) -> float:
+        """Expected false-positive rate at the current number of items."""
+        return float((1 - math.exp(-self.hashes * self.items / self.size)) ** self.hashes)
+
+
+class EmailFilter:
+    """Bloom filter of registered emails, answering "definitely not registered" cheaply.
+
+    Built by streaming the users table through a server-side cursor, kept
+    current by ``UserRepository.create_user(s)`` in this process, and
+    rebuilt about every ``email_filter_rebuild_seconds`` to pick up emails
+    registered by other processes (other app.server workers included) and
+    to drop deleted ones; until then those emails read as available here.
+    Until the first build every email is a "maybe", so callers fall through
+    to the database.
+    """
+
+    def __init__(self) -> None:
+        self.bloom: BloomFilter | None = None
+        self.counters: Counter[str] = Counter()
+        self._building: BloomFilter | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    def might_contain(self, email: str) -> bool:
+        """False only if ``email`` is certainly not registered."""
+        if self.bloom is None or email in self.bloom:
+            self.counters["maybe"] += 1
+            return True
+        self.counters["negative"] += 1
+        return False
+
+    def false_positive(self) -> None:
+        """Count a "maybe" that the database answered with "not registered"."""
+        if self.bloom is not None:
+            self.counters["false_positive"] += 1
+
+    def add(self, email: str) -> None:
+        """Record a newly registered email (also in a filter being rebuilt)."""
+        if self.bloom is not None:
+            self.bloom.add(email)
+        if self._building is not None:
+            self._building.add(email)
+
+    def load(self, emails: Iterable[str], capacity: int) -> None:
+        """Replace the filter with one holding ``emails``, sized for ``capacity``."""
+        bloom = BloomFilter(
+            capacity, settings.email_filter_fp_rate, settings.email_filter_max_bytes
+        )
+        bloom.update(emails)
+        self.bloom = bloom
+
+    async def rebuild(self, pool: asyncpg.Pool, replicas: ReplicaSet | None = None) -> None:
+        """Stream every registered email into a new filter, then swap it in.
+
+        The filter is sized for twice today's users (room to grow until the
+        next rebuild). Reads go to a healthy replica when one is configured.
+        """
+        async with Database.acquire(Database.read_pool(pool, replicas)) as conn:
+            count = await conn.fetchval(COUNT_USERS)
+            self._building = BloomFilter(
+                max(2 * count, 10_000),
+                settings.email_filter_fp_rate,
+                settings.email_filter_max_bytes,
+            )
+            try:
+                async with conn.transaction(readonly=True):
+                    async for record in conn.cursor(STREAM_EMAILS, prefetch=STREAM_PREFETCH):
+                        self._building.add(record["email"])
+                self.bloom = self._building
+            finally:
+                self._building = None
+        self.counters["rebuilds"] += 1
+        logger.info("Email filter rebuilt with %d emails", self.bloom.items)
+
+    def start(
+        self,
+        pool: asyncpg.Pool,
+        replicas: ReplicaSet | None = None,
+        interval: float | None = None,
+    ) -> None:
+        """Build the filter, then rebuild it about every ``interval`` seconds, in the background."""
+        interval = settings.email_filter_rebuild_seconds if interval is None else interval
+        self._task = asyncio.create_task(self._run(pool, replicas, interval), name="email-filter")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, pool: asyncpg.Pool, replicas: ReplicaSet | None, interval: float) -> None:
+        delay = random.uniform(0, min(STARTUP_JITTER_SECONDS, interval))
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self.rebuild(pool, replicas)
+            except Exception:
+                logger.exception("Email filter rebuild failed")
+            delay = interval * random.uniform(1 - REBUILD_JITTER, 1 + REBUILD_JITTER)
+
+    def stats(self) -> dict[str, float]:
+        """Return size, memory, expected false-positive rate and lookup counters."""
+        stats: dict[str, float] = dict(self.counters)
+        if self.bloom is not None:
+            stats |= {
+                "items": self.bloom.items,
+                "capacity": self.bloom.capacity,
+                "bytes": len(self.bloom.bits),
+                "hashes": self.bloom.hashes,
+                "expected_fp_rate": self.bloom.fp_rate,
+            }
+        return stats
+
+
+email_filter = EmailFilter()
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+
+from app.config import settings
+from app.models.user import UserRecord
+from app.repositories.user_repository import NewUser, UserRepository
+
+logger = logging.getLogger(__name__)
+
+
+class UserInsertBatcher:
+    """Group-commits concurrent user inserts into one set-based statement.
+
+    ``create_user`` calls arriving within ``window_ms`` of each other (or
+    until ``max_size`` are pending) are written together through
+    ``UserRepository.create_users``, using a single pool connection and a
+    single commit. Each caller gets its own row, or None if its email was
+    already taken. If the combined statement fails, the batch is retried
+    row by row so an error only reaches the caller whose row caused it.
+    """
+
+    def __init__(self) -> None:
+        self.repository: UserRepository | None = None
+        self.window = settings.insert_batch_window_ms / 1000
+        self.max_size = settings.insert_batch_max_size
+        self.batches = 0
+        self.rows = 0
+        self._pending: dict[str, tuple[NewUser, asyncio.Future[UserRecord | None]]] = {}
+        self._timer: asyncio.TimerHandle | None = None
+        self._writes: set[asyncio.Task[None]] = set()
+
+    @property
+    def started(self) -> bool:
+        return self.repository is not None
+
+    def start(
+        self,
+        repository: UserRepository,
+        window_ms: float | None = None,
+        max_size: int | None = None,
+    ) -> None:
+        """Begin batching inserts through ``repository``."""
+        self.repository = repository
+        if window_ms is not None:
+            self.window = window_ms / 1000
+        if max_size is not None:
+            self.max_size = max_size
+
+    async def stop(self) -> None:
+        """Flush pending inserts and wait for in-flight batches."""
+        self._flush()
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+        self.repository = None
+
+    async def create_user(self, user: NewUser) -> UserRecord | None:
+        """Queue an insert and wait for the batch containing it to commit."""
+        if user.email in self._pending:
+            # The same email is already in this batch; only one insert can win
+            return None
+
+        future: asyncio.Future[UserRecord | None] = asyncio.get_running_loop().create_future()
+        self._pending[user.email] = (user, future)
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+
+        batch, self._pending = self._pending, {}
+        task = asyncio.create_task(self._write(batch))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def _write(
+        self, batch: dict[str, tuple[NewUser, asyncio.Future[UserRecord | None]]]
+    ) -> None:
+        assert self.repository is not None
+        try:
+            created = await self.repository.create_users([user for user, _ in batch.values()])
+        except Exception as e:
+            if len(batch) > 1:
+                logger.warning("Batched insert of %d users failed, retrying row by row", len(batch))
+                await asyncio.gather(
+                    *(self._write({email: entry}) for email, entry in batch.items())
+                )
+                return
+            for _, future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.rows += len(batch)
+        for email, (_, future) in batch.items():
+            if not future.done():
+                future.set_result(created.get(email))
+
+
+insert_batcher = UserInsertBatcher()
@@ -0,0 +1,73 @@
+from dataclasses import dataclass
+
+import asyncpg
+
+from app.database import Database
+
+CLAIM_BATCH = """
+    UPDATE email_outbox
+    SET available_at = NOW() + make_interval(secs => $2),
+        attempts = attempts + 1
+    WHERE id IN (
+        SELECT id
+        FROM email_outbox
+        WHERE available_at <= NOW()
+        ORDER BY available_at
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, email, activation_code, attempts,
+        EXTRACT(EPOCH FROM NOW() - created_at)::float8 AS age_seconds
+"""
+
+DELETE_MESSAGES = "DELETE FROM email_outbox WHERE id = ANY($1::bigint[])"
+
+RESCHEDULE_MESSAGES = """
+    UPDATE email_outbox
+    SET available_at = NOW() + make_interval(secs => $2)
+    WHERE id = ANY($1::bigint[])
+"""
+
+# Prepared on every new pool connection (see Database.connect)
+STATEMENTS = (CLAIM_BATCH, DELETE_MESSAGES, RESCHEDULE_MESSAGES)
+
+
+@dataclass
+class OutboxMessage:
+    """An activation email claimed from the outbox."""
+
+    id: int
+    email: str
+    activation_code: str
+    attempts: int
+    # Seconds since the row was written, i.e. since its activation code was issued
+    age_seconds: float = 0.0
+
+
+class EmailOutboxRepository:
+    """Data access layer for the email_outbox table.
+
+    Rows are claimed with ``FOR UPDATE SKIP LOCKED`` and leased by pushing
+    ``available_at`` into the future, so several dispatchers (in one process
+    or across replicas) never claim the same row while its lease is live.
+    Delivered rows are deleted.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+
+    async def claim_batch(self, limit: int, lease_seconds: float) -> list[OutboxMessage]:
+        """Claim up to ``limit`` due messages for ``lease_seconds``."""
+        async with Database.acquire(self.pool) as conn:
+            rows = await conn.fetch(CLAIM_BATCH, limit, lease_seconds)
+            return [OutboxMessage(**dict(row)) for row in rows]
+
+    async def delete(self, message_ids: list[int]) -> None:
+        """Remove delivered (or abandoned) messages."""
+        async with Database.acquire(self.pool) as conn:
+            await conn.execute(DELETE_MESSAGES, message_ids)
+
+    async def reschedule(self, message_ids: list[int], delay_seconds: float) -> None:
+        """Make failed messages available again after ``delay_seconds``."""
+        async with Database.acquire(self.pool) as conn:
+            await conn.execute(RESCHEDULE_MESSAGES, message_ids, delay_seconds)
@@ -0,0 +1,227 @@
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Hashable
+from dataclasses import replace
+from datetime import datetime
+from typing import Any, cast
+from uuid import UUID
+
+import asyncpg
+
+from app.config import settings
+from app.database import ReplicaSet
+from app.models.user import ActivationStatus, UserRecord
+from app.repositories.insert_batcher import UserInsertBatcher
+from app.repositories.user_repository import NewUser, UserRepository
+
+_MISSING = object()
+
+
+class UserCache:
+    """Bounded LRU map whose entries expire ``ttl_seconds`` after being stored.
+
+    Every invalidation is stamped with a sequence number per key, so a
+    lookup that started at ``version()`` can tell whether *its* keys were
+    written to since (``changed_since``) and skip storing what it read.
+    Writes to other users do not affect it.
+    """
+
+    def __init__(self, max_size: int | None = None, ttl_seconds: float | None = None):
+        self.max_size = settings.user_cache_max_size if max_size is None else max_size
+        self.ttl = settings.user_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.counters: Counter[str] = Counter()
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._sequence = 0
+        # Last invalidation per key, oldest first; bounded like the entries, with
+        # the newest forgotten stamp kept in _forgotten_up_to
+        self._invalidated: OrderedDict[Hashable, int] = OrderedDict()
+        self._forgotten_up_to = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value, or ``_MISSING`` if absent or expired."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.counters["misses"] += 1
+            return _MISSING
+        self._entries.move_to_end(key)
+        self.counters["hits"] += 1
+        return entry[1]
+
+    def peek(self, key: Hashable) -> Any:
+        """Return the stored value (even if expired) without counting or reordering."""
+        entry = self._entries.get(key)
+        return _MISSING if entry is None else entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def version(self) -> int:
+        """Return the current invalidation sequence number, taken before a lookup."""
+        return self._sequence
+
+    def changed_since(self, version: int, *keys: Hashable) -> bool:
+        """Tell whether any of ``keys`` may have been invalidated after ``version``."""
+        if self._forgotten_up_to > version:
+            return True
+        return any(self._invalidated.get(key, 0) > version for key in keys)
+
+    def discard(self, *keys: Hashable) -> None:
+        self._sequence += 1
+        for key in keys:
+            self._entries.pop(key, None)
+            self._invalidated[key] = self._sequence
+            self._invalidated.move_to_end(key)
+        while len(self._invalidated) > self.max_size:
+            _, sequence = self._invalidated.popitem(last=False)
+            self._forgotten_up_to = sequence
+
+    def clear(self) -> None:
+        self._sequence += 1
+        self._forgotten_up_to = self._sequence
+        self._invalidated.clear()
+        self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        """Return the entry count and hit, miss and eviction totals."""
+        return {"size": len(self._entries), **self.counters}
+
+
+class CachedUserRepository(UserRepository):
+    """UserRepository that answers repeated lookups from a per-process cache.
+
+    ``get_user_by_email``, ``get_user_by_id`` and ``email_exists`` are read
+    through ``cache``, so retries on the auth path skip the pool entirely.
+    Writes made through this repository drop the affected user's entries;
+    writes made by other processes become visible once the TTL runs out.
+    Cached records never carry the activation code or its expiry: codes
+    are always checked by the database (or the code store) itself.
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        insert_batcher: UserInsertBatcher | None = None,
+        replicas: ReplicaSet | None = None,
+        cache: UserCache | None = None,
+    ):
+        super().__init__(pool, insert_batcher, replicas)
+        self.cache = cache or user_cache
+
+    def _store(self, user: UserRecord, version: int) -> None:
+        if self.cache.changed_since(version, ("email", user.email), ("id", user.id)):
+            return  # this user was written to since the lookup started
+        user = replace(user, activation_code=None, activation_code_expires_at=None)
+        self.cache.put(("email", user.email), user)
+        self.cache.put(("id", user.id), user)
+
+    def _forget_email(self, email: str) -> None:
+        cached = self.cache.peek(("email", email))
+        if cached is not _MISSING:
+            self.cache.discard(("id", cached.id))
+        self.cache.discard(("email", email), ("exists", email))
+
+    def invalidate(self, user_id: UUID) -> None:
+        cached = self.cache.peek(("id", user_id))
+        if cached is not _MISSING:
+            self._forget_email(cached.email)
+        self.cache.discard(("id", user_id))
+
+    async def get_user_by_email(self, email: str) -> UserRecord | None:
+        cached = self.cache.get(("email", email))
+        if cached is not _MISSING:
+            return cast(UserRecord, cached)
+        version = self.cache.version()
+        user = await super().get_user_by_email(email)
+        # Unknown emails are not cached: the user may be registering right now
+        if user is not None:
+            self._store(user, version)
+        return user
+
+    async def get_user_by_id(self, user_id: UUID) -> UserRecord | None:
+        cached = self.cache.get(("id", user_id))
+        if cached is not _MISSING:
+            return cast(UserRecord, cached)
+        version = self.cache.version()
+        user = await super().get_user_by_id(user_id)
+        if user is not None:
+            self._store(user, version)
+        return user
+
+    async def email_exists(self, email: str) -> bool:
+        cached = self.cache.get(("exists", email))
+        if cached is not _MISSING:
+            return bool(cached)
+        # Caching False is safe: create_user itself rejects duplicates
+        version = self.cache.version()
+        exists = await super().email_exists(email)
+        if not self.cache.changed_since(version, ("exists", email)):
+            self.cache.put(("exists", email), exists)
+        return exists
+
+    async def create_user(
+        self,
+        email: str,
+        password_hash: str,
+        activation_code: str | None,
+        activation_code_expires_at: datetime | None,
+        queue_email: bool = False,
+    ) -> UserRecord | None:
+        user = await super().create_user(
+            email, password_hash, activation_code, activation_code_expires_at, queue_email
+        )
+        self._forget_email(email)
+        return user
+
+    async def create_users(self, users: list[NewUser]) -> dict[str, UserRecord]:
+        created = await super().create_users(users)
+        for user in users:
+            self._forget_email(user.email)
+        return created
+
+    async def activate_user(self, user_id: UUID) -> bool:
+        try:
+            return await super().activate_user(user_id)
+        finally:
+            self.invalidate(user_id)
+
+    async def activate_user_with_code(self, user_id: UUID, code: str) -> ActivationStatus:
+        try:
+            return await super().activate_user_with_code(user_id, code)
+        finally:
+            self.invalidate(user_id)
+
+    async def update_activation_code(
+        self,
+        user_id: UUID,
+        activation_code: str,
+        activation_code_expires_at: datetime,
+        queue_email: bool = False,
+    ) -> bool:
+        try:
+            return await super().update_activation_code(
+                user_id, activation_code, activation_code_expires_at, queue_email
+            )
+        finally:
+            self.invalidate(user_id)
+
+    async def update_password_hash(self, user_id: UUID, old_hash: str, new_hash: str) -> bool:
+        try:
+            return await super().update_password_hash(user_id, old_hash, new_hash)
+        finally:
+            self.invalidate(user_id)
+
+    async def purge_unactivated(self, older_than_seconds: float, limit: int) -> int:
+        purged = await super().purge_unactivated(older_than_seconds, limit)
+        if purged:
+            self.cache.clear()
+        return purged
+
+
+# Shared by every request in this process
+user_cache = UserCache()
@@ -1,104 +1,388 @@
+from collections.abc import Awaitable, Callable
 from datetime import datetime
+from typing import TYPE_CHECKING, NamedTuple, TypeVar
 from uuid import UUID
 
 import asyncpg
 
-from app.models.user import UserInDB
+from app.database import Database, ReplicaSet
+from app.metrics import timed
+from app.models.user import ActivationStatus, UserRecord
+from app.repositories.email_filter import email_filter
+
+if TYPE_CHECKING:
+    from app.repositories.insert_batcher import UserInsertBatcher
+
+T = TypeVar("T")
+
+
+CREATE_USER = """
+    INSERT INTO users (email, password_hash, activation_code, activation_code_expires_at)
+    VALUES ($1, $2, $3, $4)
+    ON CONFLICT (email) DO NOTHING
+    RETURNING id, email, password_hash, is_active, activation_code,
+              activation_code_expires_at, created_at, updated_at
+"""
+
+# CREATE_USER that also writes the activation email to the outbox
+CREATE_USER_QUEUED = """
+    WITH new_user AS (
+        INSERT INTO users (email, password_hash, activation_code, activation_code_expires_at)
+        VALUES ($1, $2, $3, $4)
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, email, password_hash, is_active, activation_code,
+                  activation_code_expires_at, created_at, updated_at
+    ), outbox AS (
+        INSERT INTO email_outbox (user_id, email, activation_code)
+        SELECT id, email, activation_code FROM new_user
+    )
+    SELECT * FROM new_user
+"""
+
+CREATE_USERS = """
+    INSERT INTO users (email, password_hash, activation_code, activation_code_expires_at)
+    SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::timestamptz[])
+    ON CONFLICT (email) DO NOTHING
+    RETURNING id, email, password_hash, is_active, activation_code,
+              activation_code_expires_at, created_at, updated_at
+"""
+
+# CREATE_USERS that also writes outbox rows for the emails in $5
+CREATE_USERS_QUEUED = """
+    WITH new_users AS (
+        INSERT INTO users (email, password_hash, activation_code, activation_code_expires_at)
+        SELECT * FROM unnest($1::text[], $2::text[], $3::text[], $4::timestamptz[])
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, email, password_hash, is_active, activation_code,
+                  activation_code_expires_at, created_at, updated_at
+    ), outbox AS (
+        INSERT INTO email_outbox (user_id, email, activation_code)
+        SELECT id, email, activation_code FROM new_users WHERE email = ANY($5::text[])
+    )
+    SELECT * FROM new_users
+"""
+
+GET_USER_BY_EMAIL = """
+    SELECT id, email, password_hash, is_active, activation_code,
+           activation_code_expires_at, created_at, updated_at
+    FROM users
+    WHERE email = $1
+"""
+
+GET_USER_BY_ID = """
+    SELECT id, email, password_hash, is_active, activation_code,
+           activation_code_expires_at, created_at, updated_at
+    FROM users
+    WHERE id = $1
+"""
+
+ACTIVATE_USER = """
+    UPDATE users
+    SET is_active = TRUE,
+        activation_code = NULL,
+        activation_code_expires_at = NULL,
+        updated_at = NOW()
+    WHERE id = $1
+    RETURNING id
+"""
+
+ACTIVATE_USER_WITH_CODE = """
+    WITH activated AS (
+        UPDATE users
+        SET is_active = TRUE,
+            activation_code = NULL,
+            activation_code_expires_at = NULL,
+            updated_at = NOW()
+        WHERE id = $1
+          AND activation_code = $2
+          AND activation_code_expires_at > NOW()
+          AND NOT is_active
+        RETURNING id
+    )
+    SELECT CASE
+        WHEN EXISTS (SELECT 1 FROM activated) THEN 'activated'
+        WHEN is_active THEN 'already_active'
+        WHEN activation_code = $2 AND activation_code_expires_at <= NOW() THEN 'expired'
+        -- Wrong code, no code, or a code replaced by a concurrent resend
+        ELSE 'invalid_code'
+    END
+    FROM users
+    WHERE id = $1
+"""
+
+UPDATE_ACTIVATION_CODE = """
+    UPDATE users
+    SET activation_code = $2,
+        activation_code_expires_at = $3,
+        updated_at = NOW()
+    WHERE id = $1
+    RETURNING id
+"""
+
+# UPDATE_ACTIVATION_CODE that also replaces the user's unsent outbox email
+UPDATE_ACTIVATION_CODE_QUEUED = """
+    WITH updated AS (
+        UPDATE users
+        SET activation_code = $2,
+            activation_code_expires_at = $3,
+            updated_at = NOW()
+        WHERE id = $1
+        RETURNING id, email, activation_code
+    ), superseded AS (
+        DELETE FROM email_outbox WHERE user_id = $1
+    ), outbox AS (
+        INSERT INTO email_outbox (user_id, email, activation_code)
+        SELECT id, email, activation_code FROM updated
+    )
+    SELECT id FROM updated
+"""
+
+UPDATE_PASSWORD_HASH = """
+    UPDATE users
+    SET password_hash = $3,
+        updated_at = NOW()
+    WHERE id = $1 AND password_hash = $2
+"""
+
+EXISTING_EMAILS = "SELECT email FROM users WHERE email = ANY($1::text[])"
+
+EMAIL_EXISTS = "SELECT EXISTS(SELECT 1 FROM users WHERE email = $1)"
+
+CLEAR_EXPIRED_CODES = """
+    UPDATE users
+    SET activation_code = NULL,
+        activation_code_expires_at = NULL
+    WHERE id IN (
+        SELECT id
+        FROM users
+        WHERE NOT is_active
+          AND activation_code_expires_at < NOW() - make_interval(secs => $1)
+        LIMIT $2
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+PURGE_UNACTIVATED = """
+    DELETE FROM users
+    WHERE id IN (
+        SELECT id
+        FROM users
+        WHERE NOT is_active
+          AND created_at < NOW() - make_interval(secs => $1)
+        LIMIT $2
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+# Prepared on every new pool connection (see Database.connect)
+STATEMENTS = (
+    CREATE_USER,
+    CREATE_USERS,
+    GET_USER_BY_EMAIL,
+    GET_USER_BY_ID,
+    ACTIVATE_USER,
+    ACTIVATE_USER_WITH_CODE,
+    UPDATE_ACTIVATION_CODE,
+    UPDATE_PASSWORD_HASH,
+    EXISTING_EMAILS,
+    EMAIL_EXISTS,
+    CLEAR_EXPIRED_CODES,
+    PURGE_UNACTIVATED,
+)
+# Statements writing to email_outbox (migration 002), prepared only with EMAIL_DELIVERY=outbox
+OUTBOX_STATEMENTS = (CREATE_USER_QUEUED, CREATE_USERS_QUEUED, UPDATE_ACTIVATION_CODE_QUEUED)
+# Read-only statements, also prepared on replica connections
+READ_STATEMENTS = (GET_USER_BY_EMAIL, GET_USER_BY_ID, EXISTING_EMAILS, EMAIL_EXISTS)
+
+
+class NewUser(NamedTuple):
+    """A user row to be inserted."""
+
+    email: str
+    password_hash: str
+    activation_code: str | None
+    activation_code_expires_at: datetime | None
+    queue_email: bool = False
 
 
 class UserRepository:
-    """Data access layer for user operations using raw SQL."""
+    """Data access layer for user operations using raw SQL.
+
+    Read-only methods go through ``Database.read()``, which picks a healthy
+    replica when ``replicas`` are configured, unless the caller is inside
+    ``Database.read_your_writes()``, and falls back to the primary when the
+    replica fails. Everything else uses the primary.
+    """
 
-    def __init__(self, pool: asyncpg.Pool):
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        insert_batcher: "UserInsertBatcher | None" = None,
+        replicas: ReplicaSet | None = None,
+    ):
         self.pool = pool
+        self.insert_batcher = insert_batcher
+        self.replicas = replicas
+
+    async def _read(self, query: Callable[[asyncpg.Connection], Awaitable[T]]) -> T:
+        return await Database.read(self.pool, self.replicas, query)
 
+    def invalidate(self, user_id: UUID) -> None:
+        """Drop cached state for a user written outside this repository (nothing to drop here)."""
+
+    @timed("db.create_user")
     async def create_user(
         self,
         email: str,
         password_hash: str,
-        activation_code: str,
-        activation_code_expires_at: datetime,
-    ) -> UserInDB:
-        """Create a new user in the database."""
-        query = """
-            INSERT INTO users (email, password_hash, activation_code, activation_code_expires_at)
-            VALUES ($1, $2, $3, $4)
-            RETURNING id, email, password_hash, is_active, activation_code,
-                      activation_code_expires_at, created_at, updated_at
+        activation_code: str | None,
+        activation_code_expires_at: datetime | None,
+        queue_email: bool = False,
+    ) -> UserRecord | None:
+        """Create a new user in the database.
+
+        Returns None, without raising, if the email is already registered.
+        With ``queue_email`` the activation email is written to the outbox
+        in the same statement, so it is committed together with the user.
         """
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(
-                query, email, password_hash, activation_code, activation_code_expires_at
+        if self.insert_batcher is not None:
+            return await self.insert_batcher.create_user(
+                NewUser(
+                    email, password_hash, activation_code, activation_code_expires_at, queue_email
+                )
             )
-            return UserInDB(**dict(row))
 
-    async def get_user_by_email(self, email: str) -> UserInDB | None:
-        """Retrieve a user by email address."""
-        query = """
-            SELECT id, email, password_hash, is_active, activation_code,
-                   activation_code_expires_at, created_at, updated_at
-            FROM users
-            WHERE email = $1
-        """
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(query, email)
+        async with Database.acquire(self.pool) as conn:
+            row = await conn.fetchrow(
+                CREATE_USER_QUEUED if queue_email else CREATE_USER,
+                email,
+                password_hash,
+                activation_code,
+                activation_code_expires_at,
+            )
             if row:
-                return UserInDB(**dict(row))
+                email_filter.add(email)
+                return UserRecord.from_row(row)
             return None
 
-    async def get_user_by_id(self, user_id: UUID) -> UserInDB | None:
-        """Retrieve a user by ID."""
-        query = """
-            SELECT id, email, password_hash, is_active, activation_code,
-                   activation_code_expires_at, created_at, updated_at
-            FROM users
-            WHERE id = $1
+    @timed("db.create_users")
+    async def create_users(self, users: list[NewUser]) -> dict[str, UserRecord]:
+        """Insert many users in one statement, keyed by email in the result.
+
+        Emails that are already registered are skipped and absent from the
+        result. Outbox rows are written for users with ``queue_email`` set.
         """
-        async with self.pool.acquire() as conn:
-            row = await conn.fetchrow(query, user_id)
-            if row:
-                return UserInDB(**dict(row))
-            return None
+        columns = (
+            [user.email for user in users],
+            [user.password_hash for user in users],
+            [user.activation_code for user in users],
+            [user.activation_code_expires_at for user in users],
+        )
+        queued = [user.email for user in users if user.queue_email]
+        async with Database.acquire(self.pool) as conn:
+            if queued:
+                rows = await conn.fetch(CREATE_USERS_QUEUED, *columns, queued)
+            else:
+                rows = await conn.fetch(CREATE_USERS, *columns)
+            for row in rows:
+                email_filter.add(row["email"])
+            return {row["email"]: UserRecord.from_row(row) for row in rows}
+
+    @timed("db.get_user_by_email")
+    async def get_user_by_email(self, email: str) -> UserRecord | None:
+        """Retrieve a user by email address."""
+        row = await self._read(lambda conn: conn.fetchrow(GET_USER_BY_EMAIL, email))
+        if row:
+            return UserRecord.from_row(row)
+        return None
+
+    @timed("db.get_user_by_id")
+    async def get_user_by_id(self, user_id: UUID) -> UserRecord | None:
+        """Retrieve a user by ID."""
+        row = await self._read(lambda conn: conn.fetchrow(GET_USER_BY_ID, user_id))
+        if row:
+            return UserRecord.from_row(row)
+        return None
 
+    @timed("db.activate_user")
     async def activate_user(self, user_id: UUID) -> bool:
         """Activate a user account and clear the activation code."""
-        query = """
-            UPDATE users
-            SET is_active = TRUE,
-                activation_code = NULL,
-                activation_code_expires_at = NULL,
-                updated_at = NOW()
-            WHERE id = $1
-            RETURNING id
-        """
-        async with self.pool.acquire() as conn:
-            result = await conn.fetchrow(query, user_id)
+        async with Database.acquire(self.pool) as conn:
+            result = await conn.fetchrow(ACTIVATE_USER, user_id)
             return result is not None
 
+    @timed("db.activate_user_with_code")
+    async def activate_user_with_code(self, user_id: UUID, code: str) -> ActivationStatus:
+        """Activate a user if the code matches and has not expired, in one statement.
+
+        The update only applies when the code, expiry and inactive state all
+        hold at write time; otherwise the returned status says which check
+        failed, so callers need no separate read.
+        """
+        async with Database.acquire(self.pool) as conn:
+            result = await conn.fetchval(ACTIVATE_USER_WITH_CODE, user_id, code)
+            if result is None:
+                return ActivationStatus.NOT_FOUND
+            return ActivationStatus(result)
+
+    @timed("db.update_activation_code")
     async def update_activation_code(
         self,
         user_id: UUID,
         activation_code: str,
         activation_code_expires_at: datetime,
+        queue_email: bool = False,
     ) -> bool:
-        """Update the activation code for a user."""
-        query = """
-            UPDATE users
-            SET activation_code = $2,
-                activation_code_expires_at = $3,
-                updated_at = NOW()
-            WHERE id = $1
-            RETURNING id
+        """Update the activation code for a user.
+
+        With ``queue_email`` the new code's email replaces any unsent one in
+        the outbox, in the same statement as the update.
         """
-        async with self.pool.acquire() as conn:
+        async with Database.acquire(self.pool) as conn:
             result = await conn.fetchrow(
-                query, user_id, activation_code, activation_code_expires_at
+                UPDATE_ACTIVATION_CODE_QUEUED if queue_email else UPDATE_ACTIVATION_CODE,
+                user_id,
+                activation_code,
+                activation_code_expires_at,
             )
             return result is not None
 
+    @timed("db.update_password_hash")
+    async def update_password_hash(self, user_id: UUID, old_hash: str, new_hash: str) -> bool:
+        """Replace a user's password hash, unless it changed since ``old_hash`` was read."""
+        async with Database.acquire(self.pool) as conn:
+            status = await conn.execute(UPDATE_PASSWORD_HASH, user_id, old_hash, new_hash)
+            return int(status.split()[-1]) == 1
+
+    @timed("db.existing_emails")
+    async def existing_emails(self, emails: list[str]) -> set[str]:
+        """Return which of the given emails are already registered."""
+        rows = await self._read(lambda conn: conn.fetch(EXISTING_EMAILS, emails))
+        return {row["email"] for row in rows}
+
+    @timed("db.email_exists")
     async def email_exists(self, email: str) -> bool:
         """Check if an email already exists in the database."""
-        query = "SELECT EXISTS(SELECT 1 FROM users WHERE email = $1)"
-        async with self.pool.acquire() as conn:
-            result = await conn.fetchval(query, email)
-            return bool(result)
+        result = await self._read(lambda conn: conn.fetchval(EMAIL_EXISTS, email))
+        return bool(result)
+
+    @timed("db.clear_expired_codes")
+    async def clear_expired_codes(self, grace_seconds: float, limit: int) -> int:
+        """Clear up to ``limit`` codes that expired more than ``grace_seconds`` ago.
+
+        Rows locked by concurrent requests are skipped rather than waited on.
+        Returns the number of rows cleared.
+        """
+        async with Database.acquire(self.pool) as conn:
+            status = await conn.execute(CLEAR_EXPIRED_CODES, grace_seconds, limit)
+            return int(status.split()[-1])
+
+    @timed("db.purge_unactivated")
+    async def purge_unactivated(self, older_than_seconds: float, limit: int) -> int:
+        """Delete up to ``limit`` never-activated users created over ``older_than_seconds`` ago.
+
+        Returns the number of users deleted.
+        """
+        async with Database.acquire(self.pool) as conn:
+            status = await conn.execute(PURGE_UNACTIVATED, older_than_seconds, limit)
+            return int(status.split()[-1])
@@ -1,22 +1,37 @@
-from typing import Annotated
+from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Header, Query, Request, status
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from pydantic import BaseModel
+from pydantic import BaseModel, EmailStr, ValidationError
 
-from app.dependencies import get_user_service
+from app.dependencies import get_user_service, require_partner_key
 from app.models.user import (
     ActivationRequest,
     ActivationResponse,
+    BatchItemStatus,
+    BatchRegistrationItem,
+    BatchRegistrationRequest,
+    BatchRegistrationResponse,
+    EmailAvailabilityResponse,
     UserRegistrationRequest,
     UserRegistrationResponse,
 )
+from app.services.idempotency import idempotency
 from app.services.user_service import UserService
 
 router = APIRouter(prefix="/users", tags=["users"])
 security = HTTPBasic()
 
 
+def client_ip(http_request: Request) -> str | None:
+    """Return the client address used as the rate-limit key.
+
+    Behind a trusted proxy (FORWARDED_ALLOW_IPS) uvicorn has already replaced
+    the peer address with the client from X-Forwarded-For.
+    """
+    return http_request.client.host if http_request.client else None
+
+
 @router.post(
     "/register",
     response_model=UserRegistrationResponse,
@@ -25,17 +40,110 @@ security = HTTPBasic()
 async def register_user(
     request: UserRegistrationRequest,
     user_service: Annotated[UserService, Depends(get_user_service)],
-) -> UserRegistrationResponse:
+    ip: Annotated[str | None, Depends(client_ip)],
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
+) -> Any:
     """
     Register a new user.
 
     - Creates a new user account with the provided email and password
     - Sends a 4-digit activation code to the user's email
     - The activation code expires after 1 minute
+    - Returns 429 when the client or email is over its rate limit
+    - A retry with the same Idempotency-Key replays the first successful response
+    """
+    return await idempotency.run(
+        idempotency_key,
+        f"register:{request.email}",
+        idempotency.fingerprint(request.model_dump_json()),
+        status.HTTP_201_CREATED,
+        lambda: user_service.register_user(
+            email=request.email,
+            password=request.password,
+            client_ip=ip,
+        ),
+    )
+
+
+@router.get(
+    "/email-available",
+    response_model=EmailAvailabilityResponse,
+    status_code=status.HTTP_200_OK,
+)
+async def email_available(
+    email: Annotated[EmailStr, Query()],
+    user_service: Annotated[UserService, Depends(get_user_service)],
+) -> EmailAvailabilityResponse:
+    """
+    Check whether an email can still be registered.
+
+    - Meant for signup forms checking as the user types
+    - Most unregistered emails are answered from memory, without a database query
+    - Advisory only: registration still rejects duplicates
+    """
+    return EmailAvailabilityResponse(
+        email=email, available=await user_service.email_available(email)
+    )
+
+
+@router.post(
+    "/register:batch",
+    response_model=BatchRegistrationResponse,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_partner_key)],
+)
+async def register_users_batch(
+    request: BatchRegistrationRequest,
+    user_service: Annotated[UserService, Depends(get_user_service)],
+    ip: Annotated[str | None, Depends(client_ip)],
+) -> BatchRegistrationResponse:
+    """
+    Register many users in one request.
+
+    - Partner endpoint: requires an X-API-Key header with a configured key
+    - Each entry is validated like a single registration
+    - Invalid or duplicate entries are reported without failing the batch
+    - Activation codes are sent to every created user
+    - Every entry is charged to the client's rate limit; 429 once it is used up
     """
-    return await user_service.register_user(
-        email=request.email,
-        password=request.password,
+    results: list[BatchRegistrationItem] = []
+    valid: list[tuple[int, UserRegistrationRequest]] = []
+    for index, item in enumerate(request.users):
+        try:
+            valid.append((index, UserRegistrationRequest.model_validate(item)))
+        except ValidationError as e:
+            email = item.get("email") if isinstance(item, dict) else None
+            results.append(
+                BatchRegistrationItem(
+                    index=index,
+                    status=BatchItemStatus.INVALID,
+                    email=email if isinstance(email, str) else None,
+                    error=e.errors()[0]["msg"],
+                )
+            )
+
+    user_ids = await user_service.register_users(
+        [(user.email, user.password) for _, user in valid], client_ip=ip
+    )
+    for (index, user), user_id in zip(valid, user_ids, strict=True):
+        results.append(
+            BatchRegistrationItem(
+                index=index,
+                status=BatchItemStatus.CREATED if user_id else BatchItemStatus.DUPLICATE,
+                email=user.email,
+                id=user_id,
+            )
+        )
+
+    results.sort(key=lambda result: result.index)
+    counts = {item_status: 0 for item_status in BatchItemStatus}
+    for result in results:
+        counts[result.status] += 1
+    return BatchRegistrationResponse(
+        created=counts[BatchItemStatus.CREATED],
+        duplicate=counts[BatchItemStatus.DUPLICATE],
+        invalid=counts[BatchItemStatus.INVALID],
+        results=results,
     )
 
 
@@ -48,6 +156,7 @@ async def activate_user(
     request: ActivationRequest,
     credentials: Annotated[HTTPBasicCredentials, Depends(security)],
     user_service: Annotated[UserService, Depends(get_user_service)],
+    ip: Annotated[str | None, Depends(client_ip)],
 ) -> ActivationResponse:
     """
     Activate a user account.
@@ -60,6 +169,7 @@ async def activate_user(
         email=credentials.username,
         password=credentials.password,
         code=request.code,
+        client_ip=ip,
     )
     return ActivationResponse()
 
@@ -78,7 +188,9 @@ class ResendCodeResponse(BaseModel):
 async def resend_activation_code(
     credentials: Annotated[HTTPBasicCredentials, Depends(security)],
     user_service: Annotated[UserService, Depends(get_user_service)],
-) -> ResendCodeResponse:
+    ip: Annotated[str | None, Depends(client_ip)],
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
+) -> Any:
     """
     Resend activation code.
 
@@ -86,9 +198,22 @@ async def resend_activation_code(
     - Generates a new 4-digit activation code
     - Sends the new code to the user's email
     - The new code expires after 1 minute
+    - A retry with the same Idempotency-Key replays the first successful response
+      instead of sending another code
     """
-    await user_service.resend_activation_code(
-        email=credentials.username,
-        password=credentials.password,
+
+    async def resend() -> ResendCodeResponse:
+        await user_service.resend_activation_code(
+            email=credentials.username,
+            password=credentials.password,
+            client_ip=ip,
+        )
+        return ResendCodeResponse()
+
+    return await idempotency.run(
+        idempotency_key,
+        f"resend:{credentials.username}",
+        idempotency.fingerprint(credentials.username, credentials.password),
+        status.HTTP_200_OK,
+        resend,
     )
-    return ResendCodeResponse()
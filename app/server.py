@@ -0,0 +1,287 @@
+"""Production entry point: pre-fork N uvicorn workers behind one port.
+
+Every worker is a separate process with its own event loop (uvloop and
+httptools), asyncpg pool and hashing executor, so bcrypt and JSON work
+spread over all cores. The Postgres connection budget and the CPU cores
+are divided between the workers. Workers either accept from one socket
+bound here, or (with SERVER_REUSE_PORT) each bind their own SO_REUSEPORT
+socket and let the kernel balance connections between them.
+
+SIGTERM or SIGINT stops accepting connections, lets in-flight requests
+finish for up to SERVER_GRACEFUL_SHUTDOWN_SECONDS and runs the lifespan
+shutdown in every worker. A worker that dies is replaced, with exponential
+backoff while it keeps dying right after starting; after MAX_QUICK_EXITS
+such failures in a row the server stops and exits with status 1.
+
+    python -m app.server
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing.context import SpawnProcess
+from types import FrameType
+
+import uvicorn
+from uvicorn.main import STARTUP_FAILURE
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Extra time given to a draining worker for its lifespan shutdown before it is killed
+SHUTDOWN_MARGIN_SECONDS = 10.0
+# A worker exiting this soon after it started counts as a failed start (e.g. the
+# database is unreachable); restarts after failed starts back off exponentially
+QUICK_EXIT_SECONDS = 10.0
+MAX_QUICK_EXITS = 5
+RESTART_BACKOFF_SECONDS = 0.5
+MAX_RESTART_BACKOFF_SECONDS = 30.0
+
+
+@dataclass(frozen=True)
+class WorkerPlan:
+    """Per-worker share of the connection budget and of the CPU cores."""
+
+    workers: int
+    db_pool_min_size: int
+    db_pool_max_size: int
+    hash_workers: int
+
+
+def plan_workers(workers: int | None = None, cpu_count: int | None = None) -> WorkerPlan:
+    """Split ``settings.db_connection_budget`` and the cores between the workers.
+
+    Without a budget every worker keeps ``db_pool_max_size``. Hashing
+    executors share the cores instead of each taking all of them, unless
+    ``hash_workers`` is set explicitly.
+    """
+    cpu_count = cpu_count or os.cpu_count() or 1
+    workers = workers or settings.server_workers or cpu_count
+    pool_max_size = settings.db_pool_max_size
+    if settings.db_connection_budget:
+        if settings.db_connection_budget < workers:
+            raise ValueError(
+                f"DB_CONNECTION_BUDGET={settings.db_connection_budget} "
+                f"leaves no connection for some of the {workers} workers"
+            )
+        pool_max_size = settings.db_connection_budget // workers
+    return WorkerPlan(
+        workers=workers,
+        db_pool_min_size=min(settings.db_pool_min_size, pool_max_size),
+        db_pool_max_size=pool_max_size,
+        hash_workers=settings.hash_workers or max(1, cpu_count // workers),
+    )
+
+
+def bind_socket(reuse_port: bool) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((settings.server_host, settings.server_port))
+    sock.set_inheritable(True)
+    return sock
+
+
+@dataclass
+class _Worker:
+    index: int
+    plan: WorkerPlan
+    server: uvicorn.Server
+    started: float
+
+
+# Set in worker processes only
+_worker: _Worker | None = None
+
+
+def worker_stats() -> dict[str, float]:
+    """Return this worker's index, pid, pool size and request totals.
+
+    Empty when the app is not running under ``python -m app.server``.
+    """
+    if _worker is None:
+        return {}
+    state = _worker.server.server_state
+    return {
+        "index": _worker.index,
+        "pid": os.getpid(),
+        "workers": _worker.plan.workers,
+        "uptime_seconds": time.monotonic() - _worker.started,
+        "db_pool_max_size": _worker.plan.db_pool_max_size,
+        "hash_workers": _worker.plan.hash_workers,
+        "connections": len(state.connections),
+        "requests": state.total_requests,
+    }
+
+
+def worker_config() -> uvicorn.Config:
+    """uvicorn settings of every worker.
+
+    Requests from FORWARDED_ALLOW_IPS take their client address from
+    X-Forwarded-For, so per-IP rate limits see clients, not the proxy.
+    """
+    return uvicorn.Config(
+        "app.main:app",
+        loop="uvloop",
+        http="httptools",
+        ws="none",
+        lifespan="on",
+        access_log=False,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.forwarded_allow_ips,
+        timeout_graceful_shutdown=int(settings.server_graceful_shutdown_seconds),
+    )
+
+
+def _run_worker(index: int, plan: WorkerPlan, sock: socket.socket | None) -> None:
+    """Worker process body: apply the plan, then serve until told to stop."""
+    global _worker
+    settings.db_pool_min_size = plan.db_pool_min_size
+    settings.db_pool_max_size = plan.db_pool_max_size
+    settings.hash_workers = plan.hash_workers
+    server = uvicorn.Server(worker_config())
+    _worker = _Worker(index, plan, server, time.monotonic())
+    if sock is None:
+        sock = bind_socket(reuse_port=True)
+    # uvicorn installs SIGTERM/SIGINT handlers that stop accepting and drain
+    server.run(sockets=[sock])
+    if not server.started:
+        # Lifespan startup failed; report it like `uvicorn` does
+        sys.exit(STARTUP_FAILURE)
+
+
+class Supervisor:
+    """Starts the workers, replaces dead ones and stops them all on a signal.
+
+    A worker that keeps exiting right after starting is restarted after
+    0.5, 1, 2, ... seconds; after MAX_QUICK_EXITS failed starts in a row
+    the supervisor gives up, so the container exits instead of looping.
+    """
+
+    def __init__(self, plan: WorkerPlan, reuse_port: bool):
+        self.plan = plan
+        self.reuse_port = reuse_port
+        # Bound before any worker starts, so a port in use fails here. With
+        # SO_REUSEPORT it is closed once the workers have bound their own
+        self.sock = bind_socket(reuse_port)
+        self.context = multiprocessing.get_context("spawn")
+        self.processes: list[SpawnProcess] = []
+        self.started_at = [0.0] * plan.workers
+        self.restart_at: list[float | None] = [None] * plan.workers
+        self.quick_exits = [0] * plan.workers
+        self.restarts = 0
+        self._stop = threading.Event()
+
+    def _spawn(self, index: int) -> SpawnProcess:
+        process = self.context.Process(
+            target=_run_worker,
+            args=(index, self.plan, None if self.reuse_port else self.sock),
+            name=f"worker-{index}",
+        )
+        process.start()
+        self.started_at[index] = time.monotonic()
+        self.restart_at[index] = None
+        logger.info("Started worker %d (pid %s)", index, process.pid)
+        return process
+
+    def _handle_signal(self, signum: int, frame: FrameType | None) -> None:
+        self._stop.set()
+
+    def run(self) -> int:
+        """Serve until a signal (returns 0) or until workers keep failing (returns 1)."""
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self._handle_signal)
+        self.processes = [self._spawn(index) for index in range(self.plan.workers)]
+        if self.reuse_port:
+            self.sock.close()
+        exit_code = 0
+        while not self._stop.wait(0.5):
+            if not self.check_workers():
+                exit_code = 1
+                break
+        self.stop()
+        return exit_code
+
+    def check_workers(self) -> bool:
+        """Schedule or perform restarts of dead workers; False means give up."""
+        now = time.monotonic()
+        for index, process in enumerate(self.processes):
+            if process.is_alive():
+                continue
+            restart_at = self.restart_at[index]
+            if restart_at is None:
+                if now - self.started_at[index] < QUICK_EXIT_SECONDS:
+                    self.quick_exits[index] += 1
+                else:
+                    self.quick_exits[index] = 0
+                if self.quick_exits[index] >= MAX_QUICK_EXITS:
+                    logger.error(
+                        "Worker %d failed %d times in a row right after starting, giving up",
+                        index,
+                        self.quick_exits[index],
+                    )
+                    return False
+                delay = 0.0
+                if self.quick_exits[index]:
+                    delay = min(
+                        MAX_RESTART_BACKOFF_SECONDS,
+                        RESTART_BACKOFF_SECONDS * 2 ** (self.quick_exits[index] - 1),
+                    )
+                logger.warning(
+                    "Worker %d exited with %s, restarting in %.1fs", index, process.exitcode, delay
+                )
+                self.restart_at[index] = now + delay
+            elif now >= restart_at:
+                self.restarts += 1
+                self.processes[index] = self._spawn(index)
+        return True
+
+    def stop(self) -> None:
+        """Ask every worker to drain, then kill any that outlive the deadline."""
+        logger.info("Stopping %d workers", len(self.processes))
+        for process in self.processes:
+            if process.is_alive() and process.pid is not None:
+                os.kill(process.pid, signal.SIGTERM)
+        deadline = (
+            time.monotonic() + settings.server_graceful_shutdown_seconds + SHUTDOWN_MARGIN_SECONDS
+        )
+        for process in self.processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Worker %s did not stop in time, killing it", process.name)
+                process.kill()
+                process.join()
+        if not self.reuse_port:
+            self.sock.close()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    plan = plan_workers()
+    if plan.workers > 1 and settings.activation_code_store == "memory":
+        raise SystemExit("ACTIVATION_CODE_STORE=memory cannot be shared by several workers")
+    logger.info(
+        "Serving on %s:%d with %d workers, %d database connections and %d hash workers each",
+        settings.server_host,
+        settings.server_port,
+        plan.workers,
+        plan.db_pool_max_size,
+        plan.hash_workers,
+    )
+    raise SystemExit(Supervisor(plan, settings.server_reuse_port).run())
+
+
+if __name__ == "__main__":
+    # Go through the importable module: workers then run app.server._run_worker,
+    # the same module app.main reads worker_stats from, not this __main__ copy
+    from app.server import main as run
+
+    run()
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from collections import Counter
+from collections.abc import Awaitable, Callable
+
+from app.config import settings
+from app.repositories.activation_code_store import ActivationCodeStore
+from app.repositories.user_repository import UserRepository
+
+logger = logging.getLogger(__name__)
+
+
+class ActivationCodeSweeper:
+    """Background task that clears expired activation codes from the code store.
+
+    Every ``interval`` seconds it clears codes that expired more than
+    ``grace_seconds`` ago and, when ``retention_seconds`` is set, deletes
+    accounts that were never activated within that period. Work is done in
+    batches of ``batch_size`` rows, each its own short statement that skips
+    locked rows, with ``batch_pause`` seconds between batches so the sweeper
+    never holds locks for long or crowds out registration traffic.
+    """
+
+    def __init__(self, repository: UserRepository, code_store: ActivationCodeStore):
+        self.repository = repository
+        self.code_store = code_store
+        self.counters: Counter[str] = Counter()
+        self.interval = settings.code_sweeper_interval_seconds
+        self.batch_size = settings.code_sweeper_batch_size
+        self.batch_pause = settings.code_sweeper_batch_pause_seconds
+        self.grace_seconds = settings.expired_code_grace_seconds
+        self.retention_seconds = settings.unactivated_account_retention_seconds
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        """Start the sweep loop."""
+        self._task = asyncio.create_task(self._run(), name="activation-code-sweeper")
+
+    async def stop(self) -> None:
+        """Stop the sweep loop; an in-progress batch is rolled back."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except Exception:
+                logger.exception("Activation code sweep failed")
+            await asyncio.sleep(self.interval)
+
+    async def sweep(self) -> None:
+        """Run one full sweep, batch by batch, until nothing is left to do."""
+        if self.retention_seconds > 0:
+            await self._drain(
+                lambda: self.repository.purge_unactivated(self.retention_seconds, self.batch_size),
+                "purged",
+            )
+        await self._drain(
+            lambda: self.code_store.clear_expired(self.grace_seconds, self.batch_size),
+            "cleared",
+        )
+
+    async def _drain(self, batch: Callable[[], Awaitable[int]], counter: str) -> None:
+        while True:
+            affected = await batch()
+            self.counters[counter] += affected
+            if affected < self.batch_size:
+                return
+            await asyncio.sleep(self.batch_pause)
@@ -0,0 +1,110 @@
+import asyncio
+import logging
+from collections import Counter
+
+from app.config import settings
+from app.services.email_service import EmailServiceInterface, SMTPEmailService
+from app.services.smtp_pool import smtp_pool
+
+logger = logging.getLogger(__name__)
+
+
+class QueuedEmailService(EmailServiceInterface):
+    """Email service that hands activation emails to background workers.
+
+    Wraps another ``EmailServiceInterface`` implementation. Once started,
+    ``send_activation_code`` only enqueues the message and returns; worker
+    tasks deliver it through the wrapped backend, retrying with exponential
+    backoff. Before ``start`` (or after ``stop``), and whenever the queue is
+    full, messages are sent inline so that no activation code is dropped.
+    """
+
+    def __init__(self, backend: EmailServiceInterface):
+        self.backend = backend
+        self.counters: Counter[str] = Counter()
+        self._queue: asyncio.Queue[tuple[str, str]] | None = None
+        self._workers: list[asyncio.Task[None]] = []
+        self.max_attempts = settings.email_max_attempts
+        self.retry_backoff = settings.email_retry_backoff_seconds
+
+    @property
+    def started(self) -> bool:
+        return self._queue is not None
+
+    def start(self, workers: int | None = None, queue_size: int | None = None) -> None:
+        """Create the queue and spawn the worker tasks."""
+        workers = workers or settings.email_queue_workers
+        queue_size = settings.email_queue_size if queue_size is None else queue_size
+        self._queue = asyncio.Queue(maxsize=queue_size)
+        self._workers = [
+            asyncio.create_task(self._worker(self._queue), name=f"email-worker-{i}")
+            for i in range(workers)
+        ]
+
+    async def stop(self, timeout: float | None = None) -> None:
+        """Stop accepting messages, drain the queue and stop the workers."""
+        queue, self._queue = self._queue, None
+        if queue is None:
+            return
+
+        timeout = settings.email_drain_timeout_seconds if timeout is None else timeout
+        try:
+            await asyncio.wait_for(queue.join(), timeout)
+        except TimeoutError:
+            self.counters["abandoned"] += queue.qsize()
+            logger.warning("Email queue drain timed out with %d messages left", queue.qsize())
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def qsize(self) -> int:
+        """Number of messages waiting for a worker."""
+        return self._queue.qsize() if self._queue else 0
+
+    async def send_activation_code(self, email: str, code: str) -> bool:
+        """Queue an activation code for delivery."""
+        if self._queue is None:
+            return await self._deliver(email, code)
+
+        try:
+            self._queue.put_nowait((email, code))
+        except asyncio.QueueFull:
+            self.counters["overflow"] += 1
+            return await self._deliver(email, code)
+
+        self.counters["queued"] += 1
+        return True
+
+    async def _worker(self, queue: asyncio.Queue[tuple[str, str]]) -> None:
+        while True:
+            email, code = await queue.get()
+            try:
+                await self._deliver(email, code)
+            except Exception:
+                logger.exception("Unexpected error delivering activation code to %s", email)
+                self.counters["failed"] += 1
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, email: str, code: str) -> bool:
+        """Send through the backend, retrying failed attempts with backoff."""
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.counters["retried"] += 1
+                await asyncio.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            if await self.backend.send_activation_code(email, code):
+                self.counters["sent"] += 1
+                return True
+
+        self.counters["failed"] += 1
+        logger.error(
+            "Giving up on activation code for %s after %d attempts", email, self.max_attempts
+        )
+        return False
+
+
+email_dispatcher = QueuedEmailService(
+    SMTPEmailService(pool=smtp_pool if settings.smtp_pool_size else None)
+)
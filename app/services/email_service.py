@@ -1,9 +1,14 @@
+import logging
 from abc import ABC, abstractmethod
 from email.mime.text import MIMEText
 
 import aiosmtplib
 
 from app.config import settings
+from app.metrics import timed
+from app.services.smtp_pool import SMTPConnectionPool
+
+logger = logging.getLogger(__name__)
 
 
 class EmailServiceInterface(ABC):
@@ -14,16 +19,27 @@ class EmailServiceInterface(ABC):
         """Send an activation code to the user's email."""
         pass
 
+    async def send_many(self, messages: list[tuple[str, str]]) -> list[bool]:
+        """Send several (email, code) activation messages, one result per message."""
+        return [await self.send_activation_code(email, code) for email, code in messages]
+
 
 class SMTPEmailService(EmailServiceInterface):
     """SMTP email service implementation using MailHog."""
 
-    def __init__(self, host: str | None = None, port: int | None = None):
+    def __init__(
+        self,
+        host: str | None = None,
+        port: int | None = None,
+        pool: SMTPConnectionPool | None = None,
+    ):
         self.host = host or settings.smtp_host
         self.port = port or settings.smtp_port
+        self.pool = pool
 
-    async def send_activation_code(self, email: str, code: str) -> bool:
-        """Send an activation code via SMTP to MailHog."""
+    @staticmethod
+    def build_message(email: str, code: str) -> MIMEText:
+        """Build the activation email for a code."""
         message = MIMEText(
             f"Your activation code is: {code}\n\n"
             f"This code will expire in 1 minute.\n\n"
@@ -32,18 +48,64 @@ class SMTPEmailService(EmailServiceInterface):
         message["Subject"] = "Your Dailymotion Activation Code"
         message["From"] = "noreply@dailymotion.com"
         message["To"] = email
+        return message
+
+    async def send_activation_code(self, email: str, code: str) -> bool:
+        """Send an activation code via SMTP to MailHog."""
+        if self.pool is not None:
+            return (await self.send_many([(email, code)]))[0]
 
         try:
-            await aiosmtplib.send(
-                message,
-                hostname=self.host,
-                port=self.port,
-            )
+            with timed("smtp.send"):
+                await aiosmtplib.send(
+                    self.build_message(email, code),
+                    hostname=self.host,
+                    port=self.port,
+                )
             return True
         except Exception as e:
-            print(f"Failed to send email to {email}: {e}")
+            logger.warning("Failed to send email to %s: %s", email, e)
             return False
 
+    async def send_many(self, messages: list[tuple[str, str]]) -> list[bool]:
+        """Send a batch of activation emails over a single SMTP session.
+
+        Uses a pooled connection when a pool is configured, otherwise opens a
+        dedicated session for the batch. If the session drops mid-batch, the
+        remaining messages are retried once on a fresh connection.
+        """
+        results: list[bool] = []
+        for _ in range(2):
+            try:
+                await self._send_session(messages[len(results) :], results)
+                break
+            except (aiosmtplib.SMTPException, OSError) as e:
+                logger.warning("SMTP session failed, reconnecting: %s", e)
+        results.extend([False] * (len(messages) - len(results)))
+        return results
+
+    async def _send_session(self, messages: list[tuple[str, str]], results: list[bool]) -> None:
+        if self.pool is not None:
+            async with self.pool.connection() as smtp:
+                await self._send_on(smtp, messages, results)
+            return
+
+        smtp = aiosmtplib.SMTP(hostname=self.host, port=self.port)
+        async with smtp:
+            await self._send_on(smtp, messages, results)
+
+    async def _send_on(
+        self, smtp: aiosmtplib.SMTP, messages: list[tuple[str, str]], results: list[bool]
+    ) -> None:
+        for email, code in messages:
+            try:
+                with timed("smtp.send"):
+                    await smtp.send_message(self.build_message(email, code))
+                results.append(True)
+            except (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused) as e:
+                logger.warning("Failed to send email to %s: %s", email, e)
+                results.append(False)
+
 
 class ConsoleEmailService(EmailServiceInterface):
     """Console email service for testing/development."""
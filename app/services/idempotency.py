@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from collections.abc import Awaitable, Callable
+from typing import Any, NamedTuple
+
+import asyncpg
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.config import settings
+from app.database import Database
+from app.exceptions import IdempotencyKeyReusedError
+
+logger = logging.getLogger(__name__)
+
+GET_RESPONSE = """
+    SELECT status_code, body, fingerprint
+    FROM idempotency_keys
+    WHERE key = $1 AND expires_at > NOW()
+"""
+
+SAVE_RESPONSE = """
+    INSERT INTO idempotency_keys (key, status_code, body, fingerprint, expires_at)
+    VALUES ($1, $2, $3::jsonb, $4, NOW() + make_interval(secs => $5))
+    ON CONFLICT (key) DO UPDATE
+    SET status_code = EXCLUDED.status_code, body = EXCLUDED.body,
+        fingerprint = EXCLUDED.fingerprint, expires_at = EXCLUDED.expires_at
+    WHERE idempotency_keys.expires_at <= NOW()
+"""
+
+CLEAR_EXPIRED_RESPONSES = """
+    DELETE FROM idempotency_keys
+    WHERE key IN (
+        SELECT key
+        FROM idempotency_keys
+        WHERE expires_at <= NOW()
+        LIMIT $1
+        FOR UPDATE SKIP LOCKED
+    )
+"""
+
+# Prepared on every new pool connection when IDEMPOTENCY_STORE=postgres
+STATEMENTS = (GET_RESPONSE, SAVE_RESPONSE, CLEAR_EXPIRED_RESPONSES)
+
+
+class StoredResponse(NamedTuple):
+    """A response kept for replay, with the fingerprint of the request that produced it."""
+
+    status_code: int
+    body: dict[str, Any]
+    fingerprint: str
+
+
+class IdempotencyStore(ABC):
+    """Where responses to idempotent requests are kept until they expire."""
+
+    @abstractmethod
+    async def get(self, key: str) -> StoredResponse | None:
+        """Return the unexpired response stored under ``key``, if any."""
+
+    @abstractmethod
+    async def put(self, key: str, response: StoredResponse) -> None:
+        """Store ``response`` under ``key`` for ``settings.idempotency_ttl_seconds``."""
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    """Per-process store: an LRU dict of at most ``max_keys`` entries."""
+
+    def __init__(self, max_keys: int | None = None, ttl_seconds: float | None = None):
+        self.max_keys = settings.idempotency_max_keys if max_keys is None else max_keys
+        self.ttl = settings.idempotency_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._entries: OrderedDict[str, tuple[float, StoredResponse]] = OrderedDict()
+
+    async def get(self, key: str) -> StoredResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def put(self, key: str, response: StoredResponse) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+
+class PostgresIdempotencyStore(IdempotencyStore):
+    """Store in the idempotency_keys table, so any worker can replay a response.
+
+    Expired rows are deleted in small batches by a background task.
+    """
+
+    def __init__(self, pool: asyncpg.Pool):
+        self.pool = pool
+        self._task: asyncio.Task[None] | None = None
+
+    async def get(self, key: str) -> StoredResponse | None:
+        async with Database.acquire(self.pool) as conn:
+            row = await conn.fetchrow(GET_RESPONSE, key)
+            if row is None:
+                return None
+            return StoredResponse(row["status_code"], json.loads(row["body"]), row["fingerprint"])
+
+    async def put(self, key: str, response: StoredResponse) -> None:
+        async with Database.acquire(self.pool) as conn:
+            await conn.execute(
+                SAVE_RESPONSE,
+                key,
+                response.status_code,
+                json.dumps(response.body),
+                response.fingerprint,
+                settings.idempotency_ttl_seconds,
+            )
+
+    def start(self, interval: float = 60.0, batch_size: int = 1000) -> None:
+        self._task = asyncio.create_task(self._run(interval, batch_size), name="idempotency-keys")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self, interval: float, batch_size: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                async with Database.acquire(self.pool) as conn:
+                    while True:
+                        status_ = await conn.execute(CLEAR_EXPIRED_RESPONSES, batch_size)
+                        if int(status_.split()[-1]) < batch_size:
+                            break
+            except Exception:
+                logger.exception("Clearing expired idempotency keys failed")
+
+
+class Idempotency:
+    """Runs a request at most once per Idempotency-Key and replays its response.
+
+    Only successful responses are stored: an error (a wrong password, a
+    rate limit, an overloaded server) may not repeat, so a retry runs the
+    request again. A replay is only served to a request with the same
+    fingerprint (body and credentials); reusing a key for a different
+    request gets a 422. Concurrent requests with the same key in this
+    process wait for the first one instead of running again.
+    """
+
+    def __init__(self, store: IdempotencyStore | None = None, secret: str | None = None):
+        self.store = store or MemoryIdempotencyStore()
+        secret = settings.idempotency_secret if secret is None else secret
+        # A per-process key only works for the memory store; main.py requires a
+        # configured secret for the shared one
+        self.secret = secret.encode() or secrets.token_bytes(32)
+        self.counters: Counter[str] = Counter()
+        self._pending: dict[str, tuple[str, asyncio.Future[StoredResponse]]] = {}
+
+    def fingerprint(self, *parts: str) -> str:
+        """Keyed digest of the request fields a replay must match.
+
+        Keyed, because the parts include passwords and the digest is stored.
+        """
+        return hmac.new(self.secret, "\0".join(parts).encode(), hashlib.sha256).hexdigest()
+
+    async def run(
+        self,
+        key: str | None,
+        scope: str,
+        fingerprint: str,
+        status_code: int,
+        call: Callable[[], Awaitable[BaseModel]],
+    ) -> Any:
+        """Return ``call()``'s result, or the stored response for ``scope`` and ``key``.
+
+        ``scope`` names the endpoint and the account, so the same key sent
+        for another email is a different request. ``fingerprint`` (from
+        :meth:`fingerprint`) must match the request that stored the response.
+        """
+        if key is None:
+            return await call()
+        full_key = f"{scope}:{key}"
+
+        pending = self._pending.get(full_key)
+        if pending is not None:
+            self._check(fingerprint, pending[0])
+            self.counters["coalesced"] += 1
+            return self._replay(await asyncio.shield(pending[1]))
+
+        # Registered before the store lookup and kept until the response is
+        # stored, so duplicates arriving meanwhile wait instead of running again
+        future: asyncio.Future[StoredResponse] = asyncio.get_running_loop().create_future()
+        self._pending[full_key] = (fingerprint, future)
+        try:
+            stored = await self.store.get(full_key)
+            if stored is not None:
+                self._check(fingerprint, stored.fingerprint)
+                self.counters["replayed"] += 1
+                future.set_result(stored)
+                return self._replay(stored)
+
+            result = await call()
+            stored = StoredResponse(status_code, result.model_dump(mode="json"), fingerprint)
+            future.set_result(stored)
+            self.counters["stored"] += 1
+            try:
+                await self.store.put(full_key, stored)
+            except Exception:
+                # The request itself succeeded; only a later replay is lost
+                logger.exception("Storing idempotent response failed")
+            return result
+        except BaseException as e:
+            if not future.done():
+                future.set_exception(e)
+                future.exception()  # waiters re-raise it; nobody else has to retrieve it
+            raise
+        finally:
+            del self._pending[full_key]
+
+    def _check(self, fingerprint: str, expected: str) -> None:
+        if not hmac.compare_digest(fingerprint, expected):
+            self.counters["mismatched"] += 1
+            raise IdempotencyKeyReusedError()
+
+    @staticmethod
+    def _replay(stored: StoredResponse) -> JSONResponse:
+        return JSONResponse(
+            stored.body, status_code=stored.status_code, headers={"Idempotent-Replayed": "true"}
+        )
+
+    def stats(self) -> dict[str, int]:
+        """Return stored, replayed, coalesced and mismatched totals and requests in flight."""
+        return {"in_flight": len(self._pending), **self.counters}
+
+
+idempotency = Idempotency()
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from collections import Counter
+
+from app.config import settings
+from app.repositories.outbox_repository import EmailOutboxRepository
+from app.services.email_service import EmailServiceInterface
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxDispatcher:
+    """Background task that drains the email outbox in batches.
+
+    Each iteration claims a batch of due messages, sends them with
+    ``send_many`` and deletes the delivered rows. Failed messages are
+    rescheduled with capped exponential backoff for as long as their
+    activation code is valid, so an SMTP outage shorter than the code's
+    lifetime delays the email instead of losing it; a message is dropped
+    only once its code would have expired before the next attempt. Any number of dispatchers may run against the
+    same database; row claiming guarantees they work on disjoint batches.
+    """
+
+    def __init__(self, outbox: EmailOutboxRepository, email_service: EmailServiceInterface):
+        self.outbox = outbox
+        self.email_service = email_service
+        self.counters: Counter[str] = Counter()
+        self.batch_size = settings.outbox_batch_size
+        self.poll_interval = settings.outbox_poll_interval_seconds
+        self.lease_seconds = settings.outbox_lease_seconds
+        self.retry_backoff = settings.outbox_retry_backoff_seconds
+        self.max_retry_backoff = settings.outbox_max_retry_backoff_seconds
+        self.retry_window = (
+            settings.outbox_retry_window_seconds or settings.activation_code_expiry_seconds
+        )
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        """Start the dispatch loop."""
+        self._task = asyncio.create_task(self._run(), name="outbox-dispatcher")
+
+    async def stop(self) -> None:
+        """Stop the dispatch loop; unsent rows stay in the outbox."""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                claimed = await self.dispatch_batch()
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+                claimed = 0
+            if claimed < self.batch_size:
+                await asyncio.sleep(self.poll_interval)
+
+    async def dispatch_batch(self) -> int:
+        """Claim and send one batch. Returns the number of claimed messages."""
+        messages = await self.outbox.claim_batch(self.batch_size, self.lease_seconds)
+        if not messages:
+            return 0
+
+        results = await self.email_service.send_many(
+            [(message.email, message.activation_code) for message in messages]
+        )
+
+        done: list[int] = []
+        retry: dict[float, list[int]] = {}
+        for message, sent in zip(messages, results, strict=True):
+            if sent:
+                self.counters["sent"] += 1
+                done.append(message.id)
+                continue
+            delay = self.retry_delay(message.attempts)
+            if message.age_seconds + delay >= self.retry_window:
+                self.counters["failed"] += 1
+                logger.error(
+                    "Dropping activation email to %s after %d attempts, its code has expired",
+                    message.email,
+                    message.attempts,
+                )
+                done.append(message.id)
+            else:
+                self.counters["retried"] += 1
+                retry.setdefault(delay, []).append(message.id)
+
+        if done:
+            await self.outbox.delete(done)
+        for delay, message_ids in retry.items():
+            await self.outbox.reschedule(message_ids, delay)
+        return len(messages)
+
+    def retry_delay(self, attempts: int) -> float:
+        """Delay before the next attempt after ``attempts`` failed ones."""
+        return min(self.max_retry_backoff, self.retry_backoff * 2.0 ** min(attempts - 1, 30))
@@ -0,0 +1,295 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from functools import lru_cache
+from typing import Any
+
+from passlib.context import CryptContext
+
+from app.config import settings
+from app.exceptions import HashingOverloadedError
+from app.metrics import observe_stage, timed
+
+logger = logging.getLogger(__name__)
+
+# Highest cost calibration may pick: bcrypt's maximum log2 rounds, argon2 passes
+MAX_ROUNDS = {"bcrypt": 31, "argon2": 64}
+
+
+@dataclass(frozen=True)
+class HashPolicy:
+    """Schemes and costs for password hashes; the first scheme is used for new hashes.
+
+    Hashable and picklable, so it is passed along with every executor job and
+    worker processes build (and cache) the matching CryptContext themselves.
+    """
+
+    schemes: tuple[str, ...] = ("bcrypt",)
+    bcrypt_rounds: int = 12
+    argon2_rounds: int = 3
+
+    @classmethod
+    def from_settings(cls) -> "HashPolicy":
+        return cls(
+            schemes=tuple(settings.password_schemes),
+            bcrypt_rounds=settings.bcrypt_rounds,
+            argon2_rounds=settings.argon2_rounds,
+        )
+
+    @property
+    def rounds(self) -> int:
+        """Cost of the default scheme."""
+        return self.argon2_rounds if self.schemes[0] == "argon2" else self.bcrypt_rounds
+
+    def with_rounds(self, rounds: int) -> "HashPolicy":
+        """Return a copy with the default scheme's cost set to ``rounds``."""
+        if self.schemes[0] == "argon2":
+            return replace(self, argon2_rounds=rounds)
+        return replace(self, bcrypt_rounds=rounds)
+
+
+@lru_cache
+def _context(policy: HashPolicy) -> CryptContext:
+    """Build the CryptContext for ``policy``.
+
+    Every scheme but the first is deprecated, and the configured rounds are a
+    minimum, so weaker hashes need an update while stronger ones are kept.
+    """
+    options: dict[str, Any] = {}
+    for scheme in policy.schemes:
+        rounds = policy.argon2_rounds if scheme == "argon2" else policy.bcrypt_rounds
+        options[f"{scheme}__default_rounds"] = rounds
+        options[f"{scheme}__min_rounds"] = rounds
+    return CryptContext(
+        schemes=list(policy.schemes), default=policy.schemes[0], deprecated=["auto"], **options
+    )
+
+
+def _hash(password: str, policy: HashPolicy) -> str:
+    """Hash a password with the policy's default scheme (runs inside the executor)."""
+    return str(_context(policy).hash(password))
+
+
+def _hash_many(passwords: list[str], policy: HashPolicy) -> list[str]:
+    """Hash a chunk of passwords in one executor job."""
+    return [_hash(password, policy) for password in passwords]
+
+
+def _verify(password: str, password_hash: str, policy: HashPolicy) -> bool:
+    """Verify a password against a hash of any accepted scheme (runs inside the executor)."""
+    return bool(_context(policy).verify(password, password_hash))
+
+
+def calibrate(policy: HashPolicy, target_seconds: float) -> HashPolicy:
+    """Raise the default scheme's cost to what hashes in about ``target_seconds`` here.
+
+    One hash is timed at the configured cost and extrapolated: bcrypt time
+    doubles per round, argon2 time grows linearly with passes. The configured
+    cost is a floor; calibration never lowers it.
+    """
+    started = time.perf_counter()
+    _hash("calibration", policy)
+    elapsed = time.perf_counter() - started
+    if policy.schemes[0] == "argon2":
+        rounds = math.floor(policy.rounds * target_seconds / elapsed)
+    else:
+        rounds = policy.rounds + math.floor(math.log2(target_seconds / elapsed))
+    rounds = min(max(rounds, policy.rounds), MAX_ROUNDS[policy.schemes[0]])
+    logger.info(
+        "Calibrated %s to %d rounds (%.0f ms at %d rounds, target %.0f ms)",
+        policy.schemes[0],
+        rounds,
+        elapsed * 1000,
+        policy.rounds,
+        target_seconds * 1000,
+    )
+    return policy.with_rounds(rounds)
+
+
+@dataclass
+class HasherStats:
+    """Snapshot of the hashing executor state."""
+
+    executor: str
+    scheme: str
+    rounds: int
+    workers: int
+    queue_depth: int
+    queue_size: int
+    in_flight: int
+    completed: int
+    rejected: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+
+
+class PasswordHasher:
+    """Runs password hashing and verification off the event loop.
+
+    At most ``workers`` jobs are handed to the executor at a time; further
+    callers wait in a bounded queue of ``queue_size`` entries and are rejected
+    with a 503 once that queue is full.
+    """
+
+    def __init__(self) -> None:
+        self._executor: Executor | None = None
+        self.policy = HashPolicy.from_settings()
+        self._slots: asyncio.Semaphore | None = None
+        self.kind = "default"
+        self.workers = 0
+        self.queue_size = 0
+        self._waiting = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def start(
+        self,
+        kind: str | None = None,
+        workers: int | None = None,
+        queue_size: int | None = None,
+    ) -> None:
+        """Create the executor and settle the hash policy.
+
+        Must be called from the running event loop. Fails if a configured
+        scheme has no backend installed (argon2 needs argon2-cffi).
+        """
+        policy = HashPolicy.from_settings()
+        for scheme in policy.schemes:
+            _context(policy).handler(scheme).get_backend()
+        if settings.hash_target_ms > 0:
+            policy = calibrate(policy, settings.hash_target_ms / 1000)
+        self.policy = policy
+
+        kind = kind or settings.hash_executor
+        workers = workers or settings.hash_workers or os.cpu_count() or 1
+        queue_size = settings.hash_queue_size if queue_size is None else queue_size
+
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        elif kind == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers=workers,
+                thread_name_prefix="password-hasher",
+            )
+        else:
+            raise ValueError(f"Unknown hash executor: {kind}")
+
+        self.kind = kind
+        self.workers = workers
+        self.queue_size = queue_size
+        self._slots = asyncio.Semaphore(workers)
+
+    def shutdown(self) -> None:
+        """Stop the executor, cancelling jobs that have not started yet."""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._slots = None
+
+    async def hash(self, password: str) -> str:
+        """Hash a password without blocking the event loop."""
+        return str(await self._run("bcrypt.hash", _hash, password, self.policy))
+
+    async def hash_many(self, passwords: list[str]) -> list[str]:
+        """Hash many passwords in small chunks that queue like single hashes.
+
+        Chunks hold ``settings.hash_batch_chunk_size`` passwords and at most
+        half the workers run chunks of one batch at a time, so a large batch
+        never holds every worker: single hashes queued meanwhile are served
+        between its chunks.
+        """
+        if not passwords:
+            return []
+        workers = self.workers or os.cpu_count() or 1
+        batch_slots = asyncio.Semaphore(max(1, workers // 2))
+        chunk_size = settings.hash_batch_chunk_size
+
+        async def run_chunk(chunk: list[str]) -> list[str]:
+            async with batch_slots:
+                return list(await self._run("bcrypt.hash_batch", _hash_many, chunk, self.policy))
+
+        chunks = await asyncio.gather(
+            *(
+                run_chunk(passwords[start : start + chunk_size])
+                for start in range(0, len(passwords), chunk_size)
+            )
+        )
+        return [password_hash for chunk in chunks for password_hash in chunk]
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        """Verify a password without blocking the event loop."""
+        return bool(await self._run("bcrypt.verify", _verify, password, password_hash, self.policy))
+
+    def needs_update(self, password_hash: str) -> bool:
+        """Whether a hash uses a deprecated scheme or less than the current cost.
+
+        Only parses the hash, so it is cheap enough for the event loop.
+        """
+        return bool(_context(self.policy).needs_update(password_hash))
+
+    async def _run(self, stage: str, func: Any, *args: Any) -> Any:
+        """Run ``func`` on the executor, timing the queue wait and the job as separate stages."""
+        loop = asyncio.get_running_loop()
+        slots, executor = self._slots, self._executor
+        if slots is None:
+            # Not started (e.g. tests without lifespan): use the loop's default executor
+            with timed(stage):
+                return await loop.run_in_executor(None, func, *args)
+
+        if slots.locked() and self._waiting >= self.queue_size:
+            self._rejected += 1
+            raise HashingOverloadedError()
+
+        self._waiting += 1
+        queued_at = time.perf_counter()
+        try:
+            await slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        waited = time.perf_counter() - queued_at
+        observe_stage("bcrypt.queue_wait", waited)
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+        self._in_flight += 1
+        try:
+            with timed(stage):
+                return await loop.run_in_executor(executor, func, *args)
+        finally:
+            self._in_flight -= 1
+            self._completed += 1
+            slots.release()
+
+    def stats(self) -> HasherStats:
+        """Return current queue depth, wait time and throughput counters."""
+        return HasherStats(
+            executor=self.kind,
+            scheme=self.policy.schemes[0],
+            rounds=self.policy.rounds,
+            workers=self.workers,
+            queue_depth=self._waiting,
+            queue_size=self.queue_size,
+            in_flight=self._in_flight,
+            completed=self._completed,
+            rejected=self._rejected,
+            wait_seconds_total=self._wait_total,
+            wait_seconds_max=self._wait_max,
+        )
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,127 @@
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+
+from app.config import settings
+from app.exceptions import RateLimitedError
+
+
+class RateLimitBackend(ABC):
+    """Token bucket storage.
+
+    The in-memory backend keeps buckets per process; a backend on shared
+    storage (e.g. Redis) lets every worker draw from the same buckets.
+    """
+
+    @abstractmethod
+    async def take(self, key: str, rate: float, burst: int, cost: int = 1) -> float:
+        """Take ``cost`` tokens from ``key``'s bucket.
+
+        Allowed whenever at least one token is left; a larger ``cost`` then
+        leaves the bucket in debt until it refills. Returns 0 if allowed,
+        otherwise the seconds until one token is available.
+        """
+
+    def stats(self) -> dict[str, int]:
+        """Return backend counters for the metrics endpoint."""
+        return {}
+
+
+class InMemoryRateLimitBackend(RateLimitBackend):
+    """Token buckets in ``shards`` LRU-ordered dicts holding ``max_keys`` in total.
+
+    A bucket untouched long enough to refill completely is equivalent to a
+    new one, so it is dropped once it reaches the LRU end of its shard.
+    When a shard is full its least recently used bucket is evicted, which
+    keeps memory bounded however many distinct emails and IPs show up.
+    Sharding keeps each dict, and the eviction scans over it, small.
+    """
+
+    def __init__(self, shards: int | None = None, max_keys: int | None = None):
+        self.shards: list[OrderedDict[str, tuple[float, float, float]]] = [
+            OrderedDict() for _ in range(shards or settings.rate_limit_shards)
+        ]
+        self.shard_size = max(1, (max_keys or settings.rate_limit_max_keys) // len(self.shards))
+        self.counters: Counter[str] = Counter()
+
+    async def take(self, key: str, rate: float, burst: int, cost: int = 1) -> float:
+        now = time.monotonic()
+        shard = self.shards[hash(key) % len(self.shards)]
+        # Each entry is (tokens, last update, time at which the bucket is full again)
+        tokens, updated, _ = shard.pop(key, (float(burst), now, now))
+        tokens = min(float(burst), tokens + (now - updated) * rate)
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= cost
+        else:
+            retry_after = (1 - tokens) / rate
+        shard[key] = (tokens, now, now + (burst - tokens) / rate)
+        self._evict(shard, now)
+        return retry_after
+
+    def _evict(self, shard: OrderedDict[str, tuple[float, float, float]], now: float) -> None:
+        while shard:
+            key, (_, _, full_at) = next(iter(shard.items()))
+            if full_at <= now:
+                self.counters["expired"] += 1
+            elif len(shard) > self.shard_size:
+                self.counters["evicted"] += 1
+            else:
+                return
+            del shard[key]
+
+    def stats(self) -> dict[str, int]:
+        return {"keys": sum(len(shard) for shard in self.shards), **self.counters}
+
+
+class RateLimiter:
+    """Per-email and per-client-IP token buckets checked before any bcrypt work."""
+
+    def __init__(self, backend: RateLimitBackend | None = None):
+        self.backend = backend or InMemoryRateLimitBackend()
+        self.rejected = 0
+
+    async def check(self, email: str, client_ip: str | None = None) -> None:
+        """Take a token for ``client_ip`` and ``email``; raise RateLimitedError (429) if out."""
+        if not settings.rate_limit_enabled:
+            return
+        retry_after = 0.0
+        if client_ip:
+            retry_after = await self.backend.take(
+                f"ip:{client_ip}", settings.rate_limit_ip_per_second, settings.rate_limit_ip_burst
+            )
+        if not retry_after:
+            retry_after = await self.backend.take(
+                f"email:{email.lower()}",
+                settings.rate_limit_email_per_second,
+                settings.rate_limit_email_burst,
+            )
+        if retry_after:
+            self.rejected += 1
+            raise RateLimitedError(retry_after)
+
+    async def check_batch(self, client_ip: str | None, count: int) -> None:
+        """Charge ``client_ip``'s bucket one token per entry of a batch.
+
+        Refused (429) only when the bucket is already empty, so a batch
+        larger than the burst still runs, after which the client waits for
+        the bucket to pay off the whole batch.
+        """
+        if not settings.rate_limit_enabled or not client_ip:
+            return
+        retry_after = await self.backend.take(
+            f"ip:{client_ip}",
+            settings.rate_limit_ip_per_second,
+            settings.rate_limit_ip_burst,
+            cost=count,
+        )
+        if retry_after:
+            self.rejected += 1
+            raise RateLimitedError(retry_after)
+
+    def stats(self) -> dict[str, int]:
+        """Return rejected calls plus the backend's counters."""
+        return {"rejected": self.rejected, **self.backend.stats()}
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,100 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+import aiosmtplib
+
+from app.config import settings
+from app.metrics import timed
+
+
+class SMTPConnectionPool:
+    """Pool of long-lived SMTP sessions.
+
+    Connections are opened lazily, at most ``size`` at a time. Idle
+    connections older than ``idle_timeout`` are closed instead of reused, and
+    connections idle longer than ``health_check_after`` are probed with NOOP
+    before being handed out. A connection that errors while checked out is
+    discarded, so the next checkout reconnects.
+    """
+
+    def __init__(
+        self,
+        host: str | None = None,
+        port: int | None = None,
+        size: int | None = None,
+        idle_timeout: float | None = None,
+        health_check_after: float | None = None,
+    ):
+        self.host = host or settings.smtp_host
+        self.port = port or settings.smtp_port
+        self.size = size or settings.smtp_pool_size or 1
+        self.idle_timeout = (
+            settings.smtp_pool_idle_timeout_seconds if idle_timeout is None else idle_timeout
+        )
+        self.health_check_after = (
+            settings.smtp_pool_health_check_seconds
+            if health_check_after is None
+            else health_check_after
+        )
+        self._idle: deque[tuple[aiosmtplib.SMTP, float]] = deque()
+        self._slots = asyncio.Semaphore(self.size)
+        self.connects = 0
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[aiosmtplib.SMTP]:
+        """Check out a connected SMTP session for the duration of the block."""
+        async with self._slots:
+            smtp = await self._checkout()
+            try:
+                yield smtp
+            except BaseException:
+                self._discard(smtp)
+                raise
+            if smtp.is_connected:
+                self._idle.append((smtp, time.monotonic()))
+
+    async def close(self) -> None:
+        """Close every idle connection."""
+        while self._idle:
+            smtp, _ = self._idle.popleft()
+            await self._quit(smtp)
+
+    async def _checkout(self) -> aiosmtplib.SMTP:
+        now = time.monotonic()
+        while self._idle:
+            smtp, last_used = self._idle.pop()
+            idle_for = now - last_used
+            if not smtp.is_connected or idle_for > self.idle_timeout:
+                await self._quit(smtp)
+                continue
+            if idle_for > self.health_check_after:
+                try:
+                    await smtp.noop()
+                except aiosmtplib.SMTPException:
+                    self._discard(smtp)
+                    continue
+            return smtp
+
+        smtp = aiosmtplib.SMTP(hostname=self.host, port=self.port)
+        with timed("smtp.connect"):
+            await smtp.connect()
+        self.connects += 1
+        return smtp
+
+    @staticmethod
+    async def _quit(smtp: aiosmtplib.SMTP) -> None:
+        try:
+            await smtp.quit()
+        except aiosmtplib.SMTPException:
+            smtp.close()
+
+    @staticmethod
+    def _discard(smtp: aiosmtplib.SMTP) -> None:
+        if smtp.is_connected:
+            smtp.close()
+
+
+smtp_pool = SMTPConnectionPool()
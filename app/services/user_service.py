@@ -1,9 +1,11 @@
+import asyncio
+import logging
 import secrets
 from datetime import UTC, datetime, timedelta
-
-from passlib.hash import bcrypt
+from uuid import UUID
 
 from app.config import settings
+from app.database import Database
 from app.exceptions import (
     ActivationCodeExpiredError,
     InvalidActivationCodeError,
@@ -11,98 +13,235 @@ from app.exceptions import (
     UserAlreadyActiveError,
     UserAlreadyExistsError,
 )
-from app.models.user import UserInDB, UserRegistrationResponse
-from app.repositories.user_repository import UserRepository
+from app.metrics import timed
+from app.models.user import ActivationStatus, UserRecord, UserRegistrationResponse
+from app.repositories.activation_code_store import (
+    ActivationCodeStore,
+    PendingCode,
+    UsersTableCodeStore,
+)
+from app.repositories.email_filter import email_filter
+from app.repositories.user_repository import NewUser, UserRepository
 from app.services.email_service import EmailServiceInterface
+from app.services.password_hasher import PasswordHasher, password_hasher
+from app.services.rate_limiter import RateLimiter, rate_limiter
+
+logger = logging.getLogger(__name__)
+
+# Background rehash tasks, kept referenced until done and awaited on shutdown
+background_tasks: set[asyncio.Task[None]] = set()
 
 
 class UserService:
     """Business logic layer for user operations."""
 
-    def __init__(self, repository: UserRepository, email_service: EmailServiceInterface):
+    def __init__(
+        self,
+        repository: UserRepository,
+        email_service: EmailServiceInterface,
+        hasher: PasswordHasher | None = None,
+        code_store: ActivationCodeStore | None = None,
+        limiter: RateLimiter | None = None,
+    ):
         self.repository = repository
         self.email_service = email_service
+        self.hasher = hasher or password_hasher
+        self.code_store = code_store or UsersTableCodeStore(repository)
+        self.limiter = limiter or rate_limiter
 
     @staticmethod
     def generate_activation_code() -> str:
         """Generate a cryptographically secure 4-digit activation code."""
         return f"{secrets.randbelow(10000):04d}"
 
-    @staticmethod
-    def hash_password(password: str) -> str:
-        """Hash a password using bcrypt."""
-        return str(bcrypt.hash(password))
+    async def hash_password(self, password: str) -> str:
+        """Hash a password under the current policy on the hashing executor."""
+        return await self.hasher.hash(password)
 
-    @staticmethod
-    def verify_password(password: str, password_hash: str) -> bool:
-        """Verify a password against its hash."""
-        return bool(bcrypt.verify(password, password_hash))
+    async def verify_password(self, password: str, password_hash: str) -> bool:
+        """Verify a password against its hash on the hashing executor."""
+        return await self.hasher.verify(password, password_hash)
 
-    async def register_user(self, email: str, password: str) -> UserRegistrationResponse:
+    @timed("service.register_user")
+    async def register_user(
+        self, email: str, password: str, client_ip: str | None = None
+    ) -> UserRegistrationResponse:
         """Register a new user and send activation code."""
+        await self.limiter.check(email, client_ip)
+        # Cheap pre-check so duplicate signups don't pay for a bcrypt hash;
+        # the insert itself is still conflict-safe against concurrent signups.
         if await self.repository.email_exists(email):
             raise UserAlreadyExistsError()
 
-        activation_code = self.generate_activation_code()
+        code_on_user = self.code_store.stored_with_user
+        activation_code = self.generate_activation_code() if code_on_user else None
         expires_at = datetime.now(UTC) + timedelta(seconds=settings.activation_code_expiry_seconds)
 
-        password_hash = self.hash_password(password)
+        password_hash = await self.hash_password(password)
+        use_outbox = settings.email_delivery == "outbox"
         user = await self.repository.create_user(
             email=email,
             password_hash=password_hash,
             activation_code=activation_code,
-            activation_code_expires_at=expires_at,
+            activation_code_expires_at=expires_at if code_on_user else None,
+            queue_email=use_outbox and code_on_user,
         )
+        if user is None:
+            raise UserAlreadyExistsError()
+        if activation_code is None:
+            # Other stores may derive the code from the new user's id
+            activation_code = self.code_store.new_code(user.id)
+            await self.code_store.save(
+                PendingCode(user.id, email, activation_code, expires_at), queue_email=use_outbox
+            )
 
-        await self.email_service.send_activation_code(email, activation_code)
+        if not use_outbox:
+            await self.email_service.send_activation_code(email, activation_code)
 
         return UserRegistrationResponse(id=user.id, email=user.email)
 
-    async def authenticate_user(self, email: str, password: str) -> UserInDB:
+    @timed("service.register_users")
+    async def register_users(
+        self, users: list[tuple[str, str]], client_ip: str | None = None
+    ) -> list[UUID | None]:
+        """Register many (email, password) pairs at once.
+
+        Returns the new user's id for each entry, or None if the email was
+        already registered (or repeated earlier in the batch). Every entry is
+        charged to the client's rate-limit bucket. Passwords are hashed
+        across the hashing workers and all users are inserted with a single
+        set-based statement.
+        """
+        await self.limiter.check_batch(client_ip, len(users))
+        unique = dict(reversed(users))  # first password wins for repeated emails
+        existing = await self.repository.existing_emails(list(unique))
+        pending = [(email, password) for email, password in unique.items() if email not in existing]
+
+        password_hashes = await self.hasher.hash_many([password for _, password in pending])
+        expires_at = datetime.now(UTC) + timedelta(seconds=settings.activation_code_expiry_seconds)
+        use_outbox = settings.email_delivery == "outbox"
+        code_on_user = self.code_store.stored_with_user
+        codes = {email: self.generate_activation_code() for email, _ in pending if code_on_user}
+        new_users = [
+            NewUser(
+                email=email,
+                password_hash=password_hash,
+                activation_code=codes[email] if code_on_user else None,
+                activation_code_expires_at=expires_at if code_on_user else None,
+                queue_email=use_outbox and code_on_user,
+            )
+            for (email, _), password_hash in zip(pending, password_hashes, strict=True)
+        ]
+        created = await self.repository.create_users(new_users) if new_users else {}
+        if created and not code_on_user:
+            codes = {email: self.code_store.new_code(user.id) for email, user in created.items()}
+            await self.code_store.save_many(
+                [
+                    PendingCode(user.id, email, codes[email], expires_at)
+                    for email, user in created.items()
+                ],
+                queue_email=use_outbox,
+            )
+
+        if not use_outbox:
+            await self.email_service.send_many([(email, codes[email]) for email in created])
+
+        ids = {email: user.id for email, user in created.items()}
+        results: list[UUID | None] = []
+        for email, _ in users:
+            results.append(ids.pop(email, None))
+        return results
+
+    @timed("service.email_available")
+    async def email_available(self, email: str) -> bool:
+        """Whether ``email`` can still be registered.
+
+        Emails the Bloom filter has never seen are answered without a query;
+        only a "maybe" is checked against the database.
+        """
+        if not email_filter.might_contain(email):
+            return True
+        exists = await self.repository.email_exists(email)
+        if not exists:
+            email_filter.false_positive()
+        return not exists
+
+    async def authenticate_user(
+        self, email: str, password: str, client_ip: str | None = None
+    ) -> UserRecord:
         """Authenticate a user by email and password."""
+        await self.limiter.check(email, client_ip)
         user = await self.repository.get_user_by_email(email)
         if not user:
             raise InvalidCredentialsError()
 
-        if not self.verify_password(password, user.password_hash):
+        if not await self.verify_password(password, user.password_hash):
             raise InvalidCredentialsError()
 
+        if self.hasher.needs_update(user.password_hash):
+            # Upgrade outdated hashes off the request path, now that we know the password
+            task = asyncio.create_task(self.rehash_password(user, password))
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+
         return user
 
-    async def activate_user(self, email: str, password: str, code: str) -> bool:
+    @timed("service.rehash_password")
+    async def rehash_password(self, user: UserRecord, password: str) -> None:
+        """Store a hash under the current policy; failures are logged and retried next login."""
+        try:
+            new_hash = await self.hash_password(password)
+            await self.repository.update_password_hash(user.id, user.password_hash, new_hash)
+        except Exception:
+            logger.exception("Rehashing password for user %s failed", user.id)
+
+    @timed("service.activate_user")
+    async def activate_user(
+        self, email: str, password: str, code: str, client_ip: str | None = None
+    ) -> bool:
         """Activate a user account with the provided code."""
-        user = await self.authenticate_user(email, password)
+        # Read from the primary: a replica may not have seen a just-resent
+        # code or a just-completed activation yet.
+        with Database.read_your_writes():
+            user = await self.authenticate_user(email, password, client_ip)
 
         if user.is_active:
             raise UserAlreadyActiveError()
 
-        if user.activation_code != code:
-            raise InvalidActivationCodeError()
-
-        if user.activation_code_expires_at is None:
-            raise InvalidActivationCodeError()
-
-        now = datetime.now(UTC)
-        expires_at = user.activation_code_expires_at
-        if expires_at.tzinfo is None:
-            expires_at = expires_at.replace(tzinfo=UTC)
+        # Code and expiry are checked in the same statement that activates,
+        # so a concurrent resend cannot slip in between check and write.
+        result = await self.code_store.activate(user.id, code)
+        # Code stores may activate the user without going through the repository
+        self.repository.invalidate(user.id)
 
-        if now > expires_at:
+        if result is ActivationStatus.ALREADY_ACTIVE:
+            raise UserAlreadyActiveError()
+        if result is ActivationStatus.EXPIRED:
             raise ActivationCodeExpiredError()
+        if result is not ActivationStatus.ACTIVATED:
+            raise InvalidActivationCodeError()
 
-        return await self.repository.activate_user(user.id)
+        return True
 
-    async def resend_activation_code(self, email: str, password: str) -> bool:
+    @timed("service.resend_activation_code")
+    async def resend_activation_code(
+        self, email: str, password: str, client_ip: str | None = None
+    ) -> bool:
         """Generate and send a new activation code."""
-        user = await self.authenticate_user(email, password)
+        with Database.read_your_writes():
+            user = await self.authenticate_user(email, password, client_ip)
 
         if user.is_active:
             raise UserAlreadyActiveError()
 
-        activation_code = self.generate_activation_code()
+        activation_code = self.code_store.new_code(user.id)
         expires_at = datetime.now(UTC) + timedelta(seconds=settings.activation_code_expiry_seconds)
 
-        await self.repository.update_activation_code(user.id, activation_code, expires_at)
-        await self.email_service.send_activation_code(email, activation_code)
+        use_outbox = settings.email_delivery == "outbox"
+        await self.code_store.save(
+            PendingCode(user.id, email, activation_code, expires_at), queue_email=use_outbox
+        )
+        if not use_outbox:
+            await self.email_service.send_activation_code(email, activation_code)
 
         return True
@@ -0,0 +1,243 @@
+"""Stream users from a CSV or JSONL file into the users table.
+
+Each record needs an ``email`` and either a plaintext ``password`` (hashed
+on a process pool) or a bcrypt ``password_hash``. Input is read in chunks,
+so memory use does not grow with the file size. Each chunk is COPYed into
+a temporary staging table and merged into ``users``; existing emails are
+skipped.
+
+    python -m app.tools.import_users users.csv --send-activation
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Any
+
+import asyncpg
+from passlib.hash import bcrypt
+from pydantic import EmailStr, TypeAdapter, ValidationError
+
+from app.config import settings
+from app.models.user import UserRegistrationRequest
+from app.services.password_hasher import PasswordHasher
+from app.services.user_service import UserService
+
+STAGING_TABLE = "import_users_staging"
+STAGING_COLUMNS = ["email", "password_hash", "activation_code", "activation_code_expires_at"]
+
+CREATE_STAGING = f"""
+    CREATE TEMPORARY TABLE {STAGING_TABLE} (
+        email TEXT NOT NULL,
+        password_hash TEXT NOT NULL,
+        activation_code TEXT,
+        activation_code_expires_at TIMESTAMP WITH TIME ZONE
+    ) ON COMMIT DELETE ROWS
+"""
+
+MERGE_STAGING = f"""
+    WITH new_users AS (
+        INSERT INTO users (email, password_hash, activation_code, activation_code_expires_at)
+        SELECT DISTINCT ON (email) email, password_hash, activation_code, activation_code_expires_at
+        FROM {STAGING_TABLE}
+        ORDER BY email
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id
+    )
+    SELECT count(*) FROM new_users
+"""
+
+# With --send-activation: also queues the new users' emails in email_outbox (migration 002)
+MERGE_STAGING_QUEUED = f"""
+    WITH new_users AS (
+        INSERT INTO users (email, password_hash, activation_code, activation_code_expires_at)
+        SELECT DISTINCT ON (email) email, password_hash, activation_code, activation_code_expires_at
+        FROM {STAGING_TABLE}
+        ORDER BY email
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id, email, activation_code
+    ), outbox AS (
+        INSERT INTO email_outbox (user_id, email, activation_code)
+        SELECT id, email, activation_code FROM new_users WHERE activation_code IS NOT NULL
+    )
+    SELECT count(*) FROM new_users
+"""
+
+_email_adapter = TypeAdapter(EmailStr)
+
+
+@dataclass
+class ImportStats:
+    """Running totals for an import."""
+
+    read: int = 0
+    inserted: int = 0
+    invalid: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def duplicates(self) -> int:
+        return self.read - self.inserted - self.invalid
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.read / max(time.perf_counter() - self.started, 1e-9)
+
+    def report(self) -> str:
+        return (
+            f"read={self.read} inserted={self.inserted} duplicates={self.duplicates} "
+            f"invalid={self.invalid} rows/s={self.rows_per_second:.0f}"
+        )
+
+
+def read_records(path: Path, fmt: str) -> Iterator[dict[str, Any]]:
+    """Yield records one at a time from a CSV or JSONL file."""
+    with path.open(newline="") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def chunked(records: Iterable[dict[str, Any]], size: int) -> Iterator[list[dict[str, Any]]]:
+    """Group records into lists of at most ``size``."""
+    iterator = iter(records)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+async def prepare_chunk(
+    records: list[dict[str, Any]],
+    hasher: PasswordHasher,
+    activation_expires_at: datetime | None,
+) -> tuple[list[tuple[Any, ...]], int]:
+    """Validate a chunk and hash its plaintext passwords.
+
+    Returns the staging rows and the number of invalid records. Activation
+    codes are generated when ``activation_expires_at`` is set.
+    """
+    valid: list[tuple[str, str | None, str | None]] = []
+    invalid = 0
+    for record in records:
+        password_hash = record.get("password_hash")
+        try:
+            if isinstance(password_hash, str) and bcrypt.identify(password_hash):
+                valid.append(
+                    (_email_adapter.validate_python(record.get("email")), password_hash, None)
+                )
+            else:
+                user = UserRegistrationRequest.model_validate(record)
+                valid.append((user.email, None, user.password))
+        except ValidationError:
+            invalid += 1
+
+    plaintext = [password for _, _, password in valid if password is not None]
+    hashed = iter(await hasher.hash_many(plaintext))
+
+    rows = []
+    for email, password_hash, password in valid:
+        if password is not None:
+            password_hash = next(hashed)
+        code = UserService.generate_activation_code() if activation_expires_at else None
+        rows.append((email, password_hash, code, activation_expires_at if code else None))
+    return rows, invalid
+
+
+async def write_chunk(
+    conn: asyncpg.Connection,
+    stats: ImportStats,
+    read: int,
+    rows: list[tuple[Any, ...]],
+    invalid: int,
+    merge: str = MERGE_STAGING,
+) -> None:
+    """COPY prepared rows into staging and merge them into users with ``merge``."""
+    async with conn.transaction():
+        await conn.copy_records_to_table(STAGING_TABLE, records=rows, columns=STAGING_COLUMNS)
+        inserted = await conn.fetchval(merge)
+
+    stats.read += read
+    stats.inserted += inserted
+    stats.invalid += invalid
+    print(stats.report(), file=sys.stderr)
+
+
+async def import_users(args: argparse.Namespace) -> ImportStats:
+    """Run the import described by the parsed command-line arguments."""
+    hasher = PasswordHasher()
+    hasher.start(kind="process", workers=args.workers, queue_size=args.workers)
+    conn = await asyncpg.connect(args.dsn)
+    stats = ImportStats()
+    merge = MERGE_STAGING_QUEUED if args.send_activation else MERGE_STAGING
+    try:
+        await conn.execute(CREATE_STAGING)
+        # Hash the next chunk on the process pool while the current one is written
+        previous: tuple[int, asyncio.Task[tuple[list[tuple[Any, ...]], int]]] | None = None
+        for records in chunked(read_records(args.path, args.format), args.chunk_size):
+            expires_at = None
+            if args.send_activation:
+                expires_at = datetime.now(UTC) + timedelta(seconds=args.activation_expiry_seconds)
+            prepared = asyncio.create_task(prepare_chunk(records, hasher, expires_at))
+            if previous:
+                await write_chunk(conn, stats, previous[0], *await previous[1], merge)
+            previous = (len(records), prepared)
+        if previous:
+            await write_chunk(conn, stats, previous[0], *await previous[1], merge)
+    finally:
+        await conn.close()
+        hasher.shutdown()
+    return stats
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.tools.import_users",
+        description="Bulk-import users from a CSV or JSONL file.",
+    )
+    parser.add_argument("path", type=Path, help="CSV (with header) or JSONL file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="default: from file extension")
+    parser.add_argument("--dsn", default=settings.database_url)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=settings.hash_workers or None)
+    parser.add_argument(
+        "--send-activation",
+        action="store_true",
+        help="generate activation codes and queue their emails in the outbox",
+    )
+    parser.add_argument(
+        "--activation-expiry-seconds",
+        type=int,
+        default=settings.activation_code_expiry_seconds,
+    )
+    args = parser.parse_args(argv)
+    if args.send_activation and settings.email_delivery != "outbox":
+        # Only the outbox dispatcher (started with EMAIL_DELIVERY=outbox) sends these
+        parser.error("--send-activation needs EMAIL_DELIVERY=outbox, or the emails are never sent")
+    if args.send_activation and settings.activation_code_store != "users":
+        # Codes are written onto the users row, which only the "users" store reads
+        parser.error(
+            f"--send-activation needs ACTIVATION_CODE_STORE=users, "
+            f"not {settings.activation_code_store!r}"
+        )
+    if args.format is None:
+        args.format = "jsonl" if args.path.suffix in (".jsonl", ".ndjson") else "csv"
+    return args
+
+
+def main(argv: list[str] | None = None) -> None:
+    stats = asyncio.run(import_users(parse_args(argv)))
+    print(f"Done: {stats.report()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTrace:
+    """Stage durations recorded while serving one request.
+
+    Repeated stages (e.g. several queries of the same kind) are summed and
+    counted rather than listed individually.
+    """
+
+    __slots__ = ("durations", "counts")
+
+    def __init__(self) -> None:
+        self.durations: dict[str, float] = {}
+        self.counts: dict[str, int] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+
+    def server_timing(self, total: float) -> str:
+        """Render the trace as a ``Server-Timing`` header value (milliseconds)."""
+        entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in self.durations.items()]
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+    def as_dict(self) -> dict[str, dict[str, float]]:
+        return {
+            stage: {"ms": round(seconds * 1000, 3), "count": self.counts[stage]}
+            for stage, seconds in self.durations.items()
+        }
+
+
+current_trace: ContextVar[RequestTrace | None] = ContextVar("current_trace", default=None)
+
+
+def record(stage: str, seconds: float) -> None:
+    """Add a stage duration to the current request's trace, if it is sampled."""
+    trace = current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+class TracingMiddleware:
+    """ASGI middleware adding a ``Server-Timing`` header and logging slow requests.
+
+    Does nothing unless ``settings.tracing_enabled`` is set. Sampled requests
+    get a stage breakdown in the header and in the slow-request log line;
+    unsampled requests are only timed as a whole.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.tracing_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = RequestTrace() if random.random() < settings.tracing_sample_rate else None
+        token = current_trace.set(trace)
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if trace is not None:
+                    headers = MutableHeaders(scope=message)
+                    headers.append(
+                        "Server-Timing", trace.server_timing(time.perf_counter() - started)
+                    )
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_trace.reset(token)
+            elapsed = time.perf_counter() - started
+            if elapsed * 1000 >= settings.slow_request_threshold_ms:
+                logger.warning(
+                    "Slow request %s",
+                    json.dumps(
+                        {
+                            "method": scope["method"],
+                            "path": scope["path"],
+                            "status": status,
+                            "duration_ms": round(elapsed * 1000, 3),
+                            "stages": trace.as_dict() if trace is not None else None,
+                        }
+                    ),
+                )
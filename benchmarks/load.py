@@ -0,0 +1,292 @@
+"""End-to-end load benchmark for the register -> resend -> activate flow.
+
+Drives the real FastAPI ``app`` in-process (httpx ASGI transport) with a
+configurable number of concurrent virtual users, against one or more
+backend combinations:
+
+- ``memory``: in-memory repository and email capture (no external services)
+- ``postgres``: local Postgres (``--database-url``) and email capture
+- ``postgres+smtp``: local Postgres and SMTP delivery to a local aiosmtpd sink
+
+Reports throughput and p50/p95/p99 latency per endpoint and writes the
+results as JSON so runs can be compared across commits:
+
+    python -m benchmarks.load --users 500 --concurrency 50 --output results.json
+    python -m benchmarks.load --backend memory --compare results.json
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import socket
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import Any
+
+from aiosmtpd.controller import Controller
+from httpx import ASGITransport, AsyncClient
+
+from app.config import settings
+from app.dependencies import get_email_service, get_user_repository
+from app.main import app
+from app.services.email_queue import QueuedEmailService
+from app.services.email_service import EmailServiceInterface, SMTPEmailService
+from app.services.password_hasher import password_hasher
+from app.services.smtp_pool import SMTPConnectionPool
+from benchmarks.memory_repository import InMemoryUserRepository
+
+BACKENDS = ["memory", "postgres", "postgres+smtp"]
+PASSWORD = "SecurePass123"
+
+
+class CodeMailbox:
+    """Latest activation code per recipient, filled by an email backend."""
+
+    def __init__(self) -> None:
+        self.codes: dict[str, str] = {}
+
+    async def wait_for(self, email: str, previous: str | None = None, timeout: float = 10) -> str:
+        """Wait until a code different from ``previous`` arrives for ``email``."""
+        deadline = time.monotonic() + timeout
+        while (code := self.codes.get(email)) is None or code == previous:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"No activation email for {email}")
+            await asyncio.sleep(0.005)
+        return code
+
+
+class CapturingEmailService(EmailServiceInterface):
+    """Email service that stores codes in a mailbox instead of sending them."""
+
+    def __init__(self, mailbox: CodeMailbox):
+        self.mailbox = mailbox
+
+    async def send_activation_code(self, email: str, code: str) -> bool:
+        self.mailbox.codes[email] = code
+        return True
+
+
+class SinkHandler:
+    """aiosmtpd handler that extracts activation codes into a mailbox."""
+
+    code_pattern = re.compile(rb"activation code is: (\d{4})")
+
+    def __init__(self, mailbox: CodeMailbox):
+        self.mailbox = mailbox
+
+    async def handle_DATA(self, server, session, envelope):
+        match = self.code_pattern.search(envelope.content)
+        if match:
+            for recipient in envelope.rcpt_tos:
+                self.mailbox.codes[recipient] = match.group(1).decode()
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return int(sock.getsockname()[1])
+
+
+@asynccontextmanager
+async def backend(name: str, mailbox: CodeMailbox) -> AsyncIterator[None]:
+    """Wire the app's dependencies to the requested backend combination.
+
+    The Postgres backends run the app's own lifespan and keep its
+    ``get_user_repository``, so the user cache, insert batcher and replicas
+    are configured (and measured) as in production; only email delivery is
+    replaced. Admission control is switched off: it would turn requests over
+    its limits into 503s, and this benchmark measures the full flow. Rate
+    limiting stays on; every virtual user has its own client address.
+    """
+    admission_enabled = settings.admission_enabled
+    settings.admission_enabled = False
+    controller = None
+    email_service: EmailServiceInterface = CapturingEmailService(mailbox)
+    pool = None
+    try:
+        async with AsyncExitStack() as stack:
+            if name == "memory":
+                password_hasher.start()
+                stack.callback(password_hasher.shutdown)
+                repository = InMemoryUserRepository()
+
+                async def override_repository() -> Any:
+                    return repository
+
+                app.dependency_overrides[get_user_repository] = override_repository
+            else:
+                await stack.enter_async_context(app.router.lifespan_context(app))
+
+            if name == "postgres+smtp":
+                port = free_port()
+                controller = Controller(SinkHandler(mailbox), hostname="127.0.0.1", port=port)
+                controller.start()
+                pool = SMTPConnectionPool(host="127.0.0.1", port=port)
+                email_service = QueuedEmailService(
+                    SMTPEmailService(host="127.0.0.1", port=port, pool=pool)
+                )
+                email_service.start()
+
+            async def override_email_service() -> EmailServiceInterface:
+                return email_service
+
+            app.dependency_overrides[get_email_service] = override_email_service
+            yield
+    finally:
+        settings.admission_enabled = admission_enabled
+        app.dependency_overrides.clear()
+        if isinstance(email_service, QueuedEmailService):
+            await email_service.stop()
+        if pool:
+            await pool.close()
+        if controller:
+            controller.stop()
+
+
+async def run_flow(
+    client: AsyncClient,
+    mailbox: CodeMailbox,
+    email: str,
+    latencies: dict[str, list[float]],
+    errors: dict[str, int],
+) -> None:
+    """Register, resend a code, then activate one user, timing each call."""
+
+    async def call(endpoint: str, **kwargs: Any) -> bool:
+        started = time.perf_counter()
+        response = await client.post(endpoint, **kwargs)
+        latencies[endpoint].append(time.perf_counter() - started)
+        if response.is_error:
+            errors[endpoint] += 1
+        return not response.is_error
+
+    try:
+        if not await call("/users/register", json={"email": email, "password": PASSWORD}):
+            return
+        first_code = await mailbox.wait_for(email)
+        if not await call("/users/resend-code", auth=(email, PASSWORD)):
+            return
+        code = await mailbox.wait_for(email, previous=first_code)
+        await call("/users/activate", json={"code": code}, auth=(email, PASSWORD))
+    except TimeoutError:
+        errors["email"] += 1
+
+
+def summarize(latencies: list[float], elapsed: float) -> dict[str, float]:
+    """Throughput and nearest-rank latency percentiles (milliseconds) for one endpoint."""
+    ordered = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] * 1000
+
+    return {
+        "requests": len(ordered),
+        "throughput_rps": len(ordered) / elapsed,
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+async def run_backend(name: str, users: int, concurrency: int) -> dict[str, Any]:
+    mailbox = CodeMailbox()
+    latencies: dict[str, list[float]] = defaultdict(list)
+    errors: dict[str, int] = defaultdict(int)
+    run_id = uuid.uuid4().hex[:8]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def virtual_user(i: int) -> None:
+        # One client address per virtual user, as behind a trusted proxy
+        transport = ASGITransport(
+            app=app, client=(f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", 0)
+        )
+        async with semaphore, AsyncClient(transport=transport, base_url="http://bench") as client:
+            await run_flow(client, mailbox, f"bench-{run_id}-{i}@example.com", latencies, errors)
+
+    async with backend(name, mailbox):
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(i) for i in range(users)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "elapsed_s": elapsed,
+        "flows_per_s": users / elapsed,
+        "email_timeouts": errors["email"],
+        "endpoints": {
+            endpoint: {**summarize(values, elapsed), "errors": errors[endpoint]}
+            for endpoint, values in latencies.items()
+        },
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict[str, Any], baseline: dict[str, Any] | None) -> None:
+    baseline_backends = baseline["backends"] if baseline else {}
+    baseline_name = (baseline or {}).get("revision") or "baseline"
+    print(
+        f"{'backend':<15}{'endpoint':<20}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err':>6}"
+    )
+    for name, result in results["backends"].items():
+        previous = baseline_backends.get(name, {}).get("endpoints", {})
+        for endpoint, stats in result["endpoints"].items():
+            line = (
+                f"{name:<15}{endpoint:<20}{stats['throughput_rps']:>9.1f}"
+                f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+                f"{stats['errors']:>6}"
+            )
+            if endpoint in previous:
+                delta = stats["p95_ms"] / max(previous[endpoint]["p95_ms"], 1e-9) - 1
+                line += f"   p95 {delta:+.0%} vs {baseline_name}"
+            print(line)
+        if result["email_timeouts"]:
+            print(f"{name:<15}{'email timeouts':<20}{result['email_timeouts']:>9}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.database_url:
+        settings.database_url = args.database_url
+
+    results: dict[str, Any] = {
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "backends": {},
+    }
+    for name in args.backend or BACKENDS:
+        results["backends"][name] = await run_backend(name, args.users, args.concurrency)
+
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_results(results, baseline)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backend", action="append", choices=BACKENDS, help="repeatable")
+    parser.add_argument("--users", type=int, default=200, help="register/resend/activate flows")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--database-url", help="default: DATABASE_URL")
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="baseline JSON to compare p95 against")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,108 @@
+from dataclasses import replace
+from datetime import UTC, datetime
+from typing import Any
+from uuid import UUID, uuid4
+
+from app.models.user import ActivationStatus, UserRecord
+from app.repositories.user_repository import NewUser
+
+
+class InMemoryUserRepository:
+    """Dict-backed stand-in for UserRepository, for the ``memory`` benchmark backend."""
+
+    def __init__(self) -> None:
+        self.users: dict[str, UserRecord] = {}
+        self.by_id: dict[UUID, str] = {}
+
+    def _replace(self, user_id: UUID, **changes: Any) -> bool:
+        email = self.by_id.get(user_id)
+        if email is None:
+            return False
+        self.users[email] = replace(self.users[email], **changes)
+        return True
+
+    def invalidate(self, user_id: UUID) -> None:
+        pass
+
+    async def create_user(
+        self,
+        email: str,
+        password_hash: str,
+        activation_code: str | None,
+        activation_code_expires_at: datetime | None,
+        queue_email: bool = False,
+    ) -> UserRecord | None:
+        if email in self.users:
+            return None
+        now = datetime.now(UTC)
+        user = UserRecord(
+            id=uuid4(),
+            email=email,
+            password_hash=password_hash,
+            is_active=False,
+            activation_code=activation_code,
+            activation_code_expires_at=activation_code_expires_at,
+            created_at=now,
+            updated_at=now,
+        )
+        self.users[email] = user
+        self.by_id[user.id] = email
+        return user
+
+    async def create_users(self, users: list[NewUser]) -> dict[str, UserRecord]:
+        created = {}
+        for user in users:
+            row = await self.create_user(*user)
+            if row is not None:
+                created[user.email] = row
+        return created
+
+    async def get_user_by_email(self, email: str) -> UserRecord | None:
+        return self.users.get(email)
+
+    async def get_user_by_id(self, user_id: UUID) -> UserRecord | None:
+        email = self.by_id.get(user_id)
+        return None if email is None else self.users[email]
+
+    async def activate_user(self, user_id: UUID) -> bool:
+        return self._replace(
+            user_id, is_active=True, activation_code=None, activation_code_expires_at=None
+        )
+
+    async def activate_user_with_code(self, user_id: UUID, code: str) -> ActivationStatus:
+        user = await self.get_user_by_id(user_id)
+        if user is None:
+            return ActivationStatus.NOT_FOUND
+        if user.is_active:
+            return ActivationStatus.ALREADY_ACTIVE
+        if user.activation_code != code or user.activation_code_expires_at is None:
+            return ActivationStatus.INVALID_CODE
+        if user.activation_code_expires_at <= datetime.now(UTC):
+            return ActivationStatus.EXPIRED
+        await self.activate_user(user_id)
+        return ActivationStatus.ACTIVATED
+
+    async def update_activation_code(
+        self,
+        user_id: UUID,
+        activation_code: str,
+        activation_code_expires_at: datetime,
+        queue_email: bool = False,
+    ) -> bool:
+        return self._replace(
+            user_id,
+            activation_code=activation_code,
+            activation_code_expires_at=activation_code_expires_at,
+        )
+
+    async def update_password_hash(self, user_id: UUID, old_hash: str, new_hash: str) -> bool:
+        user = await self.get_user_by_id(user_id)
+        if user is None or user.password_hash != old_hash:
+            return False
+        return self._replace(user_id, password_hash=new_hash)
+
+    async def email_exists(self, email: str) -> bool:
+        return email in self.users
+
+    async def existing_emails(self, emails: list[str]) -> set[str]:
+        return {email for email in emails if email in self.users}
@@ -0,0 +1,94 @@
+"""Compare one-shot SMTP sends against pooled sessions and batched sends.
+
+Runs a local aiosmtpd sink so no external SMTP server is needed:
+
+    python -m benchmarks.smtp_pool --messages 2000 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import time
+
+from aiosmtpd.controller import Controller
+
+from app.services.email_service import SMTPEmailService
+from app.services.smtp_pool import SMTPConnectionPool
+
+
+class SinkHandler:
+    """aiosmtpd handler that accepts and discards every message."""
+
+    def __init__(self):
+        self.received = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 OK"
+
+
+async def run_concurrent(service: SMTPEmailService, messages: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(i: int) -> None:
+        async with semaphore:
+            await service.send_activation_code(f"user{i}@example.com", f"{i % 10000:04d}")
+
+    await asyncio.gather(*(send(i) for i in range(messages)))
+
+
+async def run_batched(service: SMTPEmailService, messages: int, batch_size: int) -> None:
+    batch = [(f"user{i}@example.com", f"{i % 10000:04d}") for i in range(messages)]
+    await asyncio.gather(
+        *(
+            service.send_many(batch[start : start + batch_size])
+            for start in range(0, messages, batch_size)
+        )
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    handler = SinkHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=args.port)
+    controller.start()
+    try:
+        pool = SMTPConnectionPool(host="127.0.0.1", port=args.port, size=args.pool_size)
+        scenarios = {
+            "one-shot": lambda: run_concurrent(
+                SMTPEmailService(host="127.0.0.1", port=args.port),
+                args.messages,
+                args.concurrency,
+            ),
+            "pooled": lambda: run_concurrent(
+                SMTPEmailService(host="127.0.0.1", port=args.port, pool=pool),
+                args.messages,
+                args.concurrency,
+            ),
+            "send_many": lambda: run_batched(
+                SMTPEmailService(host="127.0.0.1", port=args.port, pool=pool),
+                args.messages,
+                args.batch_size,
+            ),
+        }
+
+        print(f"{'scenario':<12}{'seconds':>10}{'msg/s':>12}{'received':>10}")
+        for name, scenario in scenarios.items():
+            handler.received = 0
+            started = time.perf_counter()
+            await scenario()
+            elapsed = time.perf_counter() - started
+            print(
+                f"{name:<12}{elapsed:>10.2f}{args.messages / elapsed:>12.0f}{handler.received:>10}"
+            )
+        await pool.close()
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--port", type=int, default=8026)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,67 @@
+"""Compare mapping asyncpg rows to UserInDB (Pydantic) against UserRecord.
+
+Fetches one user-shaped row from Postgres (no tables needed) and times the
+per-row conversion on the auth path, reporting CPU time and memory allocated
+per conversion:
+
+    python -m benchmarks.user_record --database-url postgresql://localhost/postgres
+"""
+
+import argparse
+import asyncio
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+import asyncpg
+
+from app.config import settings
+from app.models.user import UserInDB, UserRecord
+
+ROW_QUERY = """
+    SELECT gen_random_uuid() AS id,
+           'user@example.com' AS email,
+           '$2b$12$' || repeat('x', 53) AS password_hash,
+           FALSE AS is_active,
+           '1234' AS activation_code,
+           NOW() + INTERVAL '1 minute' AS activation_code_expires_at,
+           NOW() AS created_at,
+           NOW() AS updated_at
+"""
+
+
+def allocated_bytes(convert: Callable[[], Any], rounds: int = 1000) -> float:
+    """Average bytes still allocated per conversion while the results are kept alive."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [convert() for _ in range(rounds)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return (after - before) / rounds
+
+
+async def main(args: argparse.Namespace) -> None:
+    conn = await asyncpg.connect(args.database_url or settings.database_url)
+    try:
+        row = await conn.fetchrow(ROW_QUERY)
+    finally:
+        await conn.close()
+
+    scenarios: dict[str, Callable[[], Any]] = {
+        "UserInDB(**dict(row))": lambda: UserInDB(**dict(row)),
+        "UserRecord.from_row(row)": lambda: UserRecord.from_row(row),
+    }
+
+    print(f"{'conversion':<28}{'us/row':>10}{'bytes/row':>12}")
+    for name, convert in scenarios.items():
+        seconds = min(timeit.repeat(convert, number=args.rows, repeat=5)) / args.rows
+        print(f"{name:<28}{seconds * 1e6:>10.2f}{allocated_bytes(convert):>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--database-url", help="default: DATABASE_URL")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,14 @@
+-- Activation emails waiting to be sent, written in the same statement as the
+-- user insert or activation-code update (transactional outbox)
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    email VARCHAR(255) NOT NULL,
+    activation_code VARCHAR(4) NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- Index for claiming the next due batch
+CREATE INDEX IF NOT EXISTS idx_email_outbox_available_at ON email_outbox(available_at);
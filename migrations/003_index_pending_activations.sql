@@ -0,0 +1,8 @@
+-- Partial indexes over not-yet-activated users only, so the background
+-- sweeper can find expired activation codes (and, with a retention period,
+-- stale unactivated accounts) without scanning the whole users table
+CREATE INDEX IF NOT EXISTS idx_users_pending_code_expires_at
+    ON users(activation_code_expires_at) WHERE NOT is_active;
+
+CREATE INDEX IF NOT EXISTS idx_users_pending_created_at
+    ON users(created_at) WHERE NOT is_active;
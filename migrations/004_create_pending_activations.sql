@@ -0,0 +1,11 @@
+-- Activation codes kept outside the users table (ACTIVATION_CODE_STORE=postgres),
+-- so issuing and resending codes does not rewrite users rows. The table can be
+-- switched to UNLOGGED at startup (PENDING_ACTIVATIONS_UNLOGGED=true).
+CREATE TABLE IF NOT EXISTS pending_activations (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    code VARCHAR(4) NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- Index for TTL cleanup of expired codes
+CREATE INDEX IF NOT EXISTS idx_pending_activations_expires_at ON pending_activations(expires_at);
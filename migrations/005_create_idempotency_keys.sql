@@ -0,0 +1,13 @@
+-- Responses to requests sent with an Idempotency-Key, replayed to retries from
+-- any worker until they expire (only used with IDEMPOTENCY_STORE=postgres)
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    key TEXT PRIMARY KEY,
+    status_code SMALLINT NOT NULL,
+    body JSONB NOT NULL,
+    -- Keyed digest of the request body and credentials; a replay must match it
+    fingerprint TEXT NOT NULL,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+
+-- Index for deleting expired keys
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires_at ON idempotency_keys(expires_at);
@@ -1,4 +1,5 @@
 from collections.abc import AsyncGenerator
+from dataclasses import replace
 from datetime import UTC, datetime
 from uuid import uuid4
 
@@ -8,15 +9,19 @@ from httpx import ASGITransport, AsyncClient
 
 from app.dependencies import get_email_service, get_user_repository
 from app.main import app
-from app.models.user import UserInDB
+from app.models.user import ActivationStatus, UserRecord
+from app.repositories.user_repository import NewUser
 from app.services.email_service import EmailServiceInterface
+from app.services.idempotency import Idempotency, idempotency
+from app.services.rate_limiter import InMemoryRateLimitBackend, rate_limiter
 
 
 class MockUserRepository:
     """Mock repository for testing without database."""
 
     def __init__(self):
-        self.users: dict[str, UserInDB] = {}
+        self.users: dict[str, UserRecord] = {}
+        self.outbox: list[dict] = []
 
     async def create_user(
         self,
@@ -24,8 +29,11 @@ class MockUserRepository:
         password_hash: str,
         activation_code: str,
         activation_code_expires_at: datetime,
-    ) -> UserInDB:
-        user = UserInDB(
+        queue_email: bool = False,
+    ) -> UserRecord | None:
+        if email in self.users:
+            return None
+        user = UserRecord(
             id=uuid4(),
             email=email,
             password_hash=password_hash,
@@ -36,47 +44,84 @@ class MockUserRepository:
             updated_at=datetime.now(UTC),
         )
         self.users[email] = user
+        if queue_email:
+            self.outbox.append({"email": email, "code": activation_code})
         return user
 
-    async def get_user_by_email(self, email: str) -> UserInDB | None:
+    async def create_users(self, users: list[NewUser]) -> dict[str, UserRecord]:
+        created = {}
+        for user in users:
+            row = await self.create_user(*user)
+            if row is not None:
+                created[user.email] = row
+        return created
+
+    async def get_user_by_email(self, email: str) -> UserRecord | None:
         return self.users.get(email)
 
-    async def get_user_by_id(self, user_id) -> UserInDB | None:
+    async def get_user_by_id(self, user_id) -> UserRecord | None:
         for user in self.users.values():
             if user.id == user_id:
                 return user
         return None
 
+    def invalidate(self, user_id) -> None:
+        pass
+
+    async def update_password_hash(self, user_id, old_hash: str, new_hash: str) -> bool:
+        for email, user in self.users.items():
+            if user.id == user_id and user.password_hash == old_hash:
+                self.users[email] = replace(user, password_hash=new_hash)
+                return True
+        return False
+
     async def activate_user(self, user_id) -> bool:
         for email, user in self.users.items():
             if user.id == user_id:
-                self.users[email] = user.model_copy(
-                    update={
-                        "is_active": True,
-                        "activation_code": None,
-                        "activation_code_expires_at": None,
-                    }
+                self.users[email] = replace(
+                    user, is_active=True, activation_code=None, activation_code_expires_at=None
                 )
                 return True
         return False
 
+    async def activate_user_with_code(self, user_id, code: str) -> ActivationStatus:
+        user = await self.get_user_by_id(user_id)
+        if user is None:
+            return ActivationStatus.NOT_FOUND
+        if user.is_active:
+            return ActivationStatus.ALREADY_ACTIVE
+        if user.activation_code != code or user.activation_code_expires_at is None:
+            return ActivationStatus.INVALID_CODE
+        if user.activation_code_expires_at <= datetime.now(UTC):
+            return ActivationStatus.EXPIRED
+        await self.activate_user(user_id)
+        return ActivationStatus.ACTIVATED
+
     async def update_activation_code(
-        self, user_id, activation_code: str, activation_code_expires_at: datetime
+        self,
+        user_id,
+        activation_code: str,
+        activation_code_expires_at: datetime,
+        queue_email: bool = False,
     ) -> bool:
         for email, user in self.users.items():
             if user.id == user_id:
-                self.users[email] = user.model_copy(
-                    update={
-                        "activation_code": activation_code,
-                        "activation_code_expires_at": activation_code_expires_at,
-                    }
+                self.users[email] = replace(
+                    user,
+                    activation_code=activation_code,
+                    activation_code_expires_at=activation_code_expires_at,
                 )
+                if queue_email:
+                    self.outbox.append({"email": email, "code": activation_code})
                 return True
         return False
 
     async def email_exists(self, email: str) -> bool:
         return email in self.users
 
+    async def existing_emails(self, emails: list[str]) -> set[str]:
+        return {email for email in emails if email in self.users}
+
 
 class MockEmailService(EmailServiceInterface):
     """Mock email service for testing."""
@@ -105,8 +150,11 @@ def mock_email_service() -> MockEmailService:
 async def client(
     mock_repository: MockUserRepository,
     mock_email_service: MockEmailService,
+    monkeypatch: pytest.MonkeyPatch,
 ) -> AsyncGenerator[AsyncClient, None]:
-    """Create a test client with mocked dependencies."""
+    """Create a test client with mocked dependencies, empty rate-limit buckets and no stored responses."""
+    monkeypatch.setattr(rate_limiter, "backend", InMemoryRateLimitBackend())
+    monkeypatch.setattr(idempotency, "store", Idempotency().store)
 
     async def override_get_repository():
         return mock_repository
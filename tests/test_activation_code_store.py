@@ -0,0 +1,116 @@
+from collections.abc import Iterator
+from datetime import UTC, datetime, timedelta
+from uuid import UUID
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.models.user import ActivationStatus
+from app.repositories.activation_code_store import (
+    DerivedCodeStore,
+    InMemoryCodeStore,
+    PendingCode,
+    memory_codes,
+)
+from tests.conftest import MockEmailService, MockUserRepository
+from tests.test_activation import basic_auth_header
+
+
+@pytest.fixture
+def memory_store(monkeypatch: pytest.MonkeyPatch) -> Iterator[None]:
+    monkeypatch.setattr(settings, "activation_code_store", "memory")
+    yield
+    memory_codes.clear()
+
+
+@pytest.mark.asyncio
+async def test_memory_store_keeps_codes_off_the_user_row(
+    client: AsyncClient,
+    mock_repository: MockUserRepository,
+    mock_email_service: MockEmailService,
+    valid_user_data: dict,
+    memory_store: None,
+):
+    """Register, resend and activate without writing codes to the users table."""
+    auth = basic_auth_header(valid_user_data["email"], valid_user_data["password"])
+    await client.post("/users/register", json=valid_user_data)
+    user = await mock_repository.get_user_by_email(valid_user_data["email"])
+    assert user is not None
+    assert user.activation_code is None
+    assert memory_codes[user.id][0] == mock_email_service.sent_emails[0]["code"]
+
+    await client.post("/users/resend-code", headers=auth)
+    new_code = mock_email_service.sent_emails[1]["code"]
+    assert memory_codes[user.id][0] == new_code
+
+    response = await client.post("/users/activate", json={"code": new_code}, headers=auth)
+
+    assert response.status_code == 200
+    assert user.id not in memory_codes
+    activated = await mock_repository.get_user_by_email(valid_user_data["email"])
+    assert activated is not None
+    assert activated.is_active is True
+
+
+@pytest.mark.asyncio
+async def test_memory_store_reports_expired_codes(mock_repository: MockUserRepository):
+    """Expired codes are rejected as expired, then dropped by TTL cleanup."""
+    user = await mock_repository.create_user("user@example.com", "hash", None, None)
+    assert user is not None
+    store = InMemoryCodeStore(mock_repository, {})
+    expired_at = datetime.now(UTC) - timedelta(hours=2)
+    await store.save(PendingCode(user.id, user.email, "1234", expired_at))
+
+    assert await store.activate(user.id, "1234") is ActivationStatus.EXPIRED
+    assert await store.activate(user.id, "9999") is ActivationStatus.INVALID_CODE
+    assert await store.clear_expired(grace_seconds=3600, limit=10) == 1
+    assert store.codes == {}
+
+
+@pytest.mark.asyncio
+async def test_derived_codes_need_no_stored_code(
+    client: AsyncClient,
+    mock_repository: MockUserRepository,
+    mock_email_service: MockEmailService,
+    valid_user_data: dict,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Derived codes are recomputed on activation; resend within a window resends the same code."""
+    monkeypatch.setattr(settings, "activation_code_store", "derived")
+    monkeypatch.setattr(settings, "activation_code_secret", "test-secret")
+    auth = basic_auth_header(valid_user_data["email"], valid_user_data["password"])
+    await client.post("/users/register", json=valid_user_data)
+    await client.post("/users/resend-code", headers=auth)
+    user = await mock_repository.get_user_by_email(valid_user_data["email"])
+    assert user is not None
+    assert user.activation_code is None
+    code = mock_email_service.sent_emails[-1]["code"]
+
+    response = await client.post("/users/activate", json={"code": code}, headers=auth)
+
+    assert response.status_code == 200
+    activated = await mock_repository.get_user_by_email(valid_user_data["email"])
+    assert activated is not None
+    assert activated.is_active is True
+
+
+@pytest.mark.asyncio
+async def test_derived_codes_are_accepted_for_two_windows(mock_repository: MockUserRepository):
+    """A code is valid in its own window and the next, then reported as expired."""
+    user = await mock_repository.create_user("user@example.com", "hash", None, None)
+    assert user is not None
+    store = DerivedCodeStore(mock_repository, "test-secret", window_seconds=60)
+    other = DerivedCodeStore(mock_repository, "other-secret", window_seconds=60)
+    assert store.code_for(UUID(int=1), 1000) != other.code_for(UUID(int=1), 1000)
+    # A window whose code differs from the next two, so only expiry decides
+    window = next(
+        w for w in range(1000, 1100) if len({store.code_for(user.id, w + i) for i in range(3)}) == 3
+    )
+    issued = store.code_for(user.id, window)
+
+    store._window = lambda: window + 2  # type: ignore[method-assign]
+    assert await store.activate(user.id, issued) is ActivationStatus.EXPIRED
+
+    store._window = lambda: window + 1  # type: ignore[method-assign]
+    assert await store.activate(user.id, issued) is ActivationStatus.ACTIVATED
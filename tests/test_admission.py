@@ -0,0 +1,68 @@
+import pytest
+from httpx import AsyncClient
+
+from app.admission import ConcurrencyLimit, admission_controller
+from app.database import Database
+
+
+def test_limit_rejects_beyond_in_flight_capacity():
+    """Requests beyond the limit are rejected until one finishes."""
+    limit = ConcurrencyLimit(2, target_seconds=1.0)
+
+    assert [limit.try_acquire() for _ in range(3)] == [True, True, False]
+    limit.release(0.01, overloaded=False)
+
+    assert limit.try_acquire() is True
+    assert limit.stats() == {"limit": 2, "in_flight": 2, "admitted": 3, "rejected": 1}
+
+
+def test_adaptive_limit_grows_when_fast_and_backs_off_when_slow():
+    """Fast busy requests raise the limit additively; slow ones cut it once per period."""
+    limit = ConcurrencyLimit(4, target_seconds=0.5, adaptive=True)
+    for _ in range(4):
+        limit.try_acquire()
+    for _ in range(4):
+        limit.release(0.01, overloaded=False)
+    assert limit.limit > 4
+
+    grown = limit.limit
+    for _ in range(2):
+        limit.try_acquire()
+    limit.release(1.0, overloaded=False)
+    limit.release(0.01, overloaded=True)
+
+    assert limit.limit == pytest.approx(grown / 2)
+
+
+@pytest.mark.asyncio
+async def test_saturated_class_is_shed_but_health_is_exempt(
+    client: AsyncClient,
+    valid_user_data: dict,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """A full route class gets a 503 with Retry-After; other classes and /health still work."""
+    monkeypatch.setitem(admission_controller.limits, "hash", ConcurrencyLimit(0, 1.0))
+
+    shed = await client.post("/users/register", json=valid_user_data)
+    lookup = await client.get("/users/email-available", params={"email": "a@example.com"})
+    health = await client.get("/health")
+
+    assert shed.status_code == 503
+    assert shed.headers["Retry-After"] == "1"
+    assert lookup.status_code == 200
+    assert health.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_pool_waiters_shed_database_routes(
+    client: AsyncClient,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Requests are shed while too many callers already wait for a connection."""
+    monkeypatch.setattr(Database, "waiting", 1000)
+
+    lookup = await client.get("/users/email-available", params={"email": "a@example.com"})
+    health = await client.get("/health")
+
+    assert lookup.status_code == 503
+    assert health.status_code == 200
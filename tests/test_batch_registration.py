@@ -0,0 +1,107 @@
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from tests.conftest import MockEmailService, MockUserRepository
+
+
+@pytest.fixture
+def partner_headers(monkeypatch: pytest.MonkeyPatch) -> dict:
+    """Configure a partner API key and return the headers carrying it."""
+    monkeypatch.setattr(settings, "batch_registration_api_keys", ["partner-key"])
+    return {"X-API-Key": "partner-key"}
+
+
+@pytest.mark.asyncio
+async def test_batch_registration_reports_each_entry(
+    client: AsyncClient,
+    mock_repository: MockUserRepository,
+    mock_email_service: MockEmailService,
+    valid_user_data: dict,
+    partner_headers: dict,
+):
+    """Test that created, duplicate and invalid entries are reported per item."""
+    await client.post("/users/register", json=valid_user_data)
+    mock_email_service.sent_emails.clear()
+
+    response = await client.post(
+        "/users/register:batch",
+        headers=partner_headers,
+        json={
+            "users": [
+                {"email": "new1@example.com", "password": "SecurePass123"},
+                valid_user_data,
+                {"email": "not-an-email", "password": "SecurePass123"},
+                {"email": "new2@example.com", "password": "short"},
+                {"email": "new2@example.com", "password": "SecurePass123"},
+                {"email": "new1@example.com", "password": "SecurePass123"},
+            ]
+        },
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [result["status"] for result in data["results"]] == [
+        "created",
+        "duplicate",
+        "invalid",
+        "invalid",
+        "created",
+        "duplicate",
+    ]
+    assert [result["index"] for result in data["results"]] == list(range(6))
+    assert (data["created"], data["duplicate"], data["invalid"]) == (2, 2, 2)
+    assert "8 characters" in data["results"][3]["error"]
+
+    assert await mock_repository.get_user_by_email("new1@example.com") is not None
+    assert await mock_repository.get_user_by_email("new2@example.com") is not None
+    assert sorted(email["email"] for email in mock_email_service.sent_emails) == [
+        "new1@example.com",
+        "new2@example.com",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_batch_registration_codes_activate(
+    client: AsyncClient,
+    mock_email_service: MockEmailService,
+    partner_headers: dict,
+):
+    """Test that users created in a batch can log in and activate."""
+    await client.post(
+        "/users/register:batch",
+        json={"users": [{"email": "batch@example.com", "password": "SecurePass123"}]},
+        headers=partner_headers,
+    )
+    code = mock_email_service.sent_emails[0]["code"]
+
+    response = await client.post(
+        "/users/activate",
+        json={"code": code},
+        auth=("batch@example.com", "SecurePass123"),
+    )
+    assert response.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_batch_registration_rejects_empty_batch(client: AsyncClient, partner_headers: dict):
+    """Test that an empty batch fails validation."""
+    response = await client.post(
+        "/users/register:batch", json={"users": []}, headers=partner_headers
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_batch_registration_requires_partner_key(
+    client: AsyncClient, mock_repository: MockUserRepository, partner_headers: dict
+):
+    """Test that the batch endpoint rejects missing or unknown API keys."""
+    batch = {"users": [{"email": "batch@example.com", "password": "SecurePass123"}]}
+
+    missing = await client.post("/users/register:batch", json=batch)
+    wrong = await client.post("/users/register:batch", json=batch, headers={"X-API-Key": "nope"})
+
+    assert missing.status_code == 401
+    assert wrong.status_code == 401
+    assert mock_repository.users == {}
@@ -0,0 +1,54 @@
+import pytest
+
+from app.services.code_sweeper import ActivationCodeSweeper
+
+
+class SweepableRepository:
+    """Repository and code store stand-in with a fixed number of expired codes and stale accounts."""
+
+    def __init__(self, expired: int, stale: int):
+        self.expired = expired
+        self.stale = stale
+        self.batches: list[tuple[str, int]] = []
+
+    async def clear_expired(self, grace_seconds: float, limit: int) -> int:
+        cleared = min(limit, self.expired)
+        self.expired -= cleared
+        self.batches.append(("clear", cleared))
+        return cleared
+
+    async def purge_unactivated(self, older_than_seconds: float, limit: int) -> int:
+        purged = min(limit, self.stale)
+        self.stale -= purged
+        self.batches.append(("purge", purged))
+        return purged
+
+
+@pytest.mark.asyncio
+async def test_sweep_clears_in_bounded_batches():
+    """Expired codes are cleared batch by batch until a short batch."""
+    repository = SweepableRepository(expired=25, stale=7)
+    sweeper = ActivationCodeSweeper(repository, repository)
+    sweeper.batch_size = 10
+    sweeper.batch_pause = 0
+
+    await sweeper.sweep()
+
+    assert repository.batches == [("clear", 10), ("clear", 10), ("clear", 5)]
+    assert repository.stale == 7  # retention disabled by default
+    assert sweeper.counters["cleared"] == 25
+
+
+@pytest.mark.asyncio
+async def test_sweep_purges_unactivated_accounts_with_retention():
+    """With a retention period, stale unactivated accounts are purged first."""
+    repository = SweepableRepository(expired=3, stale=12)
+    sweeper = ActivationCodeSweeper(repository, repository)
+    sweeper.batch_size = 10
+    sweeper.batch_pause = 0
+    sweeper.retention_seconds = 86400
+
+    await sweeper.sweep()
+
+    assert repository.batches == [("purge", 10), ("purge", 2), ("clear", 3)]
+    assert sweeper.counters == {"purged": 12, "cleared": 3}
@@ -0,0 +1,114 @@
+import asyncio
+from datetime import UTC, datetime
+from uuid import uuid4
+
+import asyncpg
+import pytest
+from httpx import AsyncClient
+
+from app import database
+from app.config import settings
+from app.database import Database
+from app.exceptions import DatabaseUnavailableError
+from app.models.user import UserInDB, UserRecord
+from tests.conftest import MockUserRepository
+
+
+class ExhaustedPool:
+    """Pool stand-in whose connections are all checked out."""
+
+    async def acquire(self, timeout: float | None = None):
+        await asyncio.wait_for(asyncio.Event().wait(), timeout)
+
+    async def release(self, conn) -> None:
+        raise AssertionError("nothing was acquired")
+
+
+@pytest.mark.asyncio
+async def test_acquire_timeout_raises_503(monkeypatch: pytest.MonkeyPatch):
+    """Waiting past the acquire timeout fails fast instead of hanging."""
+    monkeypatch.setattr(settings, "db_pool_acquire_timeout_seconds", 0.01)
+    timeouts = Database.acquire_timeouts
+
+    with pytest.raises(DatabaseUnavailableError) as exc_info:
+        async with Database.acquire(ExhaustedPool()):
+            pass
+
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "1"}
+    assert Database.acquire_timeouts == timeouts + 1
+    assert Database.stats()["waiting"] == 0
+
+
+@pytest.mark.asyncio
+async def test_pool_exhaustion_returns_503(
+    client: AsyncClient,
+    mock_repository: MockUserRepository,
+    valid_user_data: dict,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Requests see a 503 with Retry-After when the pool is exhausted."""
+
+    async def unavailable(email: str) -> bool:
+        raise DatabaseUnavailableError()
+
+    monkeypatch.setattr(mock_repository, "email_exists", unavailable)
+
+    response = await client.post("/users/register", json=valid_user_data)
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_pool_stats_endpoint(client: AsyncClient):
+    """Pool statistics are exposed without a pool being connected."""
+    response = await client.get("/health/db")
+
+    assert response.status_code == 200
+    assert {"waiting", "acquire_timeouts"} <= response.json().keys()
+
+
+def test_user_record_from_row_converts_to_model():
+    """Rows map into UserRecord by column name, and records still validate as UserInDB."""
+    now = datetime.now(UTC)
+    row = {
+        "updated_at": now,
+        "created_at": now,
+        "activation_code_expires_at": None,
+        "activation_code": None,
+        "is_active": True,
+        "password_hash": "hash",
+        "email": "user@example.com",
+        "id": uuid4(),
+    }
+
+    record = UserRecord.from_row(row)
+
+    assert UserInDB.model_validate(record).model_dump() == row
+
+
+def test_pinned_asyncpg_supports_statement_cache_warming():
+    """The pool warm-up relies on asyncpg's private Connection._prepare(use_cache=True)."""
+    assert database._CACHE_WARMING
+
+
+@pytest.mark.asyncio
+async def test_warmed_statements_are_reused():
+    """Queries prepared by the pool's init hook are served from the cache, not re-prepared."""
+    query = "SELECT $1::int + 1"
+    try:
+        pool = await asyncio.wait_for(
+            database._create_pool(settings.database_url, [query], min_size=1), 2
+        )
+    except (OSError, TimeoutError, asyncpg.PostgresError):
+        pytest.skip("no database at DATABASE_URL")
+    try:
+        count = "SELECT count(*) FROM pg_prepared_statements WHERE statement = $1"
+        async with pool.acquire() as conn:
+            warmed = await conn.fetchval(count, query)
+            assert await conn.fetchval(query, 1) == 2
+            after_use = await conn.fetchval(count, query)
+        assert (warmed, after_use) == (1, 1)
+    finally:
+        await pool.close()
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from app.repositories import email_filter as email_filter_module
+from app.repositories.email_filter import BloomFilter, EmailFilter, email_filter
+from app.repositories.user_repository import UserRepository
+from tests.conftest import MockUserRepository
+from tests.test_user_cache import FakePool
+
+
+@pytest.fixture
+def loaded_filter(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(email_filter, "bloom", None)
+    email_filter.load(["taken@example.com"], capacity=1000)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Every added item is found; unknown items are rarely reported at the target rate."""
+    bloom = BloomFilter(capacity=5000, fp_rate=0.01, max_bytes=1 << 20)
+    bloom.update(f"user{index}@example.com" for index in range(5000))
+
+    assert all(f"user{index}@example.com" in bloom for index in range(5000))
+    false_positives = sum(f"other{index}@example.com" in bloom for index in range(5000))
+    assert false_positives < 5000 * 0.02
+    assert bloom.fp_rate == pytest.approx(0.01, rel=0.2)
+
+
+def test_bloom_filter_memory_is_capped():
+    """A filter that would exceed max_bytes is truncated, raising its expected FP rate."""
+    bloom = BloomFilter(capacity=100_000, fp_rate=0.001, max_bytes=1024)
+    bloom.update(f"user{index}@example.com" for index in range(1000))
+
+    assert len(bloom.bits) == 1024
+    assert bloom.fp_rate > 0.001
+
+
+@pytest.mark.asyncio
+async def test_negative_answers_skip_the_database(
+    client: AsyncClient,
+    mock_repository: MockUserRepository,
+    monkeypatch: pytest.MonkeyPatch,
+    loaded_filter: None,
+):
+    """Unknown emails are available without a query; a "maybe" is checked in the database."""
+    queried: list[str] = []
+
+    async def email_exists(email: str) -> bool:
+        queried.append(email)
+        return email == "taken@example.com"
+
+    monkeypatch.setattr(mock_repository, "email_exists", email_exists)
+
+    free = await client.get("/users/email-available", params={"email": "free@example.com"})
+    taken = await client.get("/users/email-available", params={"email": "taken@example.com"})
+    invalid = await client.get("/users/email-available", params={"email": "not-an-email"})
+
+    assert free.json() == {"email": "free@example.com", "available": True}
+    assert taken.json() == {"email": "taken@example.com", "available": False}
+    assert invalid.status_code == 422
+    assert queried == ["taken@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_created_users_are_added_to_the_filter(loaded_filter: None):
+    """Emails inserted through the repository are in the filter right away."""
+    pool = FakePool()
+    await UserRepository(pool).create_user(pool.row["email"], "hash", None, None)
+
+    assert email_filter.might_contain(pool.row["email"]) is True
+
+
+@pytest.mark.asyncio
+async def test_builds_are_staggered_between_workers(monkeypatch: pytest.MonkeyPatch):
+    """The first build waits a random startup delay; rebuilds are jittered around the interval."""
+    delays: list[float] = []
+
+    async def sleep(delay: float) -> None:
+        delays.append(delay)
+        if len(delays) == 50:
+            raise asyncio.CancelledError
+
+    async def rebuild(pool: FakePool, replicas: None) -> None:
+        pass
+
+    bloom_filter = EmailFilter()
+    monkeypatch.setattr(bloom_filter, "rebuild", rebuild)
+    monkeypatch.setattr(email_filter_module.asyncio, "sleep", sleep)
+    with pytest.raises(asyncio.CancelledError):
+        await bloom_filter._run(FakePool(), None, interval=300)
+
+    assert 0 <= delays[0] <= email_filter_module.STARTUP_JITTER_SECONDS
+    assert all(225 <= delay <= 375 for delay in delays[1:])
+    assert len(set(delays[1:])) > 1
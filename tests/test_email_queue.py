@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+from app.services.email_queue import QueuedEmailService
+from tests.conftest import MockEmailService
+
+
+class FlakyEmailService(MockEmailService):
+    """Mock email service that fails a fixed number of times before succeeding."""
+
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    async def send_activation_code(self, email: str, code: str) -> bool:
+        if self.failures > 0:
+            self.failures -= 1
+            return False
+        return await super().send_activation_code(email, code)
+
+
+@pytest.mark.asyncio
+async def test_queued_email_is_delivered_in_background():
+    """Test that queued emails are delivered by the workers and drained on stop."""
+    backend = MockEmailService()
+    service = QueuedEmailService(backend)
+    service.start(workers=2, queue_size=10)
+
+    assert await service.send_activation_code("test@example.com", "1234") is True
+    await service.stop()
+
+    assert backend.sent_emails == [{"email": "test@example.com", "code": "1234"}]
+    assert service.counters["queued"] == 1
+    assert service.counters["sent"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_delivery_is_retried_with_backoff():
+    """Test that a failing backend is retried until it succeeds."""
+    backend = FlakyEmailService(failures=2)
+    service = QueuedEmailService(backend)
+    service.retry_backoff = 0
+    service.start(workers=1, queue_size=10)
+
+    await service.send_activation_code("test@example.com", "1234")
+    await service.stop()
+
+    assert len(backend.sent_emails) == 1
+    assert service.counters["retried"] == 2
+    assert service.counters["failed"] == 0
+
+
+@pytest.mark.asyncio
+async def test_delivery_gives_up_after_max_attempts():
+    """Test that a permanently failing message is counted as failed."""
+    backend = FlakyEmailService(failures=10)
+    service = QueuedEmailService(backend)
+    service.retry_backoff = 0
+    service.max_attempts = 3
+    service.start(workers=1, queue_size=10)
+
+    await service.send_activation_code("test@example.com", "1234")
+    await service.stop()
+
+    assert backend.sent_emails == []
+    assert service.counters["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_full_queue_falls_back_to_inline_delivery():
+    """Test that a full queue sends inline instead of dropping the code."""
+    backend = MockEmailService()
+    service = QueuedEmailService(backend)
+    service.start(workers=1, queue_size=1)
+    await asyncio.sleep(0)
+
+    for i in range(3):
+        await service.send_activation_code(f"user{i}@example.com", "1234")
+    await service.stop()
+
+    assert len(backend.sent_emails) == 3
+    assert service.counters["overflow"] >= 1
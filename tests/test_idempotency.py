@@ -0,0 +1,143 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from app.exceptions import IdempotencyKeyReusedError
+from app.models.user import ActivationResponse
+from app.services import idempotency as idempotency_module
+from app.services.idempotency import Idempotency, MemoryIdempotencyStore, StoredResponse
+
+
+@pytest.mark.asyncio
+async def test_register_retry_is_replayed(
+    client: AsyncClient, mock_email_service, valid_user_data: dict
+):
+    """A retried registration returns the first response instead of a 409."""
+    headers = {"Idempotency-Key": "signup-1"}
+    first = await client.post("/users/register", json=valid_user_data, headers=headers)
+    retry = await client.post("/users/register", json=valid_user_data, headers=headers)
+
+    assert first.status_code == 201
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert len(mock_email_service.sent_emails) == 1
+
+    other_key = await client.post(
+        "/users/register", json=valid_user_data, headers={"Idempotency-Key": "signup-2"}
+    )
+    assert other_key.status_code == 409
+
+    other_password = await client.post(
+        "/users/register",
+        json={**valid_user_data, "password": "OtherPass123"},
+        headers=headers,
+    )
+    assert other_password.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_run_once(
+    client: AsyncClient, mock_email_service, valid_user_data: dict
+):
+    """Duplicates arriving while the first request runs wait for its response."""
+    headers = {"Idempotency-Key": "signup-1"}
+    responses = await asyncio.gather(
+        *(client.post("/users/register", json=valid_user_data, headers=headers) for _ in range(3))
+    )
+
+    assert [response.status_code for response in responses] == [201, 201, 201]
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert len(mock_email_service.sent_emails) == 1
+
+
+@pytest.mark.asyncio
+async def test_errors_are_not_replayed(
+    client: AsyncClient, mock_email_service, valid_user_data: dict
+):
+    """A failed resend runs again on retry, so corrected credentials succeed."""
+    await client.post("/users/register", json=valid_user_data)
+    headers = {"Idempotency-Key": "resend-1"}
+
+    wrong = await client.post(
+        "/users/resend-code", auth=(valid_user_data["email"], "WrongPass123"), headers=headers
+    )
+    right = await client.post(
+        "/users/resend-code",
+        auth=(valid_user_data["email"], valid_user_data["password"]),
+        headers=headers,
+    )
+    replayed = await client.post(
+        "/users/resend-code",
+        auth=(valid_user_data["email"], valid_user_data["password"]),
+        headers=headers,
+    )
+
+    assert wrong.status_code == 401
+    assert right.status_code == 200
+    assert replayed.headers["Idempotent-Replayed"] == "true"
+    assert len(mock_email_service.sent_emails) == 2
+
+    # A stored response is never handed out without the right credentials
+    wrong_again = await client.post(
+        "/users/resend-code", auth=(valid_user_data["email"], "WrongPass123"), headers=headers
+    )
+    assert wrong_again.status_code == 422
+    assert "Idempotent-Replayed" not in wrong_again.headers
+
+
+class SlowPutStore(MemoryIdempotencyStore):
+    """Memory store whose put blocks until released, like a slow database write."""
+
+    def __init__(self):
+        super().__init__(max_keys=10, ttl_seconds=60)
+        self.release = asyncio.Event()
+
+    async def put(self, key: str, response: StoredResponse) -> None:
+        await self.release.wait()
+        await super().put(key, response)
+
+
+@pytest.mark.asyncio
+async def test_retry_during_store_write_waits():
+    """A retry arriving while the response is being stored does not run the request again."""
+    store = SlowPutStore()
+    idempotency = Idempotency(store, secret="test")
+    calls = 0
+
+    async def call() -> ActivationResponse:
+        nonlocal calls
+        calls += 1
+        return ActivationResponse()
+
+    fingerprint = idempotency.fingerprint("body")
+    first = asyncio.create_task(idempotency.run("k", "resend:a", fingerprint, 200, call))
+    await asyncio.sleep(0)
+    retry = asyncio.create_task(idempotency.run("k", "resend:a", fingerprint, 200, call))
+    other = idempotency.run("k", "resend:a", idempotency.fingerprint("other"), 200, call)
+    with pytest.raises(IdempotencyKeyReusedError):
+        await other
+    store.release.set()
+    await asyncio.gather(first, retry)
+
+    assert calls == 1
+    assert idempotency.counters["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_memory_store_is_bounded_and_expires(monkeypatch: pytest.MonkeyPatch):
+    """The least recently used key is dropped when full; keys expire after the TTL."""
+    now = [1000.0]
+    monkeypatch.setattr(idempotency_module.time, "monotonic", lambda: now[0])
+    store = MemoryIdempotencyStore(max_keys=2, ttl_seconds=60)
+    response = StoredResponse(200, {"message": "ok"}, "fingerprint")
+
+    await store.put("a", response)
+    await store.put("b", response)
+    assert await store.get("a") == response
+    await store.put("c", response)
+
+    assert await store.get("b") is None
+    now[0] += 60
+    assert await store.get("a") is None
@@ -0,0 +1,109 @@
+import asyncio
+import json
+from datetime import UTC, datetime
+
+import asyncpg
+import pytest
+from passlib.hash import bcrypt
+
+from app.config import settings
+from app.services.password_hasher import PasswordHasher
+from app.tools.import_users import (
+    CREATE_STAGING,
+    ImportStats,
+    chunked,
+    parse_args,
+    prepare_chunk,
+    read_records,
+    write_chunk,
+)
+
+
+def test_read_records_csv_and_jsonl(tmp_path):
+    """Test that CSV and JSONL inputs yield the same records."""
+    csv_path = tmp_path / "users.csv"
+    csv_path.write_text("email,password\na@example.com,SecurePass123\n")
+    jsonl_path = tmp_path / "users.jsonl"
+    jsonl_path.write_text(
+        json.dumps({"email": "a@example.com", "password": "SecurePass123"}) + "\n\n"
+    )
+
+    assert list(read_records(csv_path, "csv")) == list(read_records(jsonl_path, "jsonl"))
+
+
+def test_chunked_bounds_chunk_size():
+    """Test that records are grouped into bounded chunks."""
+    chunks = list(chunked(({"n": i} for i in range(5)), 2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_prepare_chunk_hashes_and_validates():
+    """Test that plaintext is hashed, bcrypt hashes pass through and bad rows are counted."""
+    existing_hash = bcrypt.hash("SecurePass123")
+    expires_at = datetime.now(UTC)
+    hasher = PasswordHasher()
+    hasher.start(kind="thread", workers=2)
+    try:
+        rows, invalid = await prepare_chunk(
+            [
+                {"email": "plain@example.com", "password": "SecurePass123"},
+                {"email": "hashed@example.com", "password_hash": existing_hash},
+                {"email": "not-an-email", "password": "SecurePass123"},
+                {"email": "short@example.com", "password": "short"},
+            ],
+            hasher,
+            expires_at,
+        )
+    finally:
+        hasher.shutdown()
+
+    assert invalid == 2
+    assert [row[0] for row in rows] == ["plain@example.com", "hashed@example.com"]
+    assert bcrypt.verify("SecurePass123", rows[0][1])
+    assert rows[1][1] == existing_hash
+    assert all(len(row[2]) == 4 and row[3] == expires_at for row in rows)
+
+
+def test_send_activation_needs_outbox_delivery(monkeypatch: pytest.MonkeyPatch):
+    """Imported emails are only outbox rows, so queue delivery would never send them."""
+    monkeypatch.setattr(settings, "email_delivery", "queue")
+
+    with pytest.raises(SystemExit):
+        parse_args(["users.csv", "--send-activation"])
+
+    monkeypatch.setattr(settings, "email_delivery", "outbox")
+    assert parse_args(["users.csv", "--send-activation"]).send_activation is True
+
+
+def test_send_activation_needs_users_code_store(monkeypatch: pytest.MonkeyPatch):
+    """Imported codes live on the users row, so other code stores are refused."""
+    monkeypatch.setattr(settings, "email_delivery", "outbox")
+    monkeypatch.setattr(settings, "activation_code_store", "derived")
+
+    with pytest.raises(SystemExit):
+        parse_args(["users.csv", "--send-activation"])
+    assert parse_args(["users.csv"]).send_activation is False
+
+
+@pytest.mark.asyncio
+async def test_import_without_send_activation_needs_no_outbox_table():
+    """A plain import only writes users, so it runs on a database without migration 002."""
+    try:
+        conn = await asyncio.wait_for(asyncpg.connect(settings.database_url), 2)
+    except (OSError, TimeoutError, asyncpg.PostgresError):
+        pytest.skip("no database at DATABASE_URL")
+    try:
+        transaction = conn.transaction()
+        await transaction.start()
+        await conn.execute("DROP TABLE IF EXISTS email_outbox")
+        await conn.execute(CREATE_STAGING)
+        stats = ImportStats()
+        rows = [("import-no-outbox@example.com", bcrypt.hash("SecurePass123"), None, None)]
+
+        await write_chunk(conn, stats, len(rows), rows, 0)
+
+        assert stats.inserted == 1
+        await transaction.rollback()
+    finally:
+        await conn.close()
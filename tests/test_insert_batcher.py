@@ -0,0 +1,79 @@
+import asyncio
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from app.models.user import UserRecord
+from app.repositories.insert_batcher import UserInsertBatcher
+from app.repositories.user_repository import NewUser
+from tests.conftest import MockUserRepository
+
+
+class BatchingMockRepository(MockUserRepository):
+    """Mock repository that records set-based inserts."""
+
+    def __init__(self):
+        super().__init__()
+        self.batch_sizes: list[int] = []
+
+    async def create_users(self, users: list[NewUser]) -> dict[str, UserRecord]:
+        self.batch_sizes.append(len(users))
+        if any(user.email.startswith("bad") for user in users):
+            raise ValueError("rejected row")
+        return await super().create_users(users)
+
+
+def new_user(email: str) -> NewUser:
+    return NewUser(email, "hash", "1234", datetime.now(UTC) + timedelta(minutes=1))
+
+
+@pytest.mark.asyncio
+async def test_concurrent_inserts_share_one_statement():
+    """Test that concurrent creates are written in a single batch."""
+    repository = BatchingMockRepository()
+    await repository.create_user(*new_user("taken@example.com"))
+    batcher = UserInsertBatcher()
+    batcher.start(repository, window_ms=5, max_size=100)
+
+    results = await asyncio.gather(
+        *(batcher.create_user(new_user(f"user{i}@example.com")) for i in range(10)),
+        batcher.create_user(new_user("taken@example.com")),
+        batcher.create_user(new_user("user0@example.com")),
+    )
+    await batcher.stop()
+
+    assert repository.batch_sizes == [11]
+    assert all(result is not None for result in results[:10])
+    assert results[10] is None
+    assert results[11] is None
+
+
+@pytest.mark.asyncio
+async def test_batch_is_flushed_at_max_size():
+    """Test that reaching max_size flushes without waiting for the window."""
+    repository = BatchingMockRepository()
+    batcher = UserInsertBatcher()
+    batcher.start(repository, window_ms=10_000, max_size=3)
+
+    await asyncio.gather(*(batcher.create_user(new_user(f"user{i}@example.com")) for i in range(6)))
+    await batcher.stop()
+
+    assert repository.batch_sizes == [3, 3]
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_only_fails_offending_row():
+    """Test that a failing batch is retried row by row."""
+    repository = BatchingMockRepository()
+    batcher = UserInsertBatcher()
+    batcher.start(repository, window_ms=5, max_size=100)
+
+    good, bad = await asyncio.gather(
+        batcher.create_user(new_user("good@example.com")),
+        batcher.create_user(new_user("bad@example.com")),
+        return_exceptions=True,
+    )
+    await batcher.stop()
+
+    assert isinstance(good, UserRecord)
+    assert isinstance(bad, ValueError)
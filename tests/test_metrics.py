@@ -0,0 +1,60 @@
+import pytest
+from httpx import AsyncClient
+from prometheus_client import REGISTRY
+
+from app.metrics import timed
+
+
+def sample(name: str, **labels: str) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_exposes_route_and_stage_latency(
+    client: AsyncClient,
+    valid_user_data: dict,
+):
+    """Requests are timed per route template and bcrypt per stage."""
+    route = {"method": "POST", "route": "/users/register", "status": "201"}
+    requests_before = sample("http_request_duration_seconds_count", **route)
+    hashes_before = sample("stage_duration_seconds_count", stage="bcrypt.hash")
+
+    await client.post("/users/register", json=valid_user_data)
+
+    assert sample("http_request_duration_seconds_count", **route) == requests_before + 1
+    assert sample("stage_duration_seconds_count", stage="bcrypt.hash") == hashes_before + 1
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/users/register"' in response.text
+    assert "db_pool_waiting" in response.text
+    assert "password_hasher_queue_depth" in response.text
+
+
+@pytest.mark.asyncio
+async def test_exceptions_counted_by_class(client: AsyncClient, valid_user_data: dict):
+    """HTTP exceptions are counted by their class name."""
+    before = sample("app_exceptions_total", exception="UserAlreadyExistsError")
+
+    await client.post("/users/register", json=valid_user_data)
+    response = await client.post("/users/register", json=valid_user_data)
+
+    assert response.status_code == 409
+    assert sample("app_exceptions_total", exception="UserAlreadyExistsError") == before + 1
+
+
+@pytest.mark.asyncio
+async def test_timed_decorator_records_failures():
+    """Stages are timed even when the wrapped coroutine raises."""
+
+    @timed("test.failing")
+    async def failing() -> None:
+        raise ValueError
+
+    before = sample("stage_duration_seconds_count", stage="test.failing")
+    with pytest.raises(ValueError):
+        await failing()
+
+    assert sample("stage_duration_seconds_count", stage="test.failing") == before + 1
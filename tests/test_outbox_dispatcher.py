@@ -0,0 +1,88 @@
+import pytest
+
+from app.config import settings
+from app.repositories.outbox_repository import OutboxMessage
+from app.services.outbox_dispatcher import OutboxDispatcher
+from tests.conftest import MockEmailService
+
+
+class MockOutboxRepository:
+    """In-memory stand-in for EmailOutboxRepository."""
+
+    def __init__(self, messages: list[OutboxMessage]):
+        self.pending = {message.id: message for message in messages}
+        self.rescheduled: list[tuple[list[int], float]] = []
+
+    async def claim_batch(self, limit: int, lease_seconds: float) -> list[OutboxMessage]:
+        claimed = list(self.pending.values())[:limit]
+        for message in claimed:
+            message.attempts += 1
+        return claimed
+
+    async def delete(self, message_ids: list[int]) -> None:
+        for message_id in message_ids:
+            self.pending.pop(message_id)
+
+    async def reschedule(self, message_ids: list[int], delay_seconds: float) -> None:
+        self.rescheduled.append((message_ids, delay_seconds))
+
+
+class RejectingEmailService(MockEmailService):
+    """Mock email service that rejects one address."""
+
+    async def send_activation_code(self, email: str, code: str) -> bool:
+        if email == "bounce@example.com":
+            return False
+        return await super().send_activation_code(email, code)
+
+
+@pytest.mark.asyncio
+async def test_dispatch_batch_sends_and_deletes():
+    """Test that delivered messages are removed from the outbox."""
+    outbox = MockOutboxRepository(
+        [
+            OutboxMessage(id=i, email=f"user{i}@example.com", activation_code="1234", attempts=0)
+            for i in range(3)
+        ]
+    )
+    email_service = MockEmailService()
+    dispatcher = OutboxDispatcher(outbox, email_service)
+
+    assert await dispatcher.dispatch_batch() == 3
+
+    assert outbox.pending == {}
+    assert len(email_service.sent_emails) == 3
+    assert dispatcher.counters["sent"] == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_messages_are_retried_while_the_code_is_valid():
+    """Test that failures back off (capped) until the code expires, then are dropped."""
+    message = OutboxMessage(id=1, email="bounce@example.com", activation_code="1234", attempts=0)
+    outbox = MockOutboxRepository([message])
+    dispatcher = OutboxDispatcher(outbox, RejectingEmailService())
+    dispatcher.retry_backoff = 1.0
+    dispatcher.max_retry_backoff = 4.0
+    dispatcher.retry_window = 60.0
+
+    # Well past the in-process queue's three attempts, the email is still kept
+    for _ in range(6):
+        await dispatcher.dispatch_batch()
+        message.age_seconds += outbox.rescheduled[-1][1]
+    assert [delay for _, delay in outbox.rescheduled] == [1.0, 2.0, 4.0, 4.0, 4.0, 4.0]
+    assert 1 in outbox.pending
+    assert dispatcher.counters["failed"] == 0
+
+    # Dropped once the next attempt would come after the code has expired
+    message.age_seconds = 57.0
+    await dispatcher.dispatch_batch()
+    assert outbox.pending == {}
+    assert dispatcher.counters["failed"] == 1
+
+
+def test_retry_window_defaults_to_activation_code_lifetime(monkeypatch):
+    """Test that without an explicit window, retries last as long as the code."""
+    monkeypatch.setattr(settings, "activation_code_expiry_seconds", 300)
+    monkeypatch.setattr(settings, "outbox_retry_window_seconds", 0.0)
+    dispatcher = OutboxDispatcher(MockOutboxRepository([]), MockEmailService())
+    assert dispatcher.retry_window == 300
@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+from app.exceptions import HashingOverloadedError
+from app.services import password_hasher as password_hasher_module
+from app.services.password_hasher import (
+    HashPolicy,
+    PasswordHasher,
+    _hash,
+    calibrate,
+    password_hasher,
+)
+from app.services.user_service import background_tasks
+from tests.conftest import MockUserRepository
+from tests.test_activation import basic_auth_header
+from tests.test_metrics import sample
+
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_on_executor():
+    """Test hashing and verification round-trip through the executor."""
+    hasher = PasswordHasher()
+    hasher.start(kind="thread", workers=2, queue_size=4)
+    try:
+        password_hash = await hasher.hash("SecurePass123")
+        assert await hasher.verify("SecurePass123", password_hash) is True
+        assert await hasher.verify("WrongPassword123", password_hash) is False
+
+        stats = hasher.stats()
+        assert stats.completed == 3
+        assert stats.in_flight == 0
+        assert stats.queue_depth == 0
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_is_rejected():
+    """Test that callers beyond the queue bound get a 503 instead of waiting."""
+    hasher = PasswordHasher()
+    hasher.start(kind="thread", workers=1, queue_size=0)
+    try:
+        running = asyncio.create_task(hasher.hash("SecurePass123"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(HashingOverloadedError):
+            await hasher.hash("SecurePass123")
+
+        await running
+        assert hasher.stats().rejected == 1
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_stage_timing_excludes_queue_wait(monkeypatch: pytest.MonkeyPatch):
+    """bcrypt.hash times the executor job only; waiting for a worker is bcrypt.queue_wait."""
+    release = threading.Event()
+
+    def slow_verify(*args) -> bool:
+        release.wait()
+        return True
+
+    monkeypatch.setattr(password_hasher_module, "_verify", slow_verify)
+    monkeypatch.setattr(password_hasher_module, "_hash", lambda password, policy: "hash")
+    hasher = PasswordHasher()
+    hasher.start(kind="thread", workers=1, queue_size=1)
+    hashed_before = sample("stage_duration_seconds_sum", stage="bcrypt.hash")
+    waited_before = sample("stage_duration_seconds_sum", stage="bcrypt.queue_wait")
+    try:
+        verifying = asyncio.create_task(hasher.verify("SecurePass123", "hash"))
+        await asyncio.sleep(0)
+        hashing = asyncio.create_task(hasher.hash("SecurePass123"))
+        await asyncio.sleep(0.3)
+        release.set()
+        await asyncio.gather(verifying, hashing)
+    finally:
+        hasher.shutdown()
+
+    assert sample("stage_duration_seconds_sum", stage="bcrypt.hash") - hashed_before < 0.1
+    assert sample("stage_duration_seconds_sum", stage="bcrypt.queue_wait") - waited_before >= 0.3
+
+
+@pytest.mark.asyncio
+async def test_batch_leaves_workers_for_single_hashes(monkeypatch: pytest.MonkeyPatch):
+    """A batch runs small chunks on at most half the workers."""
+    running, peak, lock = 0, 0, threading.Lock()
+
+    def fake_hash_many(passwords: list[str], policy: HashPolicy) -> list[str]:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return [f"hash:{password}" for password in passwords]
+
+    monkeypatch.setattr(password_hasher_module, "_hash_many", fake_hash_many)
+    monkeypatch.setattr(settings, "hash_batch_chunk_size", 3)
+    hasher = PasswordHasher()
+    hasher.start(kind="thread", workers=4, queue_size=100)
+    try:
+        passwords = [f"password{i}" for i in range(20)]
+        assert await hasher.hash_many(passwords) == [f"hash:{p}" for p in passwords]
+        assert peak == 2
+        assert hasher.stats().completed == 7
+    finally:
+        hasher.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_unstarted_hasher_falls_back_to_default_executor():
+    """Test that an unstarted hasher still works without blocking the loop."""
+    hasher = PasswordHasher()
+    password_hash = await hasher.hash("SecurePass123")
+    assert await hasher.verify("SecurePass123", password_hash) is True
+
+
+def test_calibration_only_raises_rounds():
+    """Calibration picks more rounds for a slower target but never drops below the floor."""
+    policy = HashPolicy(bcrypt_rounds=4)
+
+    assert calibrate(policy, target_seconds=1e-6).bcrypt_rounds == 4
+    assert calibrate(policy, target_seconds=0.05).bcrypt_rounds > 4
+
+
+def test_needs_update_for_weaker_hashes_only():
+    """Hashes below the configured rounds need an update; stronger ones are kept."""
+    hasher = PasswordHasher()
+    hasher.policy = HashPolicy(bcrypt_rounds=5)
+
+    assert hasher.needs_update(_hash("SecurePass123", HashPolicy(bcrypt_rounds=4))) is True
+    assert hasher.needs_update(_hash("SecurePass123", HashPolicy(bcrypt_rounds=5))) is False
+    assert hasher.needs_update(_hash("SecurePass123", HashPolicy(bcrypt_rounds=6))) is False
+
+
+@pytest.mark.asyncio
+async def test_outdated_hash_is_rehashed_after_login(
+    client: AsyncClient,
+    mock_repository: MockUserRepository,
+    valid_user_data: dict,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """A successful login with an outdated hash stores a new one in the background."""
+    monkeypatch.setattr(password_hasher, "policy", HashPolicy(bcrypt_rounds=4))
+    await client.post("/users/register", json=valid_user_data)
+    monkeypatch.setattr(password_hasher, "policy", HashPolicy(bcrypt_rounds=5))
+
+    response = await client.post(
+        "/users/resend-code",
+        headers=basic_auth_header(valid_user_data["email"], valid_user_data["password"]),
+    )
+    await asyncio.gather(*background_tasks)
+
+    assert response.status_code == 200
+    user = await mock_repository.get_user_by_email(valid_user_data["email"])
+    assert user is not None
+    assert user.password_hash.startswith("$2b$05$")
+    assert await password_hasher.verify(valid_user_data["password"], user.password_hash)
@@ -0,0 +1,134 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app import server
+from app.config import settings
+from app.services import rate_limiter as rate_limiter_module
+from app.services.password_hasher import password_hasher
+from app.services.rate_limiter import InMemoryRateLimitBackend
+from tests.test_activation import basic_auth_header
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter_module.time, "monotonic", fake)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_bucket_allows_burst_then_refills(clock: FakeClock):
+    """A bucket allows ``burst`` calls at once, then one per 1/rate seconds."""
+    backend = InMemoryRateLimitBackend(shards=1, max_keys=10)
+
+    assert [await backend.take("key", rate=0.5, burst=2) for _ in range(3)] == [0, 0, 2.0]
+
+    clock.now += 2
+    assert await backend.take("key", rate=0.5, burst=2) == 0
+
+
+@pytest.mark.asyncio
+async def test_buckets_are_bounded_and_expire(clock: FakeClock):
+    """Full shards evict their least recently used bucket; refilled buckets are dropped."""
+    backend = InMemoryRateLimitBackend(shards=2, max_keys=4)
+
+    for index in range(10):
+        await backend.take(f"key-{index}", rate=1.0, burst=5)
+
+    assert backend.stats()["keys"] <= 4
+    assert backend.counters["evicted"] >= 6
+
+    # Expiry is lazy: refilled buckets are dropped when their shard is next used
+    backend = InMemoryRateLimitBackend(shards=1, max_keys=10)
+    for index in range(3):
+        await backend.take(f"key-{index}", rate=1.0, burst=5)
+    clock.now += 10
+    await backend.take("fresh", rate=1.0, burst=5)
+
+    assert backend.stats() == {"keys": 1, "expired": 3}
+
+
+@pytest.mark.asyncio
+async def test_rejected_before_bcrypt(
+    client: AsyncClient,
+    valid_user_data: dict,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Over-budget calls get a 429 with Retry-After without verifying the password."""
+    monkeypatch.setattr(settings, "rate_limit_email_burst", 3)
+    await client.post("/users/register", json=valid_user_data)
+    verified = 0
+    original_verify = password_hasher.verify
+
+    async def counting_verify(password: str, password_hash: str) -> bool:
+        nonlocal verified
+        verified += 1
+        return await original_verify(password, password_hash)
+
+    monkeypatch.setattr(password_hasher, "verify", counting_verify)
+    auth = basic_auth_header(valid_user_data["email"], "WrongPassword1!")
+
+    statuses = [
+        (await client.post("/users/resend-code", headers=auth)).status_code for _ in range(4)
+    ]
+    response = await client.post("/users/resend-code", headers=auth)
+
+    assert statuses == [401, 401, 429, 429]
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert verified == 2
+
+
+@pytest.mark.asyncio
+async def test_batch_entries_are_charged_per_ip(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch, clock: FakeClock
+):
+    """A batch draws one token per entry, so the next call from that IP waits for all of them."""
+    monkeypatch.setattr(settings, "batch_registration_api_keys", ["partner-key"])
+    monkeypatch.setattr(settings, "rate_limit_ip_per_second", 1.0)
+    monkeypatch.setattr(settings, "rate_limit_ip_burst", 5)
+    headers = {"X-API-Key": "partner-key"}
+    batch = {
+        "users": [{"email": f"user{i}@example.com", "password": "SecurePass123"} for i in range(8)]
+    }
+
+    first = await client.post("/users/register:batch", json=batch, headers=headers)
+    second = await client.post("/users/register:batch", json=batch, headers=headers)
+
+    assert first.status_code == 200
+    assert first.json()["created"] == 8
+    assert second.status_code == 429
+    assert second.headers["Retry-After"] == "4"
+
+
+@pytest.mark.asyncio
+async def test_ip_buckets_follow_x_forwarded_for_from_trusted_proxies(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch, clock: FakeClock
+):
+    """Behind a trusted proxy every forwarded client gets its own IP bucket."""
+    monkeypatch.setattr(settings, "forwarded_allow_ips", "10.0.0.1")
+    monkeypatch.setattr(settings, "rate_limit_ip_burst", 1)
+    config = server.worker_config()
+    config.load()
+    transport = ASGITransport(app=config.loaded_app, client=("10.0.0.1", 4321))
+
+    async def register(email: str, forwarded_for: str) -> int:
+        async with AsyncClient(transport=transport, base_url="http://test") as proxied:
+            response = await proxied.post(
+                "/users/register",
+                json={"email": email, "password": "SecurePass123"},
+                headers={"X-Forwarded-For": forwarded_for},
+            )
+        return response.status_code
+
+    assert await register("a@example.com", "203.0.113.1") == 201
+    assert await register("b@example.com", "203.0.113.2") == 201
+    assert await register("c@example.com", "203.0.113.1") == 429
@@ -1,6 +1,9 @@
+import asyncio
+
 import pytest
 from httpx import AsyncClient
 
+from app.config import settings
 from tests.conftest import MockEmailService, MockUserRepository
 
 
@@ -43,6 +46,22 @@ async def test_register_user_duplicate_email(
     assert "already exists" in response2.json()["detail"]
 
 
+@pytest.mark.asyncio
+async def test_register_user_concurrent_duplicate_email(
+    client: AsyncClient,
+    mock_email_service: MockEmailService,
+    valid_user_data: dict,
+):
+    """Test that concurrent signups for one email yield one 201 and one 409."""
+    responses = await asyncio.gather(
+        client.post("/users/register", json=valid_user_data),
+        client.post("/users/register", json=valid_user_data),
+    )
+
+    assert sorted(response.status_code for response in responses) == [201, 409]
+    assert len(mock_email_service.sent_emails) == 1
+
+
 @pytest.mark.asyncio
 async def test_register_user_invalid_email(
     client: AsyncClient,
@@ -97,3 +116,25 @@ async def test_activation_code_is_4_digits(
     code = mock_email_service.sent_emails[0]["code"]
     assert len(code) == 4
     assert code.isdigit()
+
+
+@pytest.mark.asyncio
+async def test_register_user_outbox_delivery(
+    client: AsyncClient,
+    mock_repository: MockUserRepository,
+    mock_email_service: MockEmailService,
+    valid_user_data: dict,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Test that outbox delivery writes the email with the user instead of sending it."""
+    monkeypatch.setattr(settings, "email_delivery", "outbox")
+
+    response = await client.post("/users/register", json=valid_user_data)
+    assert response.status_code == 201
+
+    user = await mock_repository.get_user_by_email(valid_user_data["email"])
+    assert user is not None
+    assert mock_repository.outbox == [
+        {"email": valid_user_data["email"], "code": user.activation_code}
+    ]
+    assert mock_email_service.sent_emails == []
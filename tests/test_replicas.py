@@ -0,0 +1,116 @@
+import asyncio
+from datetime import UTC, datetime
+
+import pytest
+
+from app.config import settings
+from app.database import Database, ReplicaSet
+from app.repositories.user_repository import UserRepository
+
+
+class FakeConnection:
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+
+    async def fetchval(self, query: str, *args):
+        self.pool.queries.append(query)
+        return False
+
+    async def fetchrow(self, query: str, *args):
+        self.pool.queries.append(query)
+        return None
+
+
+class FakePool:
+    """Pool stand-in recording the queries run on its connections."""
+
+    def __init__(self, name: str, reachable: bool = True, hangs: bool = False):
+        self.name = name
+        self.reachable = reachable
+        # Connects never complete, like a replica that stopped answering
+        self.hangs = hangs
+        self.queries: list[str] = []
+
+    async def acquire(self, timeout: float | None = None) -> FakeConnection:
+        if not self.reachable:
+            raise OSError("connection refused")
+        return FakeConnection(self)
+
+    async def release(self, conn: FakeConnection) -> None:
+        pass
+
+    async def fetchval(self, query: str, timeout: float | None = None) -> int:
+        if self.hangs:
+            await asyncio.Event().wait()
+        if not self.reachable:
+            raise OSError("connection refused")
+        return 1
+
+
+@pytest.mark.asyncio
+async def test_round_robin_skips_unhealthy_replicas():
+    """Unhealthy replicas are skipped until a health check passes again."""
+    first, second, third = FakePool("a"), FakePool("b", reachable=False), FakePool("c")
+    replicas = ReplicaSet([first, second, third])
+
+    await replicas.check_health()
+
+    assert [replicas.next() for _ in range(4)] == [first, third, first, third]
+
+    second.reachable = True
+    await replicas.check_health()
+
+    assert {replicas.next() for _ in range(3)} == {first, second, third}
+
+
+@pytest.mark.asyncio
+async def test_no_healthy_replica_falls_back_to_primary():
+    """Reads go to the primary when every replica is down."""
+    primary = FakePool("primary")
+    replicas = ReplicaSet([FakePool("replica", reachable=False)])
+    await replicas.check_health()
+
+    assert Database.read_pool(primary, replicas) is primary
+
+
+@pytest.mark.asyncio
+async def test_reads_use_replicas_unless_read_your_writes():
+    """Read-only methods use a replica; writes and read-your-writes use the primary."""
+    primary, replica = FakePool("primary"), FakePool("replica")
+    repository = UserRepository(primary, replicas=ReplicaSet([replica]))
+
+    await repository.email_exists("user@example.com")
+    await repository.update_activation_code(
+        "00000000-0000-0000-0000-000000000000", "1234", datetime.now(UTC)
+    )
+    with Database.read_your_writes():
+        await repository.get_user_by_email("user@example.com")
+
+    assert len(replica.queries) == 1
+    assert len(primary.queries) == 2
+
+
+@pytest.mark.asyncio
+async def test_hanging_replica_is_marked_unhealthy(monkeypatch: pytest.MonkeyPatch):
+    """A probe stuck connecting times out and takes the replica out of rotation."""
+    monkeypatch.setattr(settings, "db_replica_health_check_timeout_seconds", 0.01)
+    replica = FakePool("replica", hangs=True)
+    replicas = ReplicaSet([replica])
+
+    await asyncio.wait_for(replicas.check_health(), 1)
+
+    assert replicas.healthy == [False]
+
+
+@pytest.mark.asyncio
+async def test_failed_replica_read_falls_back_to_primary():
+    """A read the replica cannot serve runs on the primary, and the replica is skipped."""
+    primary, replica = FakePool("primary"), FakePool("replica")
+    replicas = ReplicaSet([replica])
+    repository = UserRepository(primary, replicas=replicas)
+    replica.reachable = False  # went down since the last probe
+
+    assert await repository.email_exists("user@example.com") is False
+
+    assert len(primary.queries) == 1
+    assert replicas.healthy == [False]
@@ -0,0 +1,83 @@
+import pytest
+
+from app import server
+from app.config import settings
+
+
+def test_connection_budget_is_split_between_workers(monkeypatch: pytest.MonkeyPatch):
+    """Each worker gets budget // workers connections and a share of the cores."""
+    monkeypatch.setattr(settings, "db_connection_budget", 50)
+    monkeypatch.setattr(settings, "db_pool_min_size", 5)
+    monkeypatch.setattr(settings, "hash_workers", 0)
+
+    plan = server.plan_workers(workers=4, cpu_count=8)
+    assert plan == server.WorkerPlan(
+        workers=4, db_pool_min_size=5, db_pool_max_size=12, hash_workers=2
+    )
+
+    small = server.plan_workers(workers=16, cpu_count=8)
+    assert (small.db_pool_min_size, small.db_pool_max_size, small.hash_workers) == (3, 3, 1)
+
+    with pytest.raises(ValueError):
+        server.plan_workers(workers=64, cpu_count=8)
+
+
+def test_plan_defaults(monkeypatch: pytest.MonkeyPatch):
+    """Without a budget pools keep their size; workers default to one per core."""
+    monkeypatch.setattr(settings, "db_connection_budget", 0)
+    monkeypatch.setattr(settings, "server_workers", 0)
+    monkeypatch.setattr(settings, "hash_workers", 3)
+
+    plan = server.plan_workers(cpu_count=4)
+
+    assert plan.workers == 4
+    assert plan.db_pool_max_size == settings.db_pool_max_size
+    assert plan.hash_workers == 3
+
+
+def test_worker_stats_empty_outside_app_server():
+    """Under plain uvicorn there is no worker to report."""
+    assert server.worker_stats() == {}
+
+
+class ExitedProcess:
+    """Stand-in for a worker process that died right away."""
+
+    exitcode = 3
+
+    def is_alive(self) -> bool:
+        return False
+
+
+def test_failing_workers_back_off_then_give_up(monkeypatch: pytest.MonkeyPatch):
+    """Workers that die right after starting are restarted ever later, then abandoned."""
+    now = [1000.0]
+    monkeypatch.setattr(server.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(settings, "server_host", "127.0.0.1")
+    monkeypatch.setattr(settings, "server_port", 0)
+    plan = server.WorkerPlan(workers=1, db_pool_min_size=1, db_pool_max_size=1, hash_workers=1)
+    supervisor = server.Supervisor(plan, reuse_port=False)
+    spawned: list[float] = []
+
+    def spawn(index: int) -> ExitedProcess:
+        spawned.append(now[0])
+        supervisor.started_at[index] = now[0]
+        supervisor.restart_at[index] = None
+        return ExitedProcess()
+
+    monkeypatch.setattr(supervisor, "_spawn", spawn)
+    try:
+        supervisor.processes = [spawn(0)]
+        gave_up = False
+        for _ in range(100):
+            now[0] += 0.25
+            if not supervisor.check_workers():
+                gave_up = True
+                break
+    finally:
+        supervisor.sock.close()
+
+    assert gave_up
+    assert supervisor.restarts == server.MAX_QUICK_EXITS - 1
+    delays = [later - earlier for earlier, later in zip(spawned, spawned[1:], strict=False)]
+    assert delays == sorted(delays) and delays[-1] > delays[0]
@@ -0,0 +1,77 @@
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from app.services.email_service import SMTPEmailService
+from app.services.smtp_pool import SMTPConnectionPool
+
+
+class SinkHandler:
+    """aiosmtpd handler that records recipients."""
+
+    def __init__(self):
+        self.recipients: list[str] = []
+
+    async def handle_DATA(self, server, session, envelope):
+        self.recipients.extend(envelope.rcpt_tos)
+        return "250 OK"
+
+
+@pytest.fixture
+def smtp_server():
+    """Run a local SMTP sink on a free port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    handler = SinkHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield handler, port
+    controller.stop()
+
+
+@pytest.mark.asyncio
+async def test_pooled_sends_reuse_one_connection(smtp_server):
+    """Test that sequential sends share a single pooled SMTP session."""
+    handler, port = smtp_server
+    pool = SMTPConnectionPool(host="127.0.0.1", port=port, size=2)
+    service = SMTPEmailService(host="127.0.0.1", port=port, pool=pool)
+
+    for i in range(3):
+        assert await service.send_activation_code(f"user{i}@example.com", "1234") is True
+    await pool.close()
+
+    assert pool.connects == 1
+    assert handler.recipients == [f"user{i}@example.com" for i in range(3)]
+
+
+@pytest.mark.asyncio
+async def test_send_many_without_pool(smtp_server):
+    """Test that a batch is sent over one dedicated session."""
+    handler, port = smtp_server
+    service = SMTPEmailService(host="127.0.0.1", port=port)
+
+    results = await service.send_many([("a@example.com", "1111"), ("b@example.com", "2222")])
+
+    assert results == [True, True]
+    assert handler.recipients == ["a@example.com", "b@example.com"]
+
+
+@pytest.mark.asyncio
+async def test_pool_reconnects_after_connection_loss(smtp_server):
+    """Test that a dropped idle connection is replaced on the next checkout."""
+    handler, port = smtp_server
+    pool = SMTPConnectionPool(host="127.0.0.1", port=port, size=1)
+    service = SMTPEmailService(host="127.0.0.1", port=port, pool=pool)
+
+    await service.send_activation_code("a@example.com", "1111")
+    smtp, _ = pool._idle[0]
+    smtp.close()
+
+    assert await service.send_activation_code("b@example.com", "2222") is True
+    await pool.close()
+
+    assert pool.connects == 2
+    assert handler.recipients == ["a@example.com", "b@example.com"]
@@ -0,0 +1,63 @@
+import logging
+
+import pytest
+from httpx import AsyncClient
+
+from app.config import settings
+
+
+@pytest.mark.asyncio
+async def test_no_server_timing_when_disabled(client: AsyncClient, valid_user_data: dict):
+    """Tracing is opt-in."""
+    response = await client.post("/users/register", json=valid_user_data)
+
+    assert "server-timing" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_server_timing_lists_stages(
+    client: AsyncClient,
+    valid_user_data: dict,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """Sampled requests report their stage durations in Server-Timing."""
+    monkeypatch.setattr(settings, "tracing_enabled", True)
+
+    response = await client.post("/users/register", json=valid_user_data)
+
+    entries = {entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")}
+    assert {"bcrypt.hash", "service.register_user", "total"} <= entries
+
+
+@pytest.mark.asyncio
+async def test_unsampled_requests_have_no_breakdown(
+    client: AsyncClient,
+    valid_user_data: dict,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """A zero sample rate leaves responses untouched."""
+    monkeypatch.setattr(settings, "tracing_enabled", True)
+    monkeypatch.setattr(settings, "tracing_sample_rate", 0.0)
+
+    response = await client.post("/users/register", json=valid_user_data)
+
+    assert "server-timing" not in response.headers
+
+
+@pytest.mark.asyncio
+async def test_slow_requests_are_logged(
+    client: AsyncClient,
+    valid_user_data: dict,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+):
+    """Requests over the threshold produce one structured log line."""
+    monkeypatch.setattr(settings, "tracing_enabled", True)
+    monkeypatch.setattr(settings, "slow_request_threshold_ms", 0.0)
+
+    with caplog.at_level(logging.WARNING, logger="app.tracing"):
+        await client.post("/users/register", json=valid_user_data)
+
+    [record] = [r for r in caplog.records if r.name == "app.tracing"]
+    assert '"path": "/users/register"' in record.getMessage()
+    assert '"bcrypt.hash"' in record.getMessage()
@@ -0,0 +1,120 @@
+from collections.abc import Callable
+from datetime import UTC, datetime
+from uuid import uuid4
+
+import pytest
+
+from app.repositories import user_cache as user_cache_module
+from app.repositories.user_cache import CachedUserRepository, UserCache
+
+
+class FakeConnection:
+    def __init__(self, pool: "FakePool"):
+        self.pool = pool
+
+    async def fetchrow(self, query: str, *args):
+        row = self.pool.row
+        if self.pool.during_fetch:
+            self.pool.during_fetch()
+        return row
+
+    async def fetchval(self, query: str, *args):
+        return self.pool.row is not None
+
+
+class FakePool:
+    """Pool stand-in serving one user row and counting acquires."""
+
+    def __init__(self):
+        now = datetime.now(UTC)
+        self.row = {
+            "id": uuid4(),
+            "email": "user@example.com",
+            "password_hash": "hash",
+            "is_active": False,
+            "activation_code": "1234",
+            "activation_code_expires_at": now,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self.acquired = 0
+        # Runs after the row is read, like a write landing while the lookup is in flight
+        self.during_fetch: Callable[[], None] | None = None
+
+    async def acquire(self, timeout: float | None = None) -> FakeConnection:
+        self.acquired += 1
+        return FakeConnection(self)
+
+    async def release(self, conn: FakeConnection) -> None:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_repeated_lookups_skip_the_pool():
+    """Lookups by email and id are served from the cache, without activation codes."""
+    pool, cache = FakePool(), UserCache(max_size=10, ttl_seconds=60)
+    repository = CachedUserRepository(pool, cache=cache)
+
+    first = await repository.get_user_by_email("user@example.com")
+    again = await repository.get_user_by_email("user@example.com")
+    by_id = await repository.get_user_by_id(pool.row["id"])
+
+    assert first is not None and first.activation_code == "1234"
+    assert again is not None and again.activation_code is None
+    assert by_id == again
+    assert pool.acquired == 1
+    assert cache.stats() == {"size": 2, "hits": 2, "misses": 1}
+
+
+@pytest.mark.asyncio
+async def test_writes_invalidate_the_user():
+    """Activating or changing a code drops the user's entries, so the next lookup is fresh."""
+    pool, cache = FakePool(), UserCache(max_size=10, ttl_seconds=60)
+    repository = CachedUserRepository(pool, cache=cache)
+    await repository.get_user_by_email("user@example.com")
+    assert await repository.email_exists("user@example.com") is True
+
+    await repository.activate_user(pool.row["id"])
+    pool.row["is_active"] = True
+    user = await repository.get_user_by_email("user@example.com")
+
+    assert user is not None and user.is_active is True
+    assert cache.peek(("exists", "user@example.com")) is user_cache_module._MISSING
+
+    await repository.update_activation_code(pool.row["id"], "5678", datetime.now(UTC))
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_only_writes_to_the_same_user_keep_a_lookup_out_of_the_cache():
+    """A lookup overlapping another user's write is cached; one overlapping its own is not."""
+    pool, cache = FakePool(), UserCache(max_size=10, ttl_seconds=60)
+    repository = CachedUserRepository(pool, cache=cache)
+
+    pool.during_fetch = lambda: repository.invalidate(uuid4())
+    await repository.get_user_by_email("user@example.com")
+    assert cache.peek(("email", "user@example.com")) is not user_cache_module._MISSING
+
+    cache.clear()
+    pool.during_fetch = lambda: repository.invalidate(pool.row["id"])
+    await repository.get_user_by_email("user@example.com")
+    assert cache.stats()["size"] == 0
+
+
+def test_cache_is_bounded_and_expires(monkeypatch: pytest.MonkeyPatch):
+    """The least recently used entry is evicted when full; entries expire after the TTL."""
+    now = [1000.0]
+    monkeypatch.setattr(user_cache_module.time, "monotonic", lambda: now[0])
+    cache = UserCache(max_size=2, ttl_seconds=5)
+
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is user_cache_module._MISSING
+    assert cache.counters["evictions"] == 1
+
+    now[0] += 5
+    assert cache.get("a") is user_cache_module._MISSING
+    assert cache.stats()["size"] == 1